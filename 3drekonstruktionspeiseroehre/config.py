@@ -51,6 +51,25 @@ title_without_endoscopy = "3D view from X-ray and manometry data"
 
 # dash server:
 dash_port_range = (50000, 50100)  # the dash server tries to use a port inside this range
+geometry_cache_max_entries = 50  # number of reconstructions kept in the browser-side geometry cache (IndexedDB, one cache per port)
+frame_window_size = 400  # number of frames the dash server sends per request of per-frame colors and metrics
+frame_buffer_windows = 4  # number of frame windows kept in the web view (current, prefetched and recently used)
+
+# image thumbnails: (shown in the image viewers of the data window, double-click opens the full resolution)
+thumbnail_heights = [100, 200, 400]  # heights in px of the stored thumbnail pyramid levels
+thumbnail_jpeg_quality = 85  # JPEG quality of the thumbnails
+thumbnail_batch_size = 20  # number of images converted per transaction of the background worker
+thumbnail_backfill_on_start = True  # generate the missing thumbnails of existing images in the background on start
+image_cache_max_entries = 200  # number of decoded images kept by the image viewers (shared by all visits, least recently used are dropped)
+upload_workers = 0  # number of threads decoding and encoding uploaded images (0 = number of CPUs)
+
+# endosonography videos:
+video_chunk_size = 8 * 1024 * 1024  # bytes per read/write of the endosonography video large objects (bounds the memory of a transfer)
+
+# patient table of the data window:
+patient_page_size = 100  # number of patients fetched per query, further pages are fetched when the table is scrolled
+patient_filter_debounce_ms = 300  # delay after the last keystroke before the patient filter and suggestions are queried
+patient_suggestions_limit = 50  # maximum number of patient IDs suggested by the auto-complete
 
 # visualization: (these values can be lowered to run the animation on slower hardware)
 figure_number_of_angles = 100  # number of angles used to calculate the profile of the figure
@@ -118,3 +137,38 @@ min_eso_length = 10
 # If set to False, the app will not show the validation export prompt
 # in the VTKHDF export flow and will not export validation attributes.
 enable_validation_export_prompt = False
+
+# mass VTKHDF export
+mass_export_workers = 0  # number of worker processes (0 = number of CPUs minus one)
+mass_export_tasks_per_worker = 2  # reconstructions queued per worker, bounds the memory of the export
+
+# HDF5 archive export (all reconstructions in one file)
+archive_file_name = "reconstructions.h5"
+archive_compression_level = 4  # gzip level of all datasets in the archive
+archive_shuffle = True  # byte shuffle before compression, improves the compression of float arrays
+
+# validation attributes / field data of the VTKHDF export
+validation_sidecar_min_array_size = 16  # numeric lists with at least this many values are stored as typed arrays in binary validation files
+vtkhdf_typed_metric_arrays = False  # per-frame metric dictionaries additionally as float64 field arrays (<key>_max, ...) next to the JSON strings
+
+# export profiles of the VTKHDF export (see logic/dataoutput/export_profiles.py)
+export_profile = "lossless"  # profile used if none is chosen
+export_profiles = {
+    "lossless": {"vtk_compression_level": 5, "pressure_compression": "gzip", "pressure_compression_level": 4, "shuffle": True, "quantize": False},
+    "compact": {"vtk_compression_level": 5, "pressure_compression": "gzip", "pressure_compression_level": 6, "shuffle": True, "quantize": True},
+    "fast_write": {"vtk_compression_level": 0, "pressure_compression": None, "shuffle": False, "quantize": False},
+}
+pressure_quantization_precision_mmhg = 0.1  # step of the 16-bit pressures of the compact profile
+
+# 3d-printing export (STL/PLY)
+print_mesh_target_triangles = 0  # default triangle count the meshes are reduced to (0 = full resolution)
+print_mesh_workers = 0  # number of worker processes (0 = number of CPUs minus one)
+print_mesh_parallel_min_meshes = 8  # fewer meshes are exported in one thread (starting the worker processes takes longer)
+
+# VTKHDF mesh
+vtkhdf_direct_mesh_builder = True  # build the triangle mesh directly from the ring stack instead of the VTK filter pipeline
+vtkhdf_mesh_end_caps = False  # close the upper and lower end of the exported mesh
+
+# per-vertex pressure dataset (pressure_export_mode "per_vertex_dataset")
+pressure_dataset_chunk_frames = 16  # frames per HDF5 chunk, reading one frame touches one chunk
+pressure_dataset_compression_level = 4  # gzip level of the pressure dataset
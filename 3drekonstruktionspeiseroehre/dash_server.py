@@ -1,13 +1,18 @@
+import hashlib
+import json
 import socket
 
 import dash_bootstrap_components as dbc
 import dash_daq as daq
+import numpy as np
 import plotly.express as px
 import plotly.graph_objects as go
+import plotly.utils
 import waitress
 from dash import dash_table
 from dash.exceptions import PreventUpdate
 from dash_extensions.enrich import DashProxy, Input, MultiplexerTransform, Output, State, dcc, html, no_update
+from flask import Response, abort
 from kthread import KThread
 
 # from PyQt5.QtWidgets import QMessageBox
@@ -32,16 +37,23 @@ class DashServer:
         """
         self.visit = visit
         self.visit_figures = []
+        self.client_figures = []
+        self.geometry_hashes = {}
         self.xray_names = []
         self.selected_figure_index = 0
-        for visualization_data in self.visit.visualization_data_list:
+        for i, visualization_data in enumerate(self.visit.visualization_data_list):
             fig = visualization_data.figure_creator.get_figure()
             try:
                 # Slightly zoomed-out default camera
                 fig.update_layout(scene_camera=dict(eye=dict(x=2, y=2, z=2)))
             except Exception:
                 pass
+            # The browser identifies the mesh by this hash and restores the coordinates from its geometry cache
+            geometry_hash = self.__geometry_hash(visualization_data, fig.data[0])
+            fig.data[0].meta = {"geometry_hash": geometry_hash}
+            self.geometry_hashes[geometry_hash] = i
             self.visit_figures.append(fig)
+            self.client_figures.append(self.__client_figure(fig))
             self.xray_names.append(visualization_data.xray_minute)
         self.current_figure = self.visit_figures[0]
 
@@ -105,21 +117,9 @@ class DashServer:
         self.dash_app.layout = html.Div(
             [
                 dcc.Interval(id="refresh-graph-interval", disabled=True, interval=1000 / config.animation_frames_per_second),
-                dcc.Store(id="color-store", data=self.visit.visualization_data_list[self.selected_figure_index].figure_creator.get_surfacecolor_list()),
-                dcc.Store(
-                    id="metric-store",
-                    data=[
-                        self.visit.visualization_data_list[self.selected_figure_index].figure_creator.get_metrics()["metric_tubular"],
-                        self.visit.visualization_data_list[0].figure_creator.get_metrics()["metric_sphincter"],
-                    ],
-                ),
-                dcc.Store(
-                    id="pressure-store",
-                    data=[
-                        self.visit.visualization_data_list[self.selected_figure_index].figure_creator.get_metrics()["pressure_tubular_per_frame"],
-                        self.visit.visualization_data_list[0].figure_creator.get_metrics()["pressure_sphincter_per_frame"],
-                    ],
-                ),
+                # Only the first window of per-frame colors and metrics is embedded, further windows are
+                # requested from the /frames route while playing (see __frame_window)
+                dcc.Store(id="frame-store", data=self.__frame_window(self.selected_figure_index, 0)),
                 dcc.Store(
                     id="size-store",
                     data=[
@@ -139,12 +139,14 @@ class DashServer:
                 ),
                 dcc.Store(id="hidden-output"),
                 dcc.Store(id="camera-store"),
+                # Set by the synchronized playback of the VisualizationWindow
+                dcc.Input(id="sync-frame", type="number", style={"display": "none"}),
                 html.Div(
                     [
                         endoflip_element,
                         dcc.Graph(
                             id="3d-figure",
-                            figure=self.visit_figures[0],
+                            figure=self.client_figures[0],
                             config={"modeBarButtonsToRemove": ["toImage", "resetCameraLastSave3d"], "displaylogo": False},
                             style={
                                 "height": "calc(100vh - 160px)",
@@ -412,51 +414,115 @@ class DashServer:
 
         self.dash_app.clientside_callback(
             """
-            function(time, index, figure, colors, metric, pressure, size, endoflip_on, camera) {
-                var expandedColors = [];
-                if (!endoflip_on && colors !== null && colors[time] !== undefined && Array.isArray(colors[time])) {
-                    for (var i = 0; i < colors[time].length; i++) {
-                        expandedColors[i] = new Array("""
-            + str(config.figure_number_of_angles)
-            + """).fill(colors[time][i]);
+            function(time, index, figure, frames, size, endoflip_on, camera) {
+                if (endoflip_on || figure === null || frames === null || time >= frames.number_of_frames) {
+                    throw window.dash_clientside.PreventUpdate;
+                }
+                if (!window.esophagusFrameBuffer) {
+                    // Bounded ring buffer of frame windows, the least recently used window is dropped first
+                    window.esophagusFrameBuffer = (function() {
+                        var maxWindows = """
+            + str(config.frame_buffer_windows)
+            + """;
+                        var windows = new Map();
+                        var pending = {};
+
+                        function put(key, frameWindow) {
+                            windows.delete(key);
+                            windows.set(key, frameWindow);
+                            while (windows.size > maxWindows) {
+                                windows.delete(windows.keys().next().value);
+                            }
                         }
-                        new_figure = {...figure};
-                        if (camera !== null) {new_figure.layout.scene.camera = camera};
-                        
-                        // Handle different object types (Surface vs Mesh3d)
-                        if (new_figure.data[0].type === 'surface') {
-                            new_figure.data[0].surfacecolor = expandedColors;
-                        } else if (new_figure.data[0].type === 'mesh3d') {
-                            // For Mesh3d, use the first frame's color data directly
-                            new_figure.data[0].intensity = colors[time];
+
+                        function load(figureIndex, windowIndex) {
+                            var key = figureIndex + ":" + windowIndex;
+                            if (windows.has(key)) {
+                                var frameWindow = windows.get(key);
+                                put(key, frameWindow);
+                                return Promise.resolve(frameWindow);
+                            }
+                            if (pending[key] === undefined) {
+                                pending[key] = fetch("/frames/" + figureIndex + "/" + windowIndex).then(function(response) {
+                                    if (!response.ok) {
+                                        throw new Error("Frame window " + key + " could not be loaded");
+                                    }
+                                    return response.json();
+                                }).then(function(frameWindow) {
+                                    put(key, frameWindow);
+                                    return frameWindow;
+                                }).finally(function() {
+                                    delete pending[key];
+                                });
+                            }
+                            return pending[key];
+                        }
+
+                        function seed(frameWindow) {
+                            var key = frameWindow.figure + ":" + Math.floor(frameWindow.start / frameWindow.window_size);
+                            if (!windows.has(key)) {
+                                put(key, frameWindow);
+                            }
                         }
-                        
-                        new_figure.data[0].colorscale = """
+
+                        return {load: load, seed: seed};
+                    })();
+                }
+                var buffer = window.esophagusFrameBuffer;
+                buffer.seed(frames);
+                var windowIndex = Math.floor(time / frames.window_size);
+                // Prefetch the next window so that playback does not wait for it
+                if ((windowIndex + 1) * frames.window_size < frames.number_of_frames) {
+                    buffer.load(frames.figure, windowIndex + 1).catch(function() {});
+                }
+                return buffer.load(frames.figure, windowIndex).then(function(frameWindow) {
+                    var frame = time - frameWindow.start;
+                    var colors = frameWindow.colors[frame];
+                    var metric = frameWindow.metric;
+                    var pressure = frameWindow.pressure;
+                    var expandedColors = [];
+                    for (var i = 0; i < colors.length; i++) {
+                        expandedColors[i] = new Array("""
+            + str(config.figure_number_of_angles)
+            + """).fill(colors[i]);
+                    }
+                    new_figure = {...figure};
+                    if (camera !== null) {new_figure.layout.scene.camera = camera};
+
+                    // Handle different object types (Surface vs Mesh3d)
+                    if (new_figure.data[0].type === 'surface') {
+                        new_figure.data[0].surfacecolor = expandedColors;
+                    } else if (new_figure.data[0].type === 'mesh3d') {
+                        // For Mesh3d, use the first frame's color data directly
+                        new_figure.data[0].intensity = colors;
+                    }
+
+                    new_figure.data[0].colorscale = """
             + str(config.colorscale)
             + """;
-                        new_figure.data[0].cmin="""
+                    new_figure.data[0].cmin="""
             + str(config.cmin)
             + """;
-                        new_figure.data[0].cmax="""
+                    new_figure.data[0].cmax="""
             + str(config.cmax)
             + """;
-                        static_values_tubular= "Length: " + size[0][0].toFixed(4) + " cm  //  Volume: " + size[1][0].toFixed(4) + " cm^3  //  Height: " + size[2][0].toFixed(4) + " cm";
-                        static_values_sphincter= "Length: " + size[0][1].toFixed(4) + " cm  //  Volume: "+ size[1][1].toFixed(4) + " cm^3  //  Height: " + size[2][1].toFixed(4) + " cm";
-                        data_table_tubular_pres= [{'max_tub_press_frame': pressure[0]['max'][time].toFixed(6), 'min_tub_press_frame': pressure[0]['min'][time].toFixed(6), 'mean_tub_press_frame': pressure[0]['mean'][time].toFixed(6)}];
-                        data_table_tubular_metrics= [{'vol_max_tub_press_frame': metric[0]['max'][time].toFixed(6), 'vol_min_tub_press_frame': metric[0]['min'][time].toFixed(6), 'vol_mean_tub_press_frame': metric[0]['mean'][time].toFixed(6)}];
-                        data_table_sphincter_pres= [{'max_sph_press_frame': pressure[1]['max'][time].toFixed(6), 'min_sph_press_frame': pressure[1]['min'][time].toFixed(6), 'mean_sph_press_frame': pressure[1]['mean'][time].toFixed(6)}];
-                        data_table_sphincter_metrics= [{'vol_max_sph_press_frame': metric[1]['max'][time].toFixed(6), 'vol_min_sph_press_frame': metric[1]['min'][time].toFixed(6), 'vol_mean_sph_press_frame': metric[1]['mean'][time].toFixed(6)}];   
-                        return [new_figure, 
-                                "Zeitpunkt: " + (time/20).toFixed(2) + "s", 
-                                static_values_tubular,
-                                data_table_tubular_pres,
-                                data_table_tubular_metrics,
-                                static_values_sphincter,
-                                data_table_sphincter_pres,
-                                data_table_sphincter_metrics];
-                    }
-                }    
-                """,
+                    static_values_tubular= "Length: " + size[0][0].toFixed(4) + " cm  //  Volume: " + size[1][0].toFixed(4) + " cm^3  //  Height: " + size[2][0].toFixed(4) + " cm";
+                    static_values_sphincter= "Length: " + size[0][1].toFixed(4) + " cm  //  Volume: "+ size[1][1].toFixed(4) + " cm^3  //  Height: " + size[2][1].toFixed(4) + " cm";
+                    data_table_tubular_pres= [{'max_tub_press_frame': pressure[0]['max'][frame].toFixed(6), 'min_tub_press_frame': pressure[0]['min'][frame].toFixed(6), 'mean_tub_press_frame': pressure[0]['mean'][frame].toFixed(6)}];
+                    data_table_tubular_metrics= [{'vol_max_tub_press_frame': metric[0]['max'][frame].toFixed(6), 'vol_min_tub_press_frame': metric[0]['min'][frame].toFixed(6), 'vol_mean_tub_press_frame': metric[0]['mean'][frame].toFixed(6)}];
+                    data_table_sphincter_pres= [{'max_sph_press_frame': pressure[1]['max'][frame].toFixed(6), 'min_sph_press_frame': pressure[1]['min'][frame].toFixed(6), 'mean_sph_press_frame': pressure[1]['mean'][frame].toFixed(6)}];
+                    data_table_sphincter_metrics= [{'vol_max_sph_press_frame': metric[1]['max'][frame].toFixed(6), 'vol_min_sph_press_frame': metric[1]['min'][frame].toFixed(6), 'vol_mean_sph_press_frame': metric[1]['mean'][frame].toFixed(6)}];
+                    return [new_figure,
+                            "Zeitpunkt: " + (time/20).toFixed(2) + "s",
+                            static_values_tubular,
+                            data_table_tubular_pres,
+                            data_table_tubular_metrics,
+                            static_values_sphincter,
+                            data_table_sphincter_pres,
+                            data_table_sphincter_metrics];
+                });
+            }
+            """,
             [
                 Output("3d-figure", "figure"),
                 Output("time-field", "children"),
@@ -469,15 +535,154 @@ class DashServer:
             ],
             [Input("time-slider", "value"), Input("figure-selector", "value"), Input("3d-figure", "figure")],
             [
-                State("color-store", "data"),
-                State("metric-store", "data"),
-                State("pressure-store", "data"),
+                State("frame-store", "data"),
                 State("size-store", "data"),
                 State("pressure-or-endoflip", "on"),
                 State("camera-store", "data"),
             ],
         )
 
+        # Figures are sent without mesh coordinates. They are restored from an in-memory map, from the persistent
+        # IndexedDB cache of the web profile or, only on a cache miss, from the /geometry route of this server.
+        # IndexedDB is per origin (host and port), so the cache is only shared by the visualizations served on the
+        # same port of config.dash_port_range (the first free port is used, e.g. by the first visualization of
+        # every session). The returned Promise is resolved by the Dash renderer (see the pinned Dash version).
+        self.dash_app.clientside_callback(
+            """
+            function(figure) {
+                if (!window.esophagusGeometryCache) {
+                    window.esophagusGeometryCache = (function() {
+                        var maxEntries = """
+            + str(config.geometry_cache_max_entries)
+            + """;
+                        var memory = {};
+                        var dbPromise = null;
+
+                        function openDb() {
+                            if (dbPromise === null) {
+                                dbPromise = new Promise(function(resolve) {
+                                    if (!window.indexedDB) {
+                                        resolve(null);
+                                        return;
+                                    }
+                                    var request = window.indexedDB.open("esophagus_geometry_cache", 1);
+                                    request.onupgradeneeded = function(event) {
+                                        var store = event.target.result.createObjectStore("geometry", {keyPath: "hash"});
+                                        store.createIndex("last_used", "last_used");
+                                    };
+                                    request.onsuccess = function(event) { resolve(event.target.result); };
+                                    request.onerror = function() { resolve(null); };
+                                });
+                            }
+                            return dbPromise;
+                        }
+
+                        function readEntry(db, hash) {
+                            return new Promise(function(resolve) {
+                                if (db === null) {
+                                    resolve(null);
+                                    return;
+                                }
+                                var request = db.transaction("geometry", "readonly").objectStore("geometry").get(hash);
+                                request.onsuccess = function() { resolve(request.result || null); };
+                                request.onerror = function() { resolve(null); };
+                            });
+                        }
+
+                        function writeEntry(db, entry) {
+                            if (db === null) {
+                                return;
+                            }
+                            var transaction = db.transaction("geometry", "readwrite");
+                            var store = transaction.objectStore("geometry");
+                            store.put(entry);
+                            // Evict the least recently used reconstructions if the cache grew too large
+                            var countRequest = store.count();
+                            countRequest.onsuccess = function() {
+                                var surplus = countRequest.result - maxEntries;
+                                if (surplus <= 0) {
+                                    return;
+                                }
+                                store.index("last_used").openCursor().onsuccess = function(event) {
+                                    var cursor = event.target.result;
+                                    if (cursor && surplus > 0) {
+                                        cursor.delete();
+                                        surplus--;
+                                        cursor.continue();
+                                    }
+                                };
+                            };
+                        }
+
+                        function get(hash) {
+                            if (memory[hash] !== undefined) {
+                                return Promise.resolve(memory[hash]);
+                            }
+                            return openDb().then(function(db) {
+                                return readEntry(db, hash).then(function(entry) {
+                                    if (entry !== null) {
+                                        entry.last_used = Date.now();
+                                        writeEntry(db, entry);
+                                        return entry.geometry;
+                                    }
+                                    return fetch("/geometry/" + hash).then(function(response) {
+                                        if (!response.ok) {
+                                            throw new Error("Geometry " + hash + " could not be loaded");
+                                        }
+                                        return response.json();
+                                    }).then(function(geometry) {
+                                        writeEntry(db, {hash: hash, geometry: geometry, last_used: Date.now()});
+                                        return geometry;
+                                    });
+                                });
+                            }).then(function(geometry) {
+                                memory[hash] = geometry;
+                                return geometry;
+                            });
+                        }
+
+                        return {get: get};
+                    })();
+                }
+
+                if (!figure || !figure.data || figure.data.length === 0) {
+                    return window.dash_clientside.no_update;
+                }
+                var trace = figure.data[0];
+                if (!trace.meta || !trace.meta.geometry_hash || (trace.z !== undefined && trace.z !== null)) {
+                    return window.dash_clientside.no_update;
+                }
+                return window.esophagusGeometryCache.get(trace.meta.geometry_hash).then(function(geometry) {
+                    var new_figure = {...figure};
+                    new_figure.data = [...figure.data];
+                    new_figure.data[0] = {...trace, x: geometry.x, y: geometry.y, z: geometry.z};
+                    return new_figure;
+                });
+            }
+            """,
+            Output("3d-figure", "figure"),
+            Input("3d-figure", "figure"),
+            prevent_initial_call=False,
+        )
+
+        self.dash_app.server.add_url_rule("/geometry/<geometry_hash>", "geometry", self.__serve_geometry)
+        self.dash_app.server.add_url_rule("/frames/<int:figure_index>/<int:window_index>", "frames", self.__serve_frame_window)
+
+        # The shared clock only sends a frame number, the colors are taken from the frame buffer of the page
+        self.dash_app.clientside_callback(
+            """
+            function(frame, max) {
+                if (frame === undefined || frame === null || frame === "") {
+                    return window.dash_clientside.no_update;
+                }
+                return Math.min(Math.max(Math.round(frame), 0), max);
+            }
+            """,
+            Output("time-slider", "value"),
+            Input("sync-frame", "value"),
+            State("time-slider", "max"),
+        )
+
         self.dash_app.callback(
             [Output("pressure-control", "style"), Output("endoflip-control", "style"), Output("3d-figure", "figure")],
             [Input("pressure-or-endoflip", "on"), Input("endoflip-table-dropdown", "value"), Input("30-or-40", "on")],
@@ -503,9 +708,7 @@ class DashServer:
         self.dash_app.callback(
             [
                 Output("3d-figure", "figure"),
-                Output("color-store", "data"),
-                Output("metric-store", "data"),
-                Output("pressure-store", "data"),
+                Output("frame-store", "data"),
                 Output("size-store", "data"),
                 Output("time-slider", "max"),
                 Output("static_values_tubular", "children"),
@@ -559,6 +762,117 @@ class DashServer:
         """
         return self.port
 
+    def get_number_of_frames(self):
+        """
+        Returns the number of frames of the currently selected figure.
+
+        Returns:
+            int: Number of frames.
+        """
+        return self.visit.visualization_data_list[self.selected_figure_index].figure_creator.get_number_of_frames()
+
+    @staticmethod
+    def __geometry_hash(visualization_data, trace):
+        """
+        Calculates a content hash of the mesh coordinates.
+
+        Args:
+            visualization_data (VisualizationData): Visualization data holding figure_x, figure_y and figure_z.
+            trace (go.Surface): Trace of the figure, used if the visualization data has no coordinates.
+
+        Returns:
+            str: Hex digest identifying the geometry.
+        """
+        coordinates = (visualization_data.figure_x, visualization_data.figure_y, visualization_data.figure_z)
+        if any(values is None for values in coordinates):
+            coordinates = (trace.x, trace.y, trace.z)
+        digest = hashlib.sha1()
+        for values in coordinates:
+            values = np.ascontiguousarray(values, dtype=np.float64)
+            digest.update(str(values.shape).encode())
+            digest.update(values.tobytes())
+        return digest.hexdigest()
+
+    @staticmethod
+    def __client_figure(figure):
+        """
+        Creates the copy of a figure that is sent to the browser, without the mesh coordinates.
+
+        Args:
+            figure (go.Figure): Complete figure.
+
+        Returns:
+            go.Figure: Figure without x, y and z values.
+        """
+        client_figure = go.Figure(figure)
+        client_figure.data[0].update(x=None, y=None, z=None)
+        return client_figure
+
+    def __serve_geometry(self, geometry_hash):
+        """
+        Route that delivers the mesh coordinates on a cache miss of the browser.
+
+        Args:
+            geometry_hash (str): Hash of the requested geometry.
+
+        Returns:
+            Response: JSON with the x, y and z values of the figure.
+        """
+        if geometry_hash not in self.geometry_hashes:
+            abort(404)
+        trace = self.visit_figures[self.geometry_hashes[geometry_hash]].data[0]
+        geometry = {"x": trace.x, "y": trace.y, "z": trace.z}
+        return Response(json.dumps(geometry, cls=plotly.utils.PlotlyJSONEncoder), mimetype="application/json")
+
+    def __frame_window(self, figure_index, window_index):
+        """
+        Cuts a window of per-frame colors and metrics out of the time series of a figure.
+
+        Args:
+            figure_index (int): Index of the figure (barium swallow image).
+            window_index (int): Index of the window, each window has config.frame_window_size frames.
+
+        Returns:
+            dict: Start frame, colors, tubular/sphincter metrics and pressures of the window.
+        """
+        figure_creator = self.visit.visualization_data_list[figure_index].figure_creator
+        metrics = figure_creator.get_metrics()
+        number_of_frames = figure_creator.get_number_of_frames()
+        start = window_index * config.frame_window_size
+        stop = min(start + config.frame_window_size, number_of_frames)
+
+        # Only the window is converted, not the whole time series
+        def cut(values):
+            return {aggregation: np.asarray(values[aggregation][start:stop]) for aggregation in ("max", "min", "mean")}
+
+        return {
+            "figure": figure_index,
+            "number_of_frames": number_of_frames,
+            "window_size": config.frame_window_size,
+            "start": start,
+            "colors": np.asarray(figure_creator.get_surfacecolor_list()[start:stop]),
+            "metric": [cut(metrics["metric_tubular"]), cut(metrics["metric_sphincter"])],
+            "pressure": [cut(metrics["pressure_tubular_per_frame"]), cut(metrics["pressure_sphincter_per_frame"])],
+        }
+
+    def __serve_frame_window(self, figure_index, window_index):
+        """
+        Route that delivers a window of per-frame colors and metrics.
+
+        Args:
+            figure_index (int): Index of the figure (barium swallow image).
+            window_index (int): Index of the window.
+
+        Returns:
+            Response: JSON with the frame window.
+        """
+        if figure_index >= len(self.visit.visualization_data_list):
+            abort(404)
+        if window_index * config.frame_window_size >= self.visit.visualization_data_list[figure_index].figure_creator.get_number_of_frames():
+            abort(404)
+        frame_window = self.__frame_window(figure_index, window_index)
+        return Response(json.dumps(frame_window, cls=plotly.utils.PlotlyJSONEncoder), mimetype="application/json")
+
     def __play_button_clicked_callback(self, n_clicks, disabled, value, figure):
         """
         Callback for the play button.
@@ -612,13 +926,13 @@ class DashServer:
             camera (dict): Camera position state.
 
         Returns:
-            list: Updated figure, color store, tubular metric store, sphincter metric store, maximum value of time slider, updated time slider value, metrics text.
+            list: Updated figure, first frame window, size store, maximum value of time slider, metrics texts and tables.
         """
         self.selected_figure_index = selected_figure
         self.current_figure = self.visit_figures[selected_figure]
         if selected_figure is not None:
             # Create a new figure that will preserve the camera position
-            new_figure = go.Figure(self.visit_figures[selected_figure])
+            new_figure = go.Figure(self.client_figures[selected_figure])
             if camera is not None:
                 new_figure.layout.scene.camera = camera
             # Add uirevision to preserve camera position across mode changes
@@ -677,15 +991,7 @@ class DashServer:
 
             return [
                 new_figure,
-                self.visit.visualization_data_list[selected_figure].figure_creator.get_surfacecolor_list(),
-                [
-                    self.visit.visualization_data_list[selected_figure].figure_creator.get_metrics()["metric_tubular"],
-                    self.visit.visualization_data_list[selected_figure].figure_creator.get_metrics()["metric_sphincter"],
-                ],
-                [
-                    self.visit.visualization_data_list[selected_figure].figure_creator.get_metrics()["pressure_tubular_per_frame"],
-                    self.visit.visualization_data_list[selected_figure].figure_creator.get_metrics()["pressure_sphincter_per_frame"],
-                ],
+                self.__frame_window(selected_figure, 0),
                 [
                     [
                         self.visit.visualization_data_list[selected_figure].figure_creator.get_metrics()["len_tubular"],
@@ -729,7 +1035,7 @@ class DashServer:
             return (
                 {"min-height": "30px", "display": "flex", "flex-direction": "row"},
                 {"display": "none", "align-items": "center"},
-                self.visit_figures[self.selected_figure_index],
+                self.client_figures[self.selected_figure_index],
             )
         else:
             # Get endoflip surfacecolors
@@ -754,7 +1060,11 @@ class DashServer:
             figure.data[0].cmin = 0
             figure.data[0].cmax = 30
             self.current_figure = figure
-            return ({"min-height": "30px", "display": "none", "flex-direction": "row"}, {"display": "flex", "align-items": "center"}, figure)
+            return (
+                {"min-height": "30px", "display": "none", "flex-direction": "row"},
+                {"display": "flex", "align-items": "center"},
+                self.__client_figure(figure),
+            )
 
     def __update_endoflip_table(self, chosen_agg):
         """
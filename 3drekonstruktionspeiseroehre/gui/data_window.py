@@ -1,16 +1,14 @@
 import os
-import pickle
 import re
 from pathlib import Path
 import config
-from io import BytesIO
 import copy
 
 from PyQt6 import uic, QtWidgets
 from utils.path_utils import resource_path
 from PyQt6.QtGui import QAction
-from PyQt6.QtWidgets import QMainWindow, QMessageBox, QFileDialog, QCompleter
-from PyQt6.QtCore import Qt, QDate, QSortFilterProxyModel
+from PyQt6.QtWidgets import QMainWindow, QMessageBox, QFileDialog, QCompleter, QProgressDialog
+from PyQt6.QtCore import Qt, QDate, QEvent, QStringListModel, QTimer
 from logic.patient_data import PatientData
 from gui.master_window import MasterWindow
 from gui.info_window import InfoWindow
@@ -19,11 +17,14 @@ from gui.show_message import ShowMessage
 from gui.dci_selection_window import DCISelectionWindow
 from gui.visualization_window import VisualizationWindow
 from gui.download_data_menu import DownloadData
+from gui.lazy_image_list import LazyImageList, pixmap_cache
+from gui.full_image_window import FullImageWindow
 from logic.datainput.endoflip_data_processing import process_endoflip_xlsx, conduct_endoflip_file_upload, process_and_upload_endoflip_images
 from logic.datainput.endoscopy_data_processing import process_and_upload_endoscopy_images
 from logic.datainput.barium_swallow_data_processing import process_and_upload_barium_swallow_images
 from logic.datainput.manometry_data_processing import process_and_upload_manometry_file
 from logic.datainput.endosonography_data_processing import process_and_upload_endosonography_images
+from logic.datainput.video_transfer import VideoUploadWorker, VideoDownloadWorker, start_video_transfer
 from logic.database import database
 from logic.datainput.validate_input_data import DataValidation
 from logic.datainput.check_data_existence import CheckDataExistence
@@ -44,9 +45,10 @@ from logic.services.lhm_service import LHMService
 from logic.services.poem_service import POEMService
 from logic.services.gerd_service import GerdService
 from logic.services.reconstruction_service import ReconstructionService
+from logic.services.reconstruction_storage_service import ReconstructionStorageService
+from logic.services.visit_bundle_service import VisitBundleService
 from logic.database.pyqt_models import CustomPatientModel, CustomPreviousTherapyModel, CustomVisitsModel
 from logic.visit_data import VisitData
-from logic.visualization_data import VisualizationData
 from logic.dataoutput.export_data import ExportData
 from logic.dataoutput.vtkhdf_exporter import run_mass_export_with_progress
 
@@ -60,7 +62,6 @@ class DataWindow(QMainWindow):
         self.selected_previous_therapy = None
 
         self.patient_model = None
-        self.patient_proxyModel = None
         self.previous_therapies_model = None
         self.visit_model = None
 
@@ -114,15 +115,14 @@ class DataWindow(QMainWindow):
         self.medication_service = MedicationService(self.db)
         self.export_data = ExportData(self.db)
         self.reconstruction_service = ReconstructionService(self.db)
+        self.reconstruction_storage_service = ReconstructionStorageService(self.db)
+        self.visit_bundle_service = VisitBundleService(self.db)
 
         # Data from DB have to be loaded into the correct data-structure for processing
         self.patient_data: PatientData = patient_data
         self.default_path = str(Path.home())
         self.import_filenames = []
         self.xray_filenames = []
-        self.endoscopy_image_positions = []
-        self.endoscopy_files = []
-        self.endoflip_screenshot = None
 
         # Add Download Button to UI
         menu_button = QAction("Download Data", self)
@@ -155,6 +155,12 @@ class DataWindow(QMainWindow):
         self.ui.firstdiagnosis_radio.toggled.connect(self.__patients_apply_filter)
         self.ui.firstsymptoms_radio.toggled.connect(self.__patients_apply_filter)
         self.ui.center_radio.toggled.connect(self.__patients_apply_filter)
+        self.patient_filter_timer = QTimer(self)
+        self.patient_filter_timer.setSingleShot(True)
+        self.patient_filter_timer.setInterval(config.patient_filter_debounce_ms)
+        self.patient_filter_timer.timeout.connect(self.__patient_text_debounced)
+        self.ui.patient_id_field.textEdited.connect(self.__patient_text_edited)
+        self.ui.center_text.textEdited.connect(self.__patient_text_edited)
         # Previous Therapies
         self.ui.previous_therapy_add_button.clicked.connect(self.__previous_therapy_add_button_clicked)
         self.ui.previous_therapy_delete_button.clicked.connect(self.__previous_therapy_delete_button_clicked)
@@ -222,6 +228,17 @@ class DataWindow(QMainWindow):
         self.ui.endoflip_next_button.clicked.connect(self.__endoflip_next_button_clicked)
         self.ui.endosono_previous_button.clicked.connect(self.__endosonography_previous_button_clicked)
         self.ui.endosono_next_button.clicked.connect(self.__endosonography_next_button_clicked)
+        # A double-click on an image viewer shows the image in full resolution
+        self.image_viewers = {
+            self.ui.tbe_imageview: "barium_swallow",
+            self.ui.endoscopy_imageview: "endoscopy",
+            self.ui.endoflip_imageview: "endoflip",
+            self.ui.endosono_imageview: "endosono",
+        }
+        for image_viewer in self.image_viewers:
+            image_viewer.installEventFilter(self)
+        pixmap_cache().image_loaded.connect(self.__on_image_loaded)
+        pixmap_cache().image_load_failed.connect(self.__on_image_load_failed)
         self.model_enabled = self.ui.use_model_checkbox
         self.model_enabled_checked = False
         self.model_enabled.toggled.connect(self.__on_model_enabled_toggled)
@@ -288,6 +305,55 @@ class DataWindow(QMainWindow):
 
     # Function of the UI
 
+    def eventFilter(self, watched, event):
+        if event.type() == QEvent.Type.MouseButtonDblClick and watched in self.image_viewers:
+            self.__show_full_resolution_image(self.image_viewers[watched])
+            return True
+        return super().eventFilter(watched, event)
+
+    def __image_list(self, image_type, ids, load_image, height):
+        """
+        Images of an image viewer, they are decoded in the background when they are viewed
+        :param image_type: image_type of the thumbnails
+        :param ids: database IDs of the images
+        :param load_image: service method returning the full resolution QPixmap of an ID
+        :param height: height in px the images are displayed with
+        """
+        return LazyImageList(image_type, ids or [], height, load_image)
+
+    def __on_image_loaded(self, key):
+        # Show the image if it is the current image of one of the viewers
+        for viewer_name, load_viewer_image in (
+            ("barium_swallow", self.__load_barium_swallow_image),
+            ("endoscopy", self.__load_endoscopy_image),
+            ("endoflip", self.__load_endoflip_image),
+            ("endosono", self.__load_endosonography_image),
+        ):
+            images = getattr(self, f"{viewer_name}_pixmaps", None)
+            if images and images.key(getattr(self, f"{viewer_name}_image_index")) == key:
+                load_viewer_image()
+
+    def __on_image_load_failed(self, key):
+        # Show a note instead of the image if it is the current image of one of the viewers, the viewer keeps
+        # its size (the image is requested again when it is viewed the next time)
+        for viewer_name, image_view in (
+            ("barium_swallow", self.ui.tbe_imageview),
+            ("endoscopy", self.ui.endoscopy_imageview),
+            ("endoflip", self.ui.endoflip_imageview),
+            ("endosono", self.ui.endosono_imageview),
+        ):
+            images = getattr(self, f"{viewer_name}_pixmaps", None)
+            if images and images.key(getattr(self, f"{viewer_name}_image_index")) == key:
+                image_view.setText("Image could not be loaded")
+
+    def __show_full_resolution_image(self, viewer_name):
+        images = getattr(self, f"{viewer_name}_pixmaps", None)
+        if not images:
+            return
+        pixmap = images.full_image(getattr(self, f"{viewer_name}_image_index"))
+        if pixmap is not None:
+            FullImageWindow(pixmap).exec()
+
     def __menu_button_clicked(self):
         """
         Info button callback. Shows information about the data window
@@ -296,17 +362,13 @@ class DataWindow(QMainWindow):
         info_window.show_data_window_info()
         info_window.show()
 
-    def __initialize_patient_model(self, filter_column: int = 6, filter_expression: str = ".*"):
-        self.patients = self.patient_service.get_all_patients()
-        self.patient_model = CustomPatientModel(self.patients)
-        self.patient_proxyModel = QSortFilterProxyModel()
-        self.patient_proxyModel.setSourceModel(self.patient_model)
-        self.patient_proxyModel.setFilterKeyColumn(filter_column)
-        self.patient_proxyModel.setFilterRegularExpression(filter_expression)
-
-    def __init_ui(self, filter_column: int = 6, filter_expression: str = ".*"):
-        self.__initialize_patient_model(filter_column, filter_expression)
-        self.patient_tableView.setModel(self.patient_proxyModel)
+    def __init_ui(self):
+        if self.patient_model is not None:
+            # Reload the patients, the filters and the sorting are kept
+            self.patient_model.refresh()
+            return
+        self.patient_model = CustomPatientModel()
+        self.patient_tableView.setModel(self.patient_model)
         self.patient_tableView.setSortingEnabled(True)
         self.patient_tableView.verticalHeader().setDefaultSectionSize(30)
         self.patient_tableView.setColumnWidth(0, 50)
@@ -316,13 +378,8 @@ class DataWindow(QMainWindow):
         self.patient_tableView.clicked.connect(self.__select_patient)
         # self.tableView.hideColumn(0)
 
-        # Collect all patient_ids in a list to make auto-complete suggestions
-        if self.patients is not None:
-            self.patient_suggestions = [entry["patient_id"] for entry in self.patients]
-        else:
-            self.patient_suggestions = []
-
-        # Set up QCompleter with autocomplete suggestions
+        # Auto-complete suggestions of patient_ids, queried for the entered prefix
+        self.patient_suggestions = QStringListModel(self)
         completer = QCompleter(self.patient_suggestions, self)
         # Case-insensitive autocomplete
         completer.setCaseSensitivity(Qt.CaseSensitivity.CaseInsensitive)
@@ -330,6 +387,19 @@ class DataWindow(QMainWindow):
 
         self.ui.patient_id_field.editingFinished.connect(self.__patient_id_filled)
 
+    def __patient_text_edited(self):
+        # Filters and suggestions are queried when the user stopped typing
+        self.patient_filter_timer.start()
+
+    def __patient_text_debounced(self):
+        prefix = self.ui.patient_id_field.text()
+        self.patient_suggestions.setStringList(
+            self.patient_service.get_patient_ids_with_prefix(prefix, config.patient_suggestions_limit) or []
+        )
+        if self.ui.patient_id_field.hasFocus() and prefix:
+            self.ui.patient_id_field.completer().complete()
+        self.__patients_apply_filter()
+
     # Patient Functions
 
     def __patient_add_button_clicked(self):
@@ -584,33 +654,27 @@ class DataWindow(QMainWindow):
         self.ui.visit_data.setEnabled(False)
 
     def __patients_apply_filter(self):
+        filters = {}
         if self.ui.patient_id_radio.isChecked():
-            filter_exp = "^" + self.ui.patient_id_field.text()  # all patient that start with this id are shown
-            self.__init_ui(filter_column=0, filter_expression=filter_exp)
+            filters["patient_id"] = self.ui.patient_id_field.text()  # all patient that start with this id are shown
         if self.ui.birthyear_radio.isChecked():
-            filter_exp = str(self.ui.birthyear_calendar.date().toPyDate().year)
-            self.__init_ui(filter_column=3, filter_expression=filter_exp)
+            filters["birth_year"] = self.ui.birthyear_calendar.date().toPyDate().year
         if self.ui.height_radio.isChecked():
-            filter_exp = str(self.ui.height_cm_spin.value())
-            self.__init_ui(filter_column=7, filter_expression=filter_exp)
+            filters["height_cm"] = self.ui.height_cm_spin.value()
         if self.ui.gender_radio.isChecked():
-            filter_exp = "^" + self.ui.gender_dropdown.currentText() + "$"
-            self.__init_ui(filter_column=1, filter_expression=filter_exp)
+            filters["gender"] = self.ui.gender_dropdown.currentText()
         if self.ui.ethnicity_radio.isChecked():
-            filter_exp = "^" + self.ui.ethnicity_dropdown.currentText() + "$"
-            self.__init_ui(filter_column=2, filter_expression=filter_exp)
+            filters["ethnicity"] = self.ui.ethnicity_dropdown.currentText()
         if self.ui.firstdiagnosis_radio.isChecked():
-            filter_exp = str(self.ui.firstdiagnosis_calendar.date().toPyDate().year)
-            self.__init_ui(filter_column=4, filter_expression=filter_exp)
+            filters["year_first_diagnosis"] = self.ui.firstdiagnosis_calendar.date().toPyDate().year
         if self.ui.firstsymptoms_radio.isChecked():
-            filter_exp = str(self.ui.firstsymptoms_calendar.date().toPyDate().year)
-            self.__init_ui(filter_column=5, filter_expression=filter_exp)
+            filters["year_first_symptoms"] = self.ui.firstsymptoms_calendar.date().toPyDate().year
         if self.ui.center_radio.isChecked():
-            filter_exp = "^" + self.ui.center_text.text()  # all patients whos centers start with this string
-            self.__init_ui(filter_column=6, filter_expression=filter_exp)
+            filters["center"] = self.ui.center_text.text()  # all patients whos centers start with this string
+        self.patient_model.set_filters(filters)
 
     def __patients_reset_filter_button_clicked(self):
-        self.__init_ui(filter_column=6, filter_expression=".*")
+        self.patient_model.set_filters({})
         # Uncheck Patient Id
         self.ui.patient_id_radio.setAutoExclusive(False)
         self.ui.patient_id_radio.setChecked(False)
@@ -831,7 +895,8 @@ class DataWindow(QMainWindow):
 
         # Show Images
         # Barium Swallow
-        barium_swallow_images = self.barium_swallow_file_service.get_barium_swallow_images_for_visit(self.selected_visit)
+        barium_swallow_ids = self.barium_swallow_file_service.get_barium_swallow_file_ids_for_visit(self.selected_visit)
+        barium_swallow_images = self.__image_list("barium_swallow", barium_swallow_ids, self.barium_swallow_file_service.get_barium_swallow_image, 200)
         barium_swallow_minutes = self.barium_swallow_file_service.get_barium_swallow_minutes_for_visit(self.selected_visit)
         if barium_swallow_images and barium_swallow_minutes:
             self.barium_swallow_pixmaps = barium_swallow_images
@@ -844,7 +909,8 @@ class DataWindow(QMainWindow):
             self.ui.tbe_imagedescription_text.setText("")
 
         # Endoscopy
-        endoscopy_images = self.endoscopy_file_service.get_endoscopy_images_for_visit(self.selected_visit)
+        endoscopy_ids = self.endoscopy_file_service.get_endoscopy_file_ids_for_visit(self.selected_visit)
+        endoscopy_images = self.__image_list("endoscopy", endoscopy_ids, self.endoscopy_file_service.get_endoscopy_image, 200)
         endoscopy_positions = self.endoscopy_file_service.get_endoscopy_positions_for_visit(self.selected_visit)
         if endoscopy_images and endoscopy_positions:
             self.endoscopy_pixmaps = endoscopy_images
@@ -857,7 +923,8 @@ class DataWindow(QMainWindow):
             self.ui.endoscopy_imagedescription_text.setText("")
 
         # EndoFlip
-        endoflip_images = self.endoflip_image_service.get_endoflip_images_for_visit(self.selected_visit)
+        endoflip_ids = self.endoflip_image_service.get_endoflip_image_ids_for_visit(self.selected_visit)
+        endoflip_images = self.__image_list("endoflip", endoflip_ids, self.endoflip_image_service.get_endoflip_image, 400)
         endoflip_timepoints = self.endoflip_image_service.get_endoflip_timepoints_for_visit(self.selected_visit)
         if endoflip_images and endoflip_timepoints:
             self.endoflip_pixmaps = endoflip_images
@@ -870,7 +937,8 @@ class DataWindow(QMainWindow):
             self.ui.endoflip_imagedescription_text.setText("")
 
         # Endosonography
-        endosono_images = self.endosonography_image_service.get_endosonography_images_for_visit(self.selected_visit)
+        endosono_ids = self.endosonography_image_service.get_endosonography_image_ids_for_visit(self.selected_visit)
+        endosono_images = self.__image_list("endosonography", endosono_ids, self.endosonography_image_service.get_endosonography_image, 200)
         endosono_positions = self.endosonography_image_service.get_endosonography_positions_for_visit(self.selected_visit)
         if endosono_images and endosono_positions:
             self.endosono_pixmaps = endosono_images
@@ -1074,7 +1142,7 @@ class DataWindow(QMainWindow):
         Timed Barium Swallow (TBE) button callback. Handles TBE file selection.
         """
         # If TBE images are already uploaded in the database, images are deleted and updated with new images
-        barium_swallow_exists = self.barium_swallow_file_service.get_barium_swallow_images_for_visit(self.selected_visit)
+        barium_swallow_exists = self.barium_swallow_file_service.get_barium_swallow_file_ids_for_visit(self.selected_visit)
         if not barium_swallow_exists or barium_swallow_exists and ShowMessage.to_update_for_visit("TBE Images"):
             self.barium_swallow_file_service.delete_barium_swallow_files_for_visit(self.selected_visit)
 
@@ -1095,10 +1163,11 @@ class DataWindow(QMainWindow):
 
             # if all images are named in the correct format, process and upload them
             if not error:
-                process_and_upload_barium_swallow_images(self.selected_visit, filenames)
-                self.ui.tbe_file_text.setText(str(len(filenames)) + " Image(s) uploaded")
-                # load the pixmaps of the images to make them viewable
-                barium_swallow_images = self.barium_swallow_file_service.get_barium_swallow_images_for_visit(self.selected_visit)
+                uploaded = process_and_upload_barium_swallow_images(self.selected_visit, filenames)
+                self.ui.tbe_file_text.setText(str(uploaded) + " Image(s) uploaded")
+                # the pixmaps of the images are loaded when they are viewed
+                barium_swallow_ids = self.barium_swallow_file_service.get_barium_swallow_file_ids_for_visit(self.selected_visit)
+                barium_swallow_images = self.__image_list("barium_swallow", barium_swallow_ids, self.barium_swallow_file_service.get_barium_swallow_image, 200)
                 barium_swallow_minutes = self.barium_swallow_file_service.get_barium_swallow_minutes_for_visit(self.selected_visit)
                 if barium_swallow_images:
                     self.barium_swallow_pixmaps = barium_swallow_images
@@ -1111,12 +1180,16 @@ class DataWindow(QMainWindow):
     def __load_barium_swallow_image(self):
         # Load and display the current image
         if 0 <= self.barium_swallow_image_index < len(self.barium_swallow_pixmaps):
-            scaled_pixmap = self.barium_swallow_pixmaps[self.barium_swallow_image_index].scaledToHeight(200)
-            scaled_size = scaled_pixmap.size()
-            self.ui.tbe_imageview.setPixmap(scaled_pixmap)
-            self.ui.tbe_imageview.setFixedSize(scaled_size)
+            pixmap = self.barium_swallow_pixmaps[self.barium_swallow_image_index]
             text = "Minute of image: " + str(self.barium_swallow_minutes[self.barium_swallow_image_index])
             self.ui.tbe_imagedescription_text.setText(text)
+            if pixmap is None or pixmap.isNull():
+                # The image is decoded in the background and shown by __on_image_loaded, the viewer keeps its
+                # size until then
+                self.ui.tbe_imageview.clear()
+                return
+            self.ui.tbe_imageview.setPixmap(pixmap)
+            self.ui.tbe_imageview.setFixedSize(pixmap.size())
             self.ui.tbe_imageview.update()
 
     def __barium_swallow_previous_button_clicked(self):
@@ -1161,7 +1234,7 @@ class DataWindow(QMainWindow):
         Endoscopy button callback. Handles endoscopy image selection.
         """
         # If endoscopy images are already uploaded in the database, images are deleted and updated with new images
-        endoscopy_exists = self.endoscopy_file_service.get_endoscopy_images_for_visit(self.selected_visit)
+        endoscopy_exists = self.endoscopy_file_service.get_endoscopy_file_ids_for_visit(self.selected_visit)
         if not endoscopy_exists or endoscopy_exists and ShowMessage.to_update_for_visit("Endoscopy Images"):
             self.endoscopy_file_service.delete_endoscopy_file_for_visit(self.selected_visit)
 
@@ -1184,11 +1257,12 @@ class DataWindow(QMainWindow):
 
             # if all images have valid names, process and upload them
             if not error:
-                process_and_upload_endoscopy_images(self.selected_visit, filenames)
-                self.ui.egd_file_text.setText(str(len(filenames)) + " Image(s) uploaded")
+                uploaded = process_and_upload_endoscopy_images(self.selected_visit, filenames)
+                self.ui.egd_file_text.setText(str(uploaded) + " Image(s) uploaded")
 
-                # load the pixmaps of the images to make them viewable
-                endoscopy_images = self.endoscopy_file_service.get_endoscopy_images_for_visit(self.selected_visit)
+                # the pixmaps of the images are loaded when they are viewed
+                endoscopy_ids = self.endoscopy_file_service.get_endoscopy_file_ids_for_visit(self.selected_visit)
+                endoscopy_images = self.__image_list("endoscopy", endoscopy_ids, self.endoscopy_file_service.get_endoscopy_image, 200)
                 endoscopy_positions = self.endoscopy_file_service.get_endoscopy_positions_for_visit(self.selected_visit)
                 if endoscopy_images:
                     self.endoscopy_pixmaps = endoscopy_images
@@ -1201,12 +1275,16 @@ class DataWindow(QMainWindow):
     def __load_endoscopy_image(self):
         # Load and display the current image
         if 0 <= self.endoscopy_image_index < len(self.endoscopy_pixmaps):
-            scaled_pixmap = self.endoscopy_pixmaps[self.endoscopy_image_index].scaledToHeight(200)
-            scaled_size = scaled_pixmap.size()
-            self.ui.endoscopy_imageview.setPixmap(scaled_pixmap)
-            self.ui.endoscopy_imageview.setFixedSize(scaled_size)
+            pixmap = self.endoscopy_pixmaps[self.endoscopy_image_index]
             text = "Image position: " + str(self.endoscopy_positions[self.endoscopy_image_index])
             self.ui.endoscopy_imagedescription_text.setText(text)
+            if pixmap is None or pixmap.isNull():
+                # The image is decoded in the background and shown by __on_image_loaded, the viewer keeps its
+                # size until then
+                self.ui.endoscopy_imageview.clear()
+                return
+            self.ui.endoscopy_imageview.setPixmap(pixmap)
+            self.ui.endoscopy_imageview.setFixedSize(pixmap.size())
             self.ui.endoscopy_imageview.update()
 
     def __endoscopy_previous_button_clicked(self):
@@ -1267,7 +1345,7 @@ class DataWindow(QMainWindow):
 
     def __init_endoflip(self):
         endoflip = self.endoflip_service.get_endoflip_for_visit(self.selected_visit)
-        endoflip_file = self.endoflip_file_service.get_endoflip_files_for_visit(self.selected_visit)
+        endoflip_file = self.endoflip_file_service.get_endoflip_file_timepoints_for_visit(self.selected_visit)
         self.ui.endoflip_text.setText(setText.set_text_two(endoflip, "EndoFlip data", endoflip_file, description2="EndoFlip file(s)"))
 
     def __delete_endoflip(self):
@@ -1279,7 +1357,7 @@ class DataWindow(QMainWindow):
         """
         EndoFLIP-file button callback. Handles EndoFLIP .xlsx file selection.
         """
-        endoflip_file_exists = self.endoflip_file_service.get_endoflip_files_for_visit(self.selected_visit)
+        endoflip_file_exists = self.endoflip_file_service.get_endoflip_file_timepoints_for_visit(self.selected_visit)
         if not endoflip_file_exists or endoflip_file_exists and ShowMessage.to_update_for_visit("Endoflip files"):
             self.endoflip_file_service.delete_endoflip_file_for_visit(self.selected_visit)
             filenames, _ = QFileDialog.getOpenFileNames(self, "Select file", self.default_path, "Excel (*.xlsx *.XLSX)")
@@ -1318,7 +1396,7 @@ class DataWindow(QMainWindow):
                 self.default_path = os.path.dirname(filename)
 
     def __upload_endoflip_image(self):
-        endoflip_image_exists = self.endoflip_image_service.get_endoflip_images_for_visit(self.selected_visit)
+        endoflip_image_exists = self.endoflip_image_service.get_endoflip_image_ids_for_visit(self.selected_visit)
         if not endoflip_image_exists or endoflip_image_exists and ShowMessage.to_update_for_visit("Endoflip images"):
             self.endoflip_image_service.delete_endoflip_images_for_visit(self.selected_visit)
             filenames, _ = QFileDialog.getOpenFileNames(self, "Select Files", self.default_path, "Images (*.jpg *.JPG *.png *.PNG)")
@@ -1338,10 +1416,11 @@ class DataWindow(QMainWindow):
                     break
 
             if not error:
-                process_and_upload_endoflip_images(self.selected_visit, filenames)
-                self.ui.endoflip_imagedescription_text.setText(str(len(filenames)) + " Image(s) uploaded")
-                # load the pixmaps of the images to make them viewable
-                endoflip_images = self.endoflip_image_service.get_endoflip_images_for_visit(self.selected_visit)
+                uploaded = process_and_upload_endoflip_images(self.selected_visit, filenames)
+                self.ui.endoflip_imagedescription_text.setText(str(uploaded) + " Image(s) uploaded")
+                # the pixmaps of the images are loaded when they are viewed
+                endoflip_ids = self.endoflip_image_service.get_endoflip_image_ids_for_visit(self.selected_visit)
+                endoflip_images = self.__image_list("endoflip", endoflip_ids, self.endoflip_image_service.get_endoflip_image, 400)
                 endoflip_timepoints = self.endoflip_image_service.get_endoflip_timepoints_for_visit(self.selected_visit)
                 if endoflip_images:
                     self.endoflip_pixmaps = endoflip_images
@@ -1354,12 +1433,16 @@ class DataWindow(QMainWindow):
     def __load_endoflip_image(self):
         # Load and display the current image
         if 0 <= self.endoflip_image_index < len(self.endoflip_pixmaps):
-            scaled_pixmap = self.endoflip_pixmaps[self.endoflip_image_index].scaledToHeight(400)
-            scaled_size = scaled_pixmap.size()
-            self.ui.endoflip_imageview.setPixmap(scaled_pixmap)
-            self.ui.endoflip_imageview.setFixedSize(scaled_size)
+            pixmap = self.endoflip_pixmaps[self.endoflip_image_index]
             text = "Image timepoint: " + str(self.endoflip_timepoints[self.endoflip_image_index])
             self.ui.endoflip_imagedescription_text.setText(text)
+            if pixmap is None or pixmap.isNull():
+                # The image is decoded in the background and shown by __on_image_loaded, the viewer keeps its
+                # size until then
+                self.ui.endoflip_imageview.clear()
+                return
+            self.ui.endoflip_imageview.setPixmap(pixmap)
+            self.ui.endoflip_imageview.setFixedSize(pixmap.size())
             self.ui.endoflip_imageview.update()
 
     def __endoflip_previous_button_clicked(self):
@@ -1379,7 +1462,7 @@ class DataWindow(QMainWindow):
         Endosonography button callback. Handles Endosonography file selection.
         """
         # If endosonography images are already uploaded in the database, images are deleted and updated with new images
-        endosono_exists = self.endosonography_image_service.get_endosonography_images_for_visit(self.selected_visit)
+        endosono_exists = self.endosonography_image_service.get_endosonography_image_ids_for_visit(self.selected_visit)
         if not endosono_exists or endosono_exists and ShowMessage.to_update_for_visit("Endosonography Images"):
             self.endosonography_image_service.delete_endosonography_file_for_visit(self.selected_visit)
 
@@ -1402,10 +1485,11 @@ class DataWindow(QMainWindow):
 
             # if all images are named in the correct format, process and upload them
             if not error:
-                process_and_upload_endosonography_images(self.selected_visit, filenames)
-                self.ui.endosono_images_text.setText(str(len(filenames)) + " Images(s) uploaded")
-                # load the pixmaps of the images to make them viewable
-                endosono_images = self.endosonography_image_service.get_endosonography_images_for_visit(self.selected_visit)
+                uploaded = process_and_upload_endosonography_images(self.selected_visit, filenames)
+                self.ui.endosono_images_text.setText(str(uploaded) + " Images(s) uploaded")
+                # the pixmaps of the images are loaded when they are viewed
+                endosono_ids = self.endosonography_image_service.get_endosonography_image_ids_for_visit(self.selected_visit)
+                endosono_images = self.__image_list("endosonography", endosono_ids, self.endosonography_image_service.get_endosonography_image, 200)
                 endosono_positions = self.endosonography_image_service.get_endosonography_positions_for_visit(self.selected_visit)
                 if endosono_images:
                     self.endosono_pixmaps = endosono_images
@@ -1418,12 +1502,16 @@ class DataWindow(QMainWindow):
     def __load_endosonography_image(self):
         # Load and display the current image
         if 0 <= self.endosono_image_index < len(self.endosono_pixmaps):
-            scaled_pixmap = self.endosono_pixmaps[self.endosono_image_index].scaledToHeight(200)
-            scaled_size = scaled_pixmap.size()
-            self.ui.endosono_imageview.setPixmap(scaled_pixmap)
-            self.ui.endosono_imageview.setFixedSize(scaled_size)
+            pixmap = self.endosono_pixmaps[self.endosono_image_index]
             text = "Position of image: " + str(self.endosono_positions[self.endosono_image_index])
             self.ui.endosono_imagedescription_text.setText(text)
+            if pixmap is None or pixmap.isNull():
+                # The image is decoded in the background and shown by __on_image_loaded, the viewer keeps its
+                # size until then
+                self.ui.endosono_imageview.clear()
+                return
+            self.ui.endosono_imageview.setPixmap(pixmap)
+            self.ui.endosono_imageview.setFixedSize(pixmap.size())
             self.ui.endosono_imageview.update()
 
     def __endosonography_previous_button_clicked(self):
@@ -1443,20 +1531,50 @@ class DataWindow(QMainWindow):
         if not endosono_exists or endosono_exists and ShowMessage.to_update_for_visit("Endosonography videos"):
             self.endosonography_video_service.delete_videos_for_visit(visit_id=self.selected_visit)
             filenames, _ = QFileDialog.getOpenFileNames(self, "Select Files", self.default_path, "Video Files (*.avi)")
-            for filename in filenames:
-                self.endosonography_video_service.save_video_for_visit(visit_id=self.selected_visit, video_file_path=filename)
-            self.ui.endosono_videos_text.setText(str(len(filenames)) + " Videos(s) uploaded")
             if filenames:
-                self.default_path = os.path.dirname(filename)
+                self.default_path = os.path.dirname(filenames[-1])
+                # the videos are streamed into the database in the background
+                self.__start_video_transfer(VideoUploadWorker(self.selected_visit, filenames), "Uploading endosonography videos")
+            else:
+                self.ui.endosono_videos_text.setText("0 Videos(s) uploaded")
 
     def __download_endosonography_video(self):
         destination_directory = QFileDialog.getExistingDirectory(self, "Select Directory")
         if destination_directory:
-            videos = self.endosonography_video_service.get_endosonography_videos_for_visit(visit_id=self.selected_visit)
-            for i, video_data in enumerate(videos):
-                path = os.path.join(destination_directory, f"{i}.mp4")
-                with open(path, "wb") as f:
-                    f.write(video_data)
+            oids = self.endosonography_video_service.get_video_oids_for_visit(self.selected_visit)
+            if not oids:
+                ShowMessage.no_data_to_download("videos")
+                return
+            # the videos are streamed into the files in the background
+            self.__start_video_transfer(VideoDownloadWorker(oids, destination_directory), "Downloading endosonography videos")
+
+    def __start_video_transfer(self, worker, label_text):
+        self.video_transfer_worker = worker
+        self.video_progress_dialog = QProgressDialog(label_text, "Cancel", 0, 100, self)
+        self.video_progress_dialog.setWindowTitle("Processing...")
+        self.video_progress_dialog.setWindowModality(Qt.WindowModality.WindowModal)
+        self.video_progress_dialog.setAutoClose(False)
+        self.video_progress_dialog.setAutoReset(False)
+        self.video_progress_dialog.canceled.connect(worker.cancel)
+        worker.signals.progress_value.connect(self.video_progress_dialog.setValue)
+        worker.signals.finished.connect(self.__video_transfer_finished)
+        worker.signals.error_occurred.connect(self.__video_transfer_failed)
+        self.video_progress_dialog.show()
+        start_video_transfer(worker)
+
+    def __video_transfer_finished(self, transferred):
+        if isinstance(self.video_transfer_worker, VideoUploadWorker):
+            self.ui.endosono_videos_text.setText(str(transferred) + " Videos(s) uploaded")
+        self.__close_video_transfer()
+
+    def __video_transfer_failed(self, error_message):
+        self.__close_video_transfer()
+        QMessageBox.critical(self, "Error", "The videos could not be transferred:\n\n" + error_message)
+
+    def __close_video_transfer(self):
+        self.video_progress_dialog.close()
+        self.video_progress_dialog = None
+        self.video_transfer_worker = None
 
     def __add_botox_injection(self):
         botox_dict = {"visit_id": self.selected_visit, "botox_units": self.ui.botox_units_spin.value(), "botox_height": self.ui.botox_height_spin.value()}
@@ -1682,7 +1800,7 @@ class DataWindow(QMainWindow):
             self.__init_poem()
 
     def __init_visualization(self):
-        reconstruction = self.reconstruction_service.get_reconstruction_for_visit(self.selected_visit)
+        reconstruction = self.reconstruction_storage_service.has_reconstruction(self.selected_visit)
         if reconstruction:
             self.ui.visitdata_create_visualization_button.setText(
                 "Create Visualization for selected Patient and selected Visit - A Reconstruction is saved in the DB"
@@ -1695,55 +1813,22 @@ class DataWindow(QMainWindow):
             self.ui.visits_create_visualization_button.setText("Create Visualization for selected Patient and selected Visit")
 
     def __create_visualization(self):
-        barium_swallow_files = self.barium_swallow_file_service.get_barium_swallow_files_for_visit(self.selected_visit)
-        manometry_file = self.manometry_file_service.get_manometry_file_for_visit(self.selected_visit)
-        reconstruction = self.reconstruction_service.get_reconstruction_for_visit(self.selected_visit)
-
-        patient = self.patient_service.get_patient(self.selected_patient)
-        visit = self.visit_service.get_visit(self.selected_visit)
-        visit_name = (
-            "[Visit_ID_" + str(self.selected_visit) + "]_" + patient.patient_id + "_" + visit.visit_type.replace(" ", "") + "_" + str(visit.year_of_visit)
-        )
+        bundle = self.visit_bundle_service.get_visit_bundle(self.selected_visit)
+        if bundle is None:
+            return
+        visit_name = bundle.name
 
-        if not reconstruction or reconstruction and not ShowMessage.load_saved_reconstruction():
+        if not bundle.has_reconstruction or bundle.has_reconstruction and not ShowMessage.load_saved_reconstruction():
 
-            if barium_swallow_files is None or manometry_file is None:
+            if not bundle.barium_swallow_files or bundle.manometry_file is None:
                 QMessageBox.critical(
                     self, "Missing Data", "The Manometry file and at least one barium swallow image " "are necessary for the 3D reconstruction."
                 )
                 return
             else:
                 visit = VisitData(visit_name)
-
-                for file in barium_swallow_files:
-                    visualization_data = VisualizationData()
-                    visualization_data.xray_minute = file.minute_of_picture
-                    visualization_data.xray_file = BytesIO(file.file)
-                    visualization_data.use_model = self.model_enabled_checked
-                    pressure_matrix = pickle.loads(manometry_file.pressure_matrix)
-                    visualization_data.pressure_matrix = pressure_matrix
-
-                    endoscopy = self.endoscopy_file_service.get_endoscopy_files_for_visit(self.selected_visit)
-                    if endoscopy:
-                        endoscopy_image_positions_cm = []
-                        endoscopy_images = []
-                        for endoscopy_file in endoscopy:
-                            endoscopy_image_positions_cm.append(endoscopy_file.image_position)
-                            endoscopy_images.append(BytesIO(endoscopy_file.file))
-
-                        self.endoscopy_image_positions = endoscopy_image_positions_cm
-                        self.endoscopy_files = endoscopy_images
-
-                    visualization_data.endoscopy_image_positions_cm = self.endoscopy_image_positions
-                    visualization_data.endoscopy_files = self.endoscopy_files
-
-                    endoflip = self.endoflip_file_service.get_endoflip_files_for_visit(self.selected_visit)
-                    if endoflip is not None:
-                        # The first endoflip screenshot is used, because the app can only process one endoflip screenshot
-                        visualization_data.endoflip_screenshot = pickle.loads(endoflip[0].screenshot)
-                    else:
-                        visualization_data.endoflip_screenshot = self.endoflip_screenshot
-
+                # The pressure matrix, endoscopy images and EndoFLIP screenshot are shared by all images of the visit
+                for visualization_data in bundle.create_visualization_data(self.model_enabled_checked):
                     visit.add_visualization(visualization_data)
 
                 # Add the new visit to patient data
@@ -1753,7 +1838,10 @@ class DataWindow(QMainWindow):
                 self.master_window.switch_to(DCISelectionWindow(self.master_window, self.patient_data, visit))
 
         else:
-            reconstruction = pickle.loads(reconstruction.reconstruction_file)
+            reconstruction = self.reconstruction_storage_service.load_visit_data(self.selected_visit)
+            if reconstruction is None:
+                return
+            reconstruction.name = visit_name
 
             # Add the reconstruction to patient data
             # When extending from visualization, this should add alongside existing reconstructions
@@ -1784,6 +1872,7 @@ class DataWindow(QMainWindow):
             "No vertex pressure data (~5MB)",
             "Per-slice HRM pressure data (compact per-height values) (~10MB)",
             "All vertex pressure data (Complete data, potentially large files, ~100MB+)",
+            "All vertex pressure data as one chunked dataset (Complete data, fast ML loading, ~100MB+)",
         ]
 
         dialog_text = (
@@ -1792,6 +1881,7 @@ class DataWindow(QMainWindow):
             "<li><b>No vertex pressure data:</b> Only 3D geometry, metadata, and pressure statistics. Smallest files (~5MB)</li>"
             "<li><b>Per-slice HRM pressure data:</b> Compact per-height values across frames. Smaller files (~10MB)</li>"
             "<li><b>All vertex pressure data:</b> Complete per-vertex pressure data with all frames. Larger files (~100MB+)</li>"
+            "<li><b>As one chunked dataset:</b> Same data stored as a single (frames x vertices) dataset, faster to write and to read frame by frame</li>"
             "</ul>"
             "<br><i>Note: Pressure metadata and statistics are always included in all options.</i>"
         )
@@ -1808,10 +1898,26 @@ class DataWindow(QMainWindow):
         elif "Per-slice" in choice:
             max_frames = -1
             pressure_export_mode = "per_slice"
+        elif "chunked dataset" in choice:
+            max_frames = -1
+            pressure_export_mode = "per_vertex_dataset"
         else:
             max_frames = -1
             pressure_export_mode = "per_vertex"
 
+        format_options = [
+            "One .vtkhdf file per reconstruction (only changed visits are exported again)",
+            "One HDF5 archive with all reconstructions and an index table",
+        ]
+        format_choice, ok = QInputDialog.getItem(
+            self, "Output Format", "How should the reconstructions be stored?", format_options, 0, False
+        )
+
+        if not ok:
+            return  # User cancelled
+
+        output_format = "archive" if "archive" in format_choice else "files"
+
         # Prompt the user to choose a destination directory
         destination_directory = QFileDialog.getExistingDirectory(self, "Select Directory for Mass VTKHDF Export")
 
@@ -1826,6 +1932,7 @@ class DataWindow(QMainWindow):
                 parent_widget=self,
                 max_pressure_frames=max_frames,
                 pressure_export_mode=pressure_export_mode,
+                output_format=output_format,
             )
 
             # Show results to user
@@ -1843,6 +1950,8 @@ class DataWindow(QMainWindow):
                     "Mass Export Successful",
                     f"Mass VTKHDF export completed successfully!\n\n"
                     f"Exported: {results['exported_count']} files\n"
+                    f"Unchanged since the last export: {results['skipped_count']} visits\n"
+                    f"Removed (deleted visits): {results['removed_count']} visits\n"
                     f"Failed: {results['failed_count']} filess\n"
                     f"Output directory: {results['output_directory']}\n\n"
                     f"All VTKHDF files include ML-ready attributes:\n"
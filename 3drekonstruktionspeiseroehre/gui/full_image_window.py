@@ -0,0 +1,26 @@
+from PyQt6.QtWidgets import QDialog, QLabel, QScrollArea, QVBoxLayout
+
+
+class FullImageWindow(QDialog):
+    """Shows an image in full resolution, scrollable if it is larger than the screen"""
+
+    def __init__(self, pixmap, title: str = "Image"):
+        """
+        init FullImageWindow
+        :param pixmap: QPixmap in full resolution
+        :param title: window title
+        """
+        super().__init__()
+        self.setWindowTitle(title)
+        label = QLabel()
+        label.setPixmap(pixmap)
+        scroll_area = QScrollArea()
+        scroll_area.setWidget(label)
+        layout = QVBoxLayout(self)
+        layout.addWidget(scroll_area)
+
+        available = self.screen().availableGeometry()
+        self.resize(
+            min(pixmap.width() + 40, available.width() * 9 // 10),
+            min(pixmap.height() + 40, available.height() * 9 // 10),
+        )
@@ -0,0 +1,141 @@
+from collections import OrderedDict
+from typing import Callable, List
+
+from PyQt6.QtCore import QObject, QRunnable, Qt, QThreadPool, pyqtSignal
+from PyQt6.QtGui import QImage, QPixmap
+from sqlalchemy.exc import OperationalError
+
+import config
+from logic.database import database
+from logic.datainput.thumbnail_generation import load_display_image
+
+
+class ImageLoaderSignals(QObject):
+    # cache key, decoded QImage (None if the image could not be loaded)
+    loaded = pyqtSignal(object, object)
+
+
+class ImageLoader(QRunnable):
+    """Loads and decodes an image in a thread of the global QThreadPool with its own session."""
+
+    def __init__(self, key):
+        """
+        init ImageLoader
+        :param key: (image_type, image_id, height) of the image
+        """
+        super().__init__()
+        self.key = key
+        self.signals = ImageLoaderSignals()
+
+    def run(self):
+        image_type, image_id, height = self.key
+        image = None
+        db = database.get_db()
+        try:
+            data = load_display_image(db, image_type, image_id, height)
+            if data is not None:
+                image = QImage.fromData(data)
+                # QImage (unlike QPixmap) can be scaled outside the GUI thread
+                image = image.scaledToHeight(height, Qt.TransformationMode.SmoothTransformation)
+        except OperationalError as e:
+            # No message box, the loader does not run in the GUI thread
+            print(f"{image_type} image {image_id} could not be loaded: {e}")
+        finally:
+            db.close()
+        self.signals.loaded.emit(self.key, image)
+
+
+class PixmapCache(QObject):
+    """
+    Least recently used pixmaps of the image viewers, shared by all visits. Missing pixmaps are loaded
+    in the background, image_loaded is emitted when a pixmap was added and image_load_failed when the
+    image could not be loaded. Failed images are not cached, they are requested again when viewed.
+    """
+    image_loaded = pyqtSignal(object)
+    image_load_failed = pyqtSignal(object)
+
+    def __init__(self, max_entries: int):
+        super().__init__()
+        self.max_entries = max_entries
+        self.pixmaps = OrderedDict()
+        self.loading = set()
+
+    def get(self, key):
+        pixmap = self.pixmaps.get(key)
+        if pixmap is not None:
+            self.pixmaps.move_to_end(key)
+        return pixmap
+
+    def load(self, key):
+        if key in self.pixmaps or key in self.loading:
+            return
+        self.loading.add(key)
+        loader = ImageLoader(key)
+        loader.signals.loaded.connect(self.__on_loaded)
+        QThreadPool.globalInstance().start(loader)
+
+    def __on_loaded(self, key, image):
+        self.loading.discard(key)
+        if image is None or image.isNull():
+            self.image_load_failed.emit(key)
+            return
+        self.pixmaps[key] = QPixmap.fromImage(image)
+        while len(self.pixmaps) > self.max_entries:
+            self.pixmaps.popitem(last=False)
+        self.image_loaded.emit(key)
+
+
+_pixmap_cache = None
+
+
+def pixmap_cache() -> PixmapCache:
+    """The PixmapCache shared by all image viewers (created on first use, it needs a QApplication)"""
+    global _pixmap_cache
+    if _pixmap_cache is None:
+        _pixmap_cache = PixmapCache(config.image_cache_max_entries)
+    return _pixmap_cache
+
+
+class LazyImageList:
+    """
+    List of the images of an image viewer. Accessing an image returns its pixmap from the pixmap_cache or
+    None while it is decoded in the background (pixmap_cache().image_loaded is emitted with key(index)
+    when it is available). The previous and next images are prefetched.
+    """
+
+    def __init__(self, image_type: str, ids: List[int], height: int, load_image: Callable):
+        """
+        init LazyImageList
+        :param image_type: image_type of the thumbnails (see thumbnail_generation.IMAGE_TYPES)
+        :param ids: database IDs of the images in display order
+        :param height: height in px the images are displayed with
+        :param load_image: service method returning the full resolution QPixmap of an ID
+        """
+        self.image_type = image_type
+        self.ids = list(ids)
+        self.height = height
+        self.load_image = load_image
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __bool__(self):
+        return bool(self.ids)
+
+    def __getitem__(self, index):
+        cache = pixmap_cache()
+        pixmap = cache.get(self.key(index))
+        if pixmap is None:
+            cache.load(self.key(index))
+        # The neighbours are loaded in advance, so paging through the images does not wait
+        for neighbour in (index + 1, index - 1):
+            if 0 <= neighbour < len(self.ids):
+                cache.load(self.key(neighbour))
+        return pixmap
+
+    def key(self, index):
+        return self.image_type, self.ids[index], self.height
+
+    def full_image(self, index):
+        """The image in full resolution, it is loaded on the GUI thread and not cached"""
+        return self.load_image(self.ids[index])
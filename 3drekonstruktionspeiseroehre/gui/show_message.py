@@ -42,6 +42,11 @@ class ShowMessage:
         QMessageBox.critical(None, f'{fileextension} is no valid format', f'Please choose one of the following formats: ' + ", ".join(
                 acceptable_formats))
 
+    @staticmethod
+    def upload_failed(errors: dict):
+        QMessageBox.critical(None, 'Upload failed', f'The following files could not be uploaded:\n' + "\n".join(
+                f"{filename}: {error}" for filename, error in errors.items()))
+
     @staticmethod
     def update_confirmed():
         reply = QMessageBox.question(None, 'This Patient already exists in the database.',
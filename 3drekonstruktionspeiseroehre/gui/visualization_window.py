@@ -3,9 +3,9 @@ import os
 import pickle
 import re
 
-import numpy as np
 import pandas as pd
 
+import config
 from dash_server import DashServer
 from gui.base_workflow_window import BaseWorkflowWindow
 from gui.drag_and_drop import *
@@ -18,6 +18,7 @@ from logic.patient_data import PatientData
 from logic.visit_data import VisitData
 from logic.database import database
 from logic.services.reconstruction_service import ReconstructionService
+from logic.services.reconstruction_storage_service import ReconstructionStorageService
 
 from PyQt6 import uic
 from utils.path_utils import resource_path
@@ -26,6 +27,7 @@ from PyQt6.QtGui import QFont, QAction
 from PyQt6.QtWebEngineWidgets import QWebEngineView
 from PyQt6.QtWebEngineCore import QWebEngineProfile, QWebEnginePage
 from PyQt6.QtWidgets import (
+    QApplication,
     QFileDialog,
     QLabel,
     QMessageBox,
@@ -35,12 +37,28 @@ from PyQt6.QtWidgets import (
     QStyle,
     QVBoxLayout,
 )
-import pyvista as pv
+
+
+# Sets the frame of an embedded dash page through its hidden sync input (no server round-trip per tick)
+SYNC_FRAME_JS = """
+(function(frame) {
+    var input = document.getElementById("sync-frame");
+    if (input === null) {
+        return;
+    }
+    var setter = Object.getOwnPropertyDescriptor(window.HTMLInputElement.prototype, "value").set;
+    setter.call(input, frame);
+    input.dispatchEvent(new Event("input", {bubbles: true}));
+})(%d);
+"""
 
 
 class VisualizationWindow(BaseWorkflowWindow):
     """The window that shows the visualization"""
 
+    # Web profile shared by all visualizations, so the browser-side geometry cache survives reopening
+    web_profile = None
+
     def __init__(self, master_window: MasterWindow, patient_data: PatientData):
         """
         Initialize VisualizationWindow
@@ -64,6 +82,7 @@ class VisualizationWindow(BaseWorkflowWindow):
 
         self.db = database.get_db()
         self.reconstruction_service = ReconstructionService(self.db)
+        self.reconstruction_storage_service = ReconstructionStorageService(self.db)
 
         # Create Menu-Buttons
         menu_button = QAction("Info", self)
@@ -79,14 +98,18 @@ class VisualizationWindow(BaseWorkflowWindow):
         menu_button_6 = QAction("Download Metrics as CSV", self)
         menu_button_6.triggered.connect(self.__download_csv_file)
         self.ui.menubar.addAction(menu_button_6)
-        # Replaced by new menu_button_vtkhdf
-        # menu_button_7 = QAction("Download for 3d-Printing", self)
-        # menu_button_7.triggered.connect(self.__download_stl_file)
-        # self.ui.menubar.addAction(menu_button_7)
+        menu_button_7 = QAction("Download for 3d-Printing (STL/PLY)", self)
+        menu_button_7.triggered.connect(self.__download_stl_file)
+        self.ui.menubar.addAction(menu_button_7)
         # Add VTKHDF export for ML with pressure and anatomical attributes
         menu_button_vtkhdf = QAction("Download VTKHDF for ML/3d-Printing", self)
         menu_button_vtkhdf.triggered.connect(self.__download_vtkhdf_file)
         self.ui.menubar.addAction(menu_button_vtkhdf)
+        # One clock drives the animation of all visualizations side by side
+        self.menu_button_sync = QAction("Synchronized Playback", self)
+        self.menu_button_sync.setCheckable(True)
+        self.menu_button_sync.toggled.connect(self.__toggle_synchronized_playback)
+        self.ui.menubar.addAction(self.menu_button_sync)
         menu_button_8 = QAction("Save in Reconstruction in DB", self)
         menu_button_8.triggered.connect(self.__save_reconstruction_in_db)
         self.ui.menubar.addAction(menu_button_8)
@@ -106,6 +129,12 @@ class VisualizationWindow(BaseWorkflowWindow):
 
         self.dash_servers = []  # List to store DashServer instances for cleanup
         self.web_views = []  # List to store QWebView instances for cleanup
+
+        # Shared clock of the synchronized playback
+        self.sync_frame = 0
+        self.sync_timer = QTimer(self)
+        self.sync_timer.setInterval(int(1000 / config.animation_frames_per_second))
+        self.sync_timer.timeout.connect(self.__synchronized_playback_tick)
         # set native menu bar flag as false to see MenuBar on Mac
         self.ui.menubar.setNativeMenuBar(False)
 
@@ -165,6 +194,8 @@ class VisualizationWindow(BaseWorkflowWindow):
         """
         Callback for the closing event
         """
+        self.sync_timer.stop()
+
         # Stop all figure creation threads
         if hasattr(self, "thread") and self.thread:
             for thread in self.thread:
@@ -307,17 +338,7 @@ class VisualizationWindow(BaseWorkflowWindow):
 
         # Create a new QWebEngineView for each visualization
         web_view = QWebEngineView()
-        # Use an isolated, in-memory web profile per view to avoid stale cache/service-worker issues under Windows
-        profile = QWebEngineProfile(f"dash_view_{dash_server.get_port()}", web_view)
-        try:
-            # Prefer ephemeral in-memory cache/cookies
-            profile.setHttpCacheType(QWebEngineProfile.HttpCacheType.MemoryHttpCache)
-            profile.setPersistentCookiesPolicy(
-                QWebEngineProfile.PersistentCookiesPolicy.NoPersistentCookies
-            )
-        except Exception:
-            pass
-        web_view.setPage(QWebEnginePage(profile, web_view))
+        web_view.setPage(QWebEnginePage(self.__get_web_profile(), web_view))
         # Load with a short delay and retry on failure (helps on Windows where
         # the server might not yet accept connections at first attempt)
         self.__load_webview_with_retries(web_view, url, max_attempts=20, delay_ms=250)
@@ -331,6 +352,29 @@ class VisualizationWindow(BaseWorkflowWindow):
         self.dash_servers.append(dash_server)
         self.web_views.append(web_view)
 
+    @staticmethod
+    def __get_web_profile():
+        """
+        Returns the web profile shared by all visualizations. The HTTP cache and cookies stay in memory to avoid
+        stale cache/service-worker issues under Windows, while the IndexedDB geometry cache of the dash pages is
+        kept on disk so that reopened reconstructions do not have to transfer their mesh again. The cache is per
+        origin, it is shared by the visualizations that are served on the same port.
+
+        Returns:
+            QWebEngineProfile: The shared profile.
+        """
+        if VisualizationWindow.web_profile is None:
+            profile = QWebEngineProfile("dash_views", QApplication.instance())
+            try:
+                profile.setHttpCacheType(QWebEngineProfile.HttpCacheType.MemoryHttpCache)
+                profile.setPersistentCookiesPolicy(
+                    QWebEngineProfile.PersistentCookiesPolicy.NoPersistentCookies
+                )
+            except Exception:
+                pass
+            VisualizationWindow.web_profile = profile
+        return VisualizationWindow.web_profile
+
     def __load_webview_with_retries(
         self, web_view: QWebEngineView, url: QUrl, max_attempts: int = 15, delay_ms: int = 200
     ):
@@ -362,6 +406,42 @@ class VisualizationWindow(BaseWorkflowWindow):
         web_view.loadFinished.connect(_on_finished)
         QTimer.singleShot(delay_ms, lambda w=web_view, u=url: w.load(u))
 
+    def __toggle_synchronized_playback(self, checked):
+        """
+        Callback for the synchronized playback menu entry. Starts or stops the shared clock.
+
+        Args:
+            checked (bool): True if the synchronized playback was started
+        """
+        if checked:
+            self.sync_frame = 0
+            self.__send_synchronized_frame()
+            self.sync_timer.start()
+        else:
+            self.sync_timer.stop()
+
+    def __synchronized_playback_tick(self):
+        """
+        Callback of the shared clock. Advances all visualizations to the same point in time.
+        """
+        last_frame = max((dash_server.get_number_of_frames() for dash_server in self.dash_servers), default=0) - 1
+        if self.sync_frame >= last_frame:
+            # Unchecking the menu entry stops the clock
+            self.menu_button_sync.setChecked(False)
+            return
+        self.sync_frame = min(self.sync_frame + int(config.csv_values_per_second / config.animation_frames_per_second), last_frame)
+        self.__send_synchronized_frame()
+
+    def __send_synchronized_frame(self):
+        """
+        Sends the current frame of the shared clock to all web views. Recordings that are shorter stay at their last frame.
+        """
+        for web_view in self.web_views:
+            try:
+                web_view.page().runJavaScript(SYNC_FRAME_JS % self.sync_frame)
+            except Exception:
+                pass
+
     def __download_object_files(self):
         """
         Callback for the download button to save multiple VisualizationData objects as pickle files
@@ -398,22 +478,14 @@ class VisualizationWindow(BaseWorkflowWindow):
             for name, visit_data in self.patient_data.visit_data_dict.items():
                 match = re.search(r"Visit_ID_(\d+)", name)
                 visit = match.group(1)
-                reconstruction_bytes = pickle.dumps(visit_data)
-                reconstruction = self.reconstruction_service.get_reconstruction_for_visit(visit)
+                reconstruction = self.reconstruction_storage_service.has_reconstruction(visit)
                 if (
                     not reconstruction
                     or reconstruction
                     and ShowMessage.to_update_for_visit_named("3d reconstruction(s)", name)
                 ):
-                    reconstruction_dict = {
-                        "visit_id": visit,
-                        "reconstruction_file": reconstruction_bytes,
-                    }
                     if reconstruction:
-                        self.reconstruction_service.update_reconstruction(
-                            reconstruction.reconstruction_id, reconstruction_dict
-                        )
-                        if self.reconstruction_service.get_reconstruction_for_visit(visit):
+                        if self.reconstruction_storage_service.save_visit_data(visit, visit_data):
                             savings = True
 
                         # Inform the user about the saving
@@ -430,8 +502,7 @@ class VisualizationWindow(BaseWorkflowWindow):
                                 f"The saving of the reconstruction(s) for the visit {name} to the database failed.",
                             )
                     else:
-                        self.reconstruction_service.create_reconstruction(reconstruction_dict)
-                        if self.reconstruction_service.get_reconstruction_for_visit(visit):
+                        if self.reconstruction_storage_service.save_visit_data(visit, visit_data):
                             savings = True
 
                         # Inform the user about the saving
@@ -501,8 +572,32 @@ class VisualizationWindow(BaseWorkflowWindow):
 
     def __download_stl_file(self):
         """
-        Callback for the download button to store graphs as .stl for 3d printing
+        Callback for the download button to store graphs as watertight .stl/.ply meshes for 3d printing
         """
+        from PyQt6.QtWidgets import QInputDialog
+        from logic.dataoutput.print_mesh_exporter import PrintMeshExportWorker, start_print_mesh_export
+
+        if not self.visits:
+            QMessageBox.warning(self, "Export Error", "No visualizations to export.")
+            return
+
+        format_choice, ok = QInputDialog.getItem(
+            self, "3D-Printing Export", "File format:", ["Binary STL (.stl)", "Binary PLY (.ply)"], 0, False
+        )
+        if not ok:
+            return
+        file_format = "ply" if "PLY" in format_choice else "stl"
+
+        target_triangles, ok = QInputDialog.getInt(
+            self,
+            "3D-Printing Export",
+            "Reduce each mesh to about this many triangles (0 = full resolution):",
+            config.print_mesh_target_triangles,
+            0,
+            10_000_000,
+        )
+        if not ok:
+            return
 
         # Prompt the user to choose a destination directory
         destination_directory = QFileDialog.getExistingDirectory(self, "Select Directory")
@@ -513,67 +608,70 @@ class VisualizationWindow(BaseWorkflowWindow):
 
         # Use os.path.normpath to normalize the path for the current operating system
         destination_directory = os.path.normpath(destination_directory)
-        # # Windows uses backslashes
-        # destination_directory = destination_directory.replace("/", "\\")
-
-        try:
-            export_successful = False
-            # loop through all visits.items (these are figures which are displayed in different threads)
-            for i, (name, visit_data) in enumerate(self.visits.items()):
-                visit_name = name.split(".")[0] if "." in name else name
-
-                # loop though all X_ray pictures/"Breischluckbilder" of a particular visit_data
-                for j in range(len(visit_data.visualization_data_list)):
-                    # extract the name
-                    xray_name = visit_data.visualization_data_list[j].xray_minute
-                    # get the data to create the .stl-object
-                    figure_x = visit_data.visualization_data_list[j].figure_x
-                    figure_y = visit_data.visualization_data_list[j].figure_y
-                    figure_z = visit_data.visualization_data_list[j].figure_z
 
-                    # create file_name and file_path for each object
-                    file_name = visit_name + "_" + str(xray_name) + ".stl"
-                    # Construct the file path by joining the destination directory and the file name
-                    file_path = os.path.join(str(destination_directory), file_name)
-
-                    # convert the data of the figure into the correct format
-                    points = np.array([figure_x.flatten(), figure_y.flatten(), figure_z.flatten()])
-                    points = points.transpose(1, 0)
-
-                    # create the 3d-object
-                    points = pv.wrap(points)
-                    surface = points.reconstruct_surface()
-
-                    # Save Object for 3d printing
-                    pv.save_meshio(file_path, surface)
-
-            # Check if the file was actually created
-            if os.path.exists(file_path):
-                export_successful = True
-            else:
-                print(f"Failed to create file: {file_path}")
-
-            # Inform the user that the export is complete
-            if export_successful:
-                QMessageBox.information(
-                    self,
-                    "Export Successful",
-                    f"The files have been successfully exported to {destination_directory}.",
-                )
-            else:
-                QMessageBox.warning(
-                    self,
-                    "Export Failed",
-                    "No files were exported. There might be an issue with the data or permissions.",
+        # Collect all X-ray pictures/"Breischluckbilder" of all visits, they are exported in the background
+        reconstructions = []
+        for name, visit_data in self.visits.items():
+            visit_name = name.split(".")[0] if "." in name else name
+            for visualization_data in visit_data.visualization_data_list:
+                reconstructions.append(
+                    (
+                        f"{visit_name}_{visualization_data.xray_minute}",
+                        visualization_data.figure_x,
+                        visualization_data.figure_y,
+                        visualization_data.figure_z,
+                    )
                 )
 
-        # Inform user that the export failed
-        except Exception as e:
-            print(f"An error occurred during export: {str(e)}")
-            QMessageBox.critical(
-                self, "Export Error", f"An error occurred during the export process: {str(e)}"
+        worker = PrintMeshExportWorker(reconstructions, destination_directory, file_format, target_triangles)
+        self.print_mesh_worker = worker
+        self.print_mesh_progress_dialog = QProgressDialog("Exporting meshes", "Cancel", 0, 100, self)
+        self.print_mesh_progress_dialog.setWindowTitle("Processing...")
+        self.print_mesh_progress_dialog.setWindowModality(Qt.WindowModality.WindowModal)
+        self.print_mesh_progress_dialog.setAutoClose(False)
+        self.print_mesh_progress_dialog.setAutoReset(False)
+        self.print_mesh_progress_dialog.canceled.connect(worker.cancel)
+        worker.signals.progress_value.connect(self.print_mesh_progress_dialog.setValue)
+        worker.signals.finished.connect(
+            lambda results: self.__print_mesh_export_finished(results, destination_directory)
+        )
+        worker.signals.error_occurred.connect(self.__print_mesh_export_failed)
+        self.print_mesh_progress_dialog.show()
+        start_print_mesh_export(worker)
+
+    def __print_mesh_export_finished(self, results, destination_directory):
+        cancelled = self.print_mesh_worker.is_cancelled
+        self.__close_print_mesh_export()
+        exported = [r for r in results if r["error"] is None and os.path.exists(r["file_path"])]
+        not_watertight = [os.path.basename(r["file_path"]) for r in exported if not r["watertight"]]
+
+        # Inform the user that the export is complete
+        if exported:
+            message = f"{len(exported)} file(s) have been successfully exported to {destination_directory}."
+            if cancelled:
+                message = "The export was cancelled. " + message
+            if not_watertight:
+                message += "\n\nThe following meshes have open edges:\n" + "\n".join(not_watertight)
+            QMessageBox.information(self, "Export Successful", message)
+        elif not cancelled:
+            QMessageBox.warning(
+                self,
+                "Export Failed",
+                "No files were exported. There might be an issue with the data or permissions.",
             )
 
+    def __print_mesh_export_failed(self, error_message):
+        # Inform user that the export failed
+        self.__close_print_mesh_export()
+        QMessageBox.critical(
+            self, "Export Error", f"An error occurred during the export process: {error_message}"
+        )
+
+    def __close_print_mesh_export(self):
+        self.print_mesh_progress_dialog.close()
+        self.print_mesh_progress_dialog = None
+        self.print_mesh_worker = None
+
     def __download_vtkhdf_file(self):
         """
         Callback for the download button to store graphs as .vtkhdf for ML with enhanced attributes
@@ -589,6 +687,7 @@ class VisualizationWindow(BaseWorkflowWindow):
             "No vertex pressure data (~5MB)",
             "Per-slice HRM pressure data (compact per-height values, ~10MB)",
             "All vertex pressure data (Complete data, potentially large files, ~100MB+)",
+            "All vertex pressure data as one chunked dataset (Complete data, fast ML loading, ~100MB+)",
         ]
 
         # Use HTML for proper line breaks in the label
@@ -598,6 +697,7 @@ class VisualizationWindow(BaseWorkflowWindow):
             "<li><b>No vertex pressure data:</b> Only 3D geometry, metadata, and pressure statistics. Smallest files (~5MB)</li>"
             "<li><b>Per-slice HRM pressure data:</b> Compact per-height values across frames. Smaller files (~10MB)</li>"
             "<li><b>All vertex pressure data:</b> Complete per-vertex pressure data with all frames. Larger files (~100MB+)</li>"
+            "<li><b>As one chunked dataset:</b> Same data stored as a single (frames x vertices) dataset, faster to write and to read frame by frame</li>"
             "</ul>"
             "<br><i>Note: Pressure metadata and statistics are always included in both options.</i>"
         )
@@ -619,6 +719,10 @@ class VisualizationWindow(BaseWorkflowWindow):
             max_frames = -1
             compression_mode = "full"
             pressure_export_mode = "per_slice"
+        elif "chunked dataset" in choice:
+            max_frames = -1
+            compression_mode = "full"
+            pressure_export_mode = "per_vertex_dataset"
         else:  # All vertex
             max_frames = -1
             compression_mode = "full"
@@ -631,12 +735,15 @@ class VisualizationWindow(BaseWorkflowWindow):
             validation_options = [
                 "No validation attributes",
                 "Export validation attributes (JSON format)",
+                "Export validation attributes (binary NPZ format)",
+                "Export validation attributes (binary HDF5 format)",
             ]
             validation_dialog_text = (
                 "Do you want to export validation attributes for the validation framework?"
                 "<ul>"
                 "<li><b>No validation attributes:</b> Only export the 3D mesh file</li>"
                 "<li><b>JSON format:</b> Export validation data in a single JSON file</li>"
+                "<li><b>Binary formats:</b> Numeric data as typed arrays with a small JSON header, smaller and faster to load</li>"
                 "</ul>"
                 "<br><i>Validation attributes enable automated validation of reconstruction accuracy.</i>"
             )
@@ -650,7 +757,11 @@ class VisualizationWindow(BaseWorkflowWindow):
             )
             if not validation_ok:
                 return
-            export_validation_attributes = validation_choice == validation_options[1]
+            export_validation_attributes = validation_choice != validation_options[0]
+            if "NPZ" in validation_choice:
+                validation_format = "npz"
+            elif "HDF5" in validation_choice:
+                validation_format = "hdf5"
 
         destination_directory = QFileDialog.getExistingDirectory(
             self, "Select Directory for VTKHDF Export"
@@ -1059,6 +1170,7 @@ class VisualizationWindow(BaseWorkflowWindow):
         self.master_window.switch_to(data_window)
 
         # Stop all threads
+        self.sync_timer.stop()
         for dash_server in self.dash_servers:
             dash_server.stop()
         for web_view in self.web_views:
@@ -1076,6 +1188,7 @@ class VisualizationWindow(BaseWorkflowWindow):
         self.master_window.switch_to(data_window)
 
         # Stop all threads
+        self.sync_timer.stop()
         for dash_server in self.dash_servers:
             dash_server.stop()
         for web_view in self.web_views:
@@ -1185,8 +1298,79 @@ class VisualizationWindow(BaseWorkflowWindow):
         except Exception as e:
             QMessageBox.critical(self, "Error", f"Failed to start segmentation adjustment: {e}")
 
+    def _should_show_export_button(self):
+        """Show the "Export All glTF" toolbar action"""
+        return True
+
+    def _handle_export_gltf(self):
+        """
+        Export all visualizations of the loaded visits as binary glTF (.glb) files for web viewers
+        """
+        from logic.dataoutput.gltf_exporter import GltfExportWorker, start_gltf_export
+
+        if not self.visits:
+            QMessageBox.warning(self, "Export Error", "No visualizations to export.")
+            return
+
+        destination_directory = QFileDialog.getExistingDirectory(self, "Select Directory for glTF Export")
+        if not destination_directory:
+            return  # User cancelled
+
+        # The files are written in the background
+        reconstructions = []
+        for name, visit_data in self.visits.items():
+            visit_name = name.split(".")[0] if "." in name else name
+            for visualization_data in visit_data.visualization_data_list:
+                file_path = os.path.join(destination_directory, f"{visit_name}_{visualization_data.xray_minute}.glb")
+                reconstructions.append((visualization_data, file_path))
+
+        worker = GltfExportWorker(reconstructions)
+        self.gltf_export_worker = worker
+        self.gltf_progress_dialog = QProgressDialog("Exporting glTF files", "Cancel", 0, 100, self)
+        self.gltf_progress_dialog.setWindowTitle("Processing...")
+        self.gltf_progress_dialog.setWindowModality(Qt.WindowModality.WindowModal)
+        self.gltf_progress_dialog.setAutoClose(False)
+        self.gltf_progress_dialog.setAutoReset(False)
+        self.gltf_progress_dialog.canceled.connect(worker.cancel)
+        worker.signals.progress_value.connect(self.gltf_progress_dialog.setValue)
+        worker.signals.finished.connect(
+            lambda exported_files: self.__gltf_export_finished(exported_files, destination_directory)
+        )
+        worker.signals.error_occurred.connect(self.__gltf_export_failed)
+        self.gltf_progress_dialog.show()
+        start_gltf_export(worker)
+
+    def __gltf_export_finished(self, exported_files, destination_directory):
+        cancelled = self.gltf_export_worker.is_cancelled
+        self.__close_gltf_export()
+        if exported_files:
+            total_mb = sum(os.path.getsize(path) for path in exported_files) / 1e6
+            message = f"{len(exported_files)} glTF file(s) ({total_mb:.1f}MB) have been exported to {destination_directory}."
+            if cancelled:
+                message = "The export was cancelled. " + message
+            QMessageBox.information(self, "Export Successful", message)
+        elif not cancelled:
+            QMessageBox.warning(
+                self,
+                "Export Failed",
+                "No files were exported. There might be an issue with the data or permissions.",
+            )
+
+    def __gltf_export_failed(self, error_message):
+        self.__close_gltf_export()
+        QMessageBox.critical(
+            self, "Export Error", f"An error occurred during the export process: {error_message}"
+        )
+
+    def __close_gltf_export(self):
+        self.gltf_progress_dialog.close()
+        self.gltf_progress_dialog = None
+        self.gltf_export_worker = None
+
     def _before_going_back(self):
         """Clean up visualizations before going back"""
+        self.sync_timer.stop()
+
         # Stop all figure creation threads
         if hasattr(self, "thread") and self.thread:
             for thread in self.thread:
@@ -0,0 +1,129 @@
+"""
+Typed binary storage of NumPy arrays and raw files in the database.
+
+Arrays are stored as their raw C-order buffer (LargeBinary) together with dtype and shape columns
+and loaded zero-copy with np.frombuffer. The arrays returned by decode_array are read-only views of
+the loaded bytes. Raw files (e.g. the manometry CSV) are stored gzip compressed.
+"""
+
+import gzip
+from typing import Optional, Sequence
+
+import numpy as np
+
+PRESSURE_DTYPE = "float32"
+
+
+def encode_array(array: np.ndarray, dtype: str = PRESSURE_DTYPE) -> tuple:
+    """
+    Returns:
+        (data, dtype, shape): raw bytes of the array converted to dtype, the dtype name and the shape
+    """
+    array = np.ascontiguousarray(array, dtype=dtype)
+    return array.tobytes(), array.dtype.name, array.shape
+
+
+def decode_array(data: Optional[bytes], dtype: str, shape: Sequence[int]) -> Optional[np.ndarray]:
+    """Read-only array on top of the stored bytes (no copy)."""
+    if data is None:
+        return None
+    return np.frombuffer(data, dtype=np.dtype(dtype)).reshape(tuple(shape))
+
+
+def compress_file(content: bytes) -> bytes:
+    return gzip.compress(content, compresslevel=6)
+
+
+def decompress_file(content: Optional[bytes]) -> Optional[bytes]:
+    return gzip.decompress(content) if content is not None else None
+
+
+KINDS_KEY = "__kinds__"
+KEY_SEPARATOR = "/"
+
+
+def encode_array_dict(values: dict, compressed: bool = True) -> bytes:
+    """
+    Store a dictionary of arrays, numeric lists, scalars, lists of arrays and nested dictionaries of
+    these (e.g. the metrics of the figure creator) as one npz buffer without pickled objects.
+
+    The original kind of every value (array, list, scalar, list of arrays, dict, None) is stored
+    alongside, so decode_array_dict returns the same Python types. Values of list and dict entries are
+    stored as separate arrays named <name>/<index> and <name>/<key>, the keys of nested dictionaries
+    are stored as strings.
+    """
+    import io
+    import json
+
+    arrays = {}
+    kinds = {name: _encode_value(name, value, arrays) for name, value in values.items()}
+
+    buffer = io.BytesIO()
+    kinds_bytes = np.frombuffer(json.dumps(kinds).encode("utf-8"), dtype=np.uint8)
+    (np.savez_compressed if compressed else np.savez)(buffer, **{KINDS_KEY: kinds_bytes}, **arrays)
+    return buffer.getvalue()
+
+
+def _encode_value(name: str, value, arrays: dict):
+    """Add the arrays of a value to arrays and return its kind."""
+    if value is None:
+        return "none"
+    if isinstance(value, dict):
+        return {
+            "dict": {
+                str(key): _encode_value(f"{name}{KEY_SEPARATOR}{key}", item, arrays) for key, item in value.items()
+            }
+        }
+    if isinstance(value, (list, tuple)):
+        try:
+            array = np.asarray(value)
+        except ValueError:
+            array = None
+        if array is not None and array.dtype != object and not any(isinstance(item, np.ndarray) for item in value):
+            arrays[name] = array
+            return "list"
+        # Arrays of different length, e.g. one polygon per endoscopy image
+        return {"list": [_encode_value(f"{name}{KEY_SEPARATOR}{index}", item, arrays) for index, item in enumerate(value)]}
+
+    array = np.asarray(value)
+    if array.dtype == object:
+        # Object arrays would be pickled by np.savez and could not be loaded without allow_pickle
+        raise TypeError(f"{name}: values of type {type(value).__name__} cannot be stored")
+    arrays[name] = array
+    return "array" if isinstance(value, np.ndarray) else "scalar"
+
+
+def decode_array_dict(content: Optional[bytes]) -> dict:
+    """Inverse of encode_array_dict."""
+    import io
+    import json
+
+    if content is None:
+        return {}
+    with np.load(io.BytesIO(content)) as archive:
+        kinds = json.loads(archive[KINDS_KEY].tobytes().decode("utf-8"))
+        return {name: _decode_value(name, kind, archive) for name, kind in kinds.items()}
+
+
+def _decode_value(name: str, kind, archive):
+    if isinstance(kind, dict):
+        if "dict" in kind:
+            return {
+                key: _decode_value(f"{name}{KEY_SEPARATOR}{key}", item_kind, archive)
+                for key, item_kind in kind["dict"].items()
+            }
+        return [
+            _decode_value(f"{name}{KEY_SEPARATOR}{index}", item_kind, archive)
+            for index, item_kind in enumerate(kind["list"])
+        ]
+    if kind == "none":
+        return None
+    if kind == "array":
+        return archive[name]
+    if kind == "list":
+        return archive[name].tolist()
+    if kind == "scalar":
+        return archive[name].item()
+    # "array_list:<count>" of buffers written before nested values were supported
+    count = int(kind.split(":")[1])
+    return [archive[f"{name}{KEY_SEPARATOR}{index}"] for index in range(count)]
@@ -1,5 +1,5 @@
-from sqlalchemy import Boolean, ForeignKey, Integer, PickleType, String, Float, inspect, LargeBinary
-from sqlalchemy.orm import DeclarativeBase, mapped_column
+from sqlalchemy import Boolean, ForeignKey, Integer, PickleType, String, Float, inspect, LargeBinary, JSON, UniqueConstraint, Index, func
+from sqlalchemy.orm import DeclarativeBase, mapped_column, relationship
 
 
 class Base(DeclarativeBase):
@@ -8,23 +8,38 @@ class Base(DeclarativeBase):
 
 class Patient(Base):
     __tablename__ = "patients"
+    # Indexes of the filters and the sorting of the patient table, the prefix filters (LIKE 'abc%')
+    # need the pattern operator class
+    __table_args__ = (
+        Index("ix_patients_patient_id_pattern", "patient_id", postgresql_ops={"patient_id": "varchar_pattern_ops"}),
+        Index("ix_patients_center_pattern", "center", postgresql_ops={"center": "varchar_pattern_ops"}),
+    )
     patient_id = mapped_column(String(30), primary_key=True)
-    gender = mapped_column(String(6))
-    ethnicity = mapped_column(String(50))
-    birth_year = mapped_column(Integer)
-    year_first_diagnosis = mapped_column(Integer)
-    year_first_symptoms = mapped_column(Integer)
-    center = mapped_column(String(20))
-    height_cm = mapped_column(Integer)
+    gender = mapped_column(String(6), index=True)
+    ethnicity = mapped_column(String(50), index=True)
+    birth_year = mapped_column(Integer, index=True)
+    year_first_diagnosis = mapped_column(Integer, index=True)
+    year_first_symptoms = mapped_column(Integer, index=True)
+    center = mapped_column(String(20), index=True)
+    height_cm = mapped_column(Integer, index=True)
 
     def toDict(self):
         return {c.key: getattr(self, c.key) for c in inspect(self).mapper.column_attrs}
 
 
+# Case-insensitive prefix search of the patient IDs (lower(patient_id) LIKE 'abc%', see
+# PatientService.get_patient_ids_with_prefix), lower() returns text, so it needs text_pattern_ops
+Index(
+    "ix_patients_patient_id_lower_pattern",
+    func.lower(Patient.patient_id).label("patient_id_lower"),
+    postgresql_ops={"patient_id_lower": "text_pattern_ops"},
+)
+
+
 class PreviousTherapy(Base):
     __tablename__ = "previous_therapies"
     previous_therapy_id = mapped_column(Integer, primary_key=True)
-    patient_id = mapped_column(ForeignKey("patients.patient_id", ondelete="CASCADE"), nullable=False)
+    patient_id = mapped_column(ForeignKey("patients.patient_id", ondelete="CASCADE"), nullable=False, index=True)
     therapy = mapped_column(String, nullable=False)
     year = mapped_column(Integer, nullable=True)
     center = mapped_column(String(20), nullable=True)
@@ -36,7 +51,7 @@ class PreviousTherapy(Base):
 class Visit(Base):
     __tablename__ = "visits"
     visit_id = mapped_column(Integer, primary_key=True)
-    patient_id = mapped_column(ForeignKey("patients.patient_id", ondelete="CASCADE"), nullable=False)
+    patient_id = mapped_column(ForeignKey("patients.patient_id", ondelete="CASCADE"), nullable=False, index=True)
     year_of_visit = mapped_column(Integer, nullable=False)
     visit_type = mapped_column(String(50), nullable=False)
     therapy_type = mapped_column(String(50), nullable=True)
@@ -44,6 +59,15 @@ class Visit(Base):
     months_after_last_therapy = mapped_column(Integer, nullable=True)
     months_after_diagnosis = mapped_column(Integer, nullable=True)
 
+    # Read-only relationships for batched loading (see VisitBundleService), rows are deleted by the
+    # ON DELETE CASCADE of the foreign keys
+    patient = relationship("Patient", viewonly=True)
+    manometry_file = relationship("ManometryFile", viewonly=True, uselist=False)
+    barium_swallow_files = relationship("BariumSwallowFile", viewonly=True, order_by="BariumSwallowFile.tbe_file_id")
+    endoscopy_files = relationship("EndoscopyFile", viewonly=True, order_by="EndoscopyFile.egd_file_id")
+    endoflip_files = relationship("EndoflipFile", viewonly=True, order_by="EndoflipFile.endoflip_file_id")
+    reconstruction = relationship("Reconstruction", viewonly=True, uselist=False)
+
     def toDict(self):
         return {c.key: getattr(self, c.key) for c in inspect(self).mapper.column_attrs}
 
@@ -51,7 +75,7 @@ class Visit(Base):
 class EckardtScore(Base):
     __tablename__ = "eckardt_scores"
     eckardt_id = mapped_column(Integer, primary_key=True)
-    visit_id = mapped_column(ForeignKey("visits.visit_id", ondelete="CASCADE"), nullable=False)
+    visit_id = mapped_column(ForeignKey("visits.visit_id", ondelete="CASCADE"), nullable=False, index=True)
     dysphagia = mapped_column(Integer)
     retrosternal_pain = mapped_column(Integer)
     regurgitation = mapped_column(Integer)
@@ -65,7 +89,7 @@ class EckardtScore(Base):
 class Gerd(Base):
     __tablename__ = "gerd_scores"
     gerd_id = mapped_column(Integer, primary_key=True)
-    visit_id = mapped_column(ForeignKey("visits.visit_id", ondelete="CASCADE"), nullable=False)
+    visit_id = mapped_column(ForeignKey("visits.visit_id", ondelete="CASCADE"), nullable=False, index=True)
     grade = mapped_column(String(30))
     heart_burn = mapped_column(Boolean)
     ppi_use = mapped_column(Boolean)
@@ -78,7 +102,7 @@ class Gerd(Base):
 class Medication(Base):
     __tablename__ = "medications"
     medication_id = mapped_column(Integer, primary_key=True)
-    visit_id = mapped_column(ForeignKey("visits.visit_id", ondelete="CASCADE"), nullable=False)
+    visit_id = mapped_column(ForeignKey("visits.visit_id", ondelete="CASCADE"), nullable=False, index=True)
     medication_use = mapped_column(String)
     medication_name = mapped_column(String)
     medication_dose = mapped_column(Float)
@@ -90,7 +114,7 @@ class Medication(Base):
 class BotoxInjection(Base):
     __tablename__ = "botox_injections"
     botox_id = mapped_column(Integer, primary_key=True)
-    visit_id = mapped_column(ForeignKey("visits.visit_id", ondelete="CASCADE"), nullable=False)
+    visit_id = mapped_column(ForeignKey("visits.visit_id", ondelete="CASCADE"), nullable=False, index=True)
     botox_units = mapped_column(Integer)
     botox_height = mapped_column(Integer)
 
@@ -101,7 +125,7 @@ class BotoxInjection(Base):
 class PneumaticDilatation(Base):
     __tablename__ = "pneumatic_dilatations"
     pneumatic_dilatation_id = mapped_column(Integer, primary_key=True)
-    visit_id = mapped_column(ForeignKey("visits.visit_id", ondelete="CASCADE"), nullable=False)
+    visit_id = mapped_column(ForeignKey("visits.visit_id", ondelete="CASCADE"), nullable=False, index=True)
     balloon_volume = mapped_column(String(5))
     quantity = mapped_column(Integer)
 
@@ -112,7 +136,7 @@ class PneumaticDilatation(Base):
 class LHM(Base):
     __tablename__ = "lhms"
     lhm_id = mapped_column(Integer, primary_key=True)
-    visit_id = mapped_column(ForeignKey("visits.visit_id", ondelete="CASCADE"), nullable=False)
+    visit_id = mapped_column(ForeignKey("visits.visit_id", ondelete="CASCADE"), nullable=False, index=True)
     op_duration = mapped_column(Integer)
     length_myotomy = mapped_column(Float)
     fundoplicatio = mapped_column(Boolean)
@@ -125,7 +149,7 @@ class LHM(Base):
 class POEM(Base):
     __tablename__ = "poems"
     poem_id = mapped_column(Integer, primary_key=True)
-    visit_id = mapped_column(ForeignKey("visits.visit_id", ondelete="CASCADE"), nullable=False)
+    visit_id = mapped_column(ForeignKey("visits.visit_id", ondelete="CASCADE"), nullable=False, index=True)
     procedure_duration = mapped_column(Integer)
     height_mucosal_incision = mapped_column(Integer)
     length_mucosal_incision = mapped_column(Float)
@@ -141,7 +165,7 @@ class POEM(Base):
 class Complications(Base):
     __tablename__ = "complications"
     complication_id = mapped_column(Integer, primary_key=True)
-    visit_id = mapped_column(ForeignKey("visits.visit_id", ondelete="CASCADE"), nullable=False)
+    visit_id = mapped_column(ForeignKey("visits.visit_id", ondelete="CASCADE"), nullable=False, index=True)
     bleeding = mapped_column(String(10))
     perforation = mapped_column(String(10))
     capnoperitoneum = mapped_column(String(10))
@@ -158,7 +182,7 @@ class Complications(Base):
 class Manometry(Base):
     __tablename__ = "manometries"
     manometry_id = mapped_column(Integer, primary_key=True)
-    visit_id = mapped_column(ForeignKey("visits.visit_id", ondelete="CASCADE"), nullable=False)
+    visit_id = mapped_column(ForeignKey("visits.visit_id", ondelete="CASCADE"), nullable=False, index=True)
     catheter_type = mapped_column(String(30))
     patient_position = mapped_column(Integer)
     resting_pressure = mapped_column(Integer)
@@ -178,9 +202,18 @@ class Manometry(Base):
 class ManometryFile(Base):
     __tablename__ = "manometry_files"
     manometry_file_id = mapped_column(Integer, primary_key=True)
-    visit_id = mapped_column(ForeignKey("visits.visit_id", ondelete="CASCADE"), nullable=False)
-    file = mapped_column(PickleType, nullable=False)
-    pressure_matrix = mapped_column(PickleType, nullable=False)
+    visit_id = mapped_column(ForeignKey("visits.visit_id", ondelete="CASCADE"), nullable=False, index=True)
+    # Legacy pickled DataFrame / pressure matrix, converted to the columns below by the migration
+    # Blob columns are deferred, they are loaded on first access or with undefer()
+    file = mapped_column(PickleType, nullable=True, deferred=True)
+    pressure_matrix = mapped_column(PickleType, nullable=True, deferred=True, deferred_group="pressure")
+    # Pressure matrix (sensors x measurements) as raw buffer, see logic/database/array_storage.py
+    pressure_data = mapped_column(LargeBinary, deferred=True, deferred_group="pressure")
+    pressure_dtype = mapped_column(String(16))
+    pressure_rows = mapped_column(Integer)
+    pressure_columns = mapped_column(Integer)
+    # Uploaded CSV file, gzip compressed
+    csv_file = mapped_column(LargeBinary, deferred=True)
 
     def toDict(self):
         return {c.key: getattr(self, c.key) for c in inspect(self).mapper.column_attrs}
@@ -189,7 +222,7 @@ class ManometryFile(Base):
 class BariumSwallow(Base):
     __tablename__ = "barium_swallows"
     tbe_id = mapped_column(Integer, primary_key=True)
-    visit_id = mapped_column(ForeignKey("visits.visit_id", ondelete="CASCADE"), nullable=False)
+    visit_id = mapped_column(ForeignKey("visits.visit_id", ondelete="CASCADE"), nullable=False, index=True)
     type_contrast_medium = mapped_column(String(50))
     amount_contrast_medium = mapped_column(Integer)
     height_contrast_medium_1min = mapped_column(Integer)
@@ -206,9 +239,9 @@ class BariumSwallow(Base):
 class BariumSwallowFile(Base):
     __tablename__ = "barium_swallow_files"
     tbe_file_id = mapped_column(Integer, primary_key=True)
-    visit_id = mapped_column(ForeignKey("visits.visit_id", ondelete="CASCADE"), nullable=False)
+    visit_id = mapped_column(ForeignKey("visits.visit_id", ondelete="CASCADE"), nullable=False, index=True)
     minute_of_picture = mapped_column(Integer)
-    file = mapped_column(PickleType)
+    file = mapped_column(PickleType, deferred=True)
 
     def toDict(self):
         return {c.key: getattr(self, c.key) for c in inspect(self).mapper.column_attrs}
@@ -217,7 +250,7 @@ class BariumSwallowFile(Base):
 class Endoscopy(Base):
     __tablename__ = "endoscopies"
     egd_id = mapped_column(Integer, primary_key=True)
-    visit_id = mapped_column(ForeignKey("visits.visit_id", ondelete="CASCADE"), nullable=False)
+    visit_id = mapped_column(ForeignKey("visits.visit_id", ondelete="CASCADE"), nullable=False, index=True)
     position_les = mapped_column(Integer)
 
     def toDict(self):
@@ -227,9 +260,9 @@ class Endoscopy(Base):
 class EndoscopyFile(Base):
     __tablename__ = "endoscopy_files"
     egd_file_id = mapped_column(Integer, primary_key=True, autoincrement=True)
-    visit_id = mapped_column(ForeignKey("visits.visit_id", ondelete="CASCADE"), nullable=False)
+    visit_id = mapped_column(ForeignKey("visits.visit_id", ondelete="CASCADE"), nullable=False, index=True)
     image_position = mapped_column(Integer, nullable=False)
-    file = mapped_column(PickleType, nullable=False)
+    file = mapped_column(PickleType, nullable=False, deferred=True)
 
     def toDict(self):
         return {c.key: getattr(self, c.key) for c in inspect(self).mapper.column_attrs}
@@ -238,7 +271,7 @@ class EndoscopyFile(Base):
 class Endoflip(Base):
     __tablename__ = "endoflips"
     endoflip_id = mapped_column(Integer, primary_key=True, autoincrement=True)
-    visit_id = mapped_column(ForeignKey("visits.visit_id", ondelete="CASCADE"), nullable=False)
+    visit_id = mapped_column(ForeignKey("visits.visit_id", ondelete="CASCADE"), nullable=False, index=True)
     csa_before = mapped_column(Float)
     di_before = mapped_column(Float)
     dmin_before = mapped_column(Float)
@@ -255,10 +288,10 @@ class Endoflip(Base):
 class EndoflipFile(Base):
     __tablename__ = "endoflip_files"
     endoflip_file_id = mapped_column(Integer, primary_key=True, autoincrement=True)
-    visit_id = mapped_column(ForeignKey("visits.visit_id", ondelete="CASCADE"), nullable=False)
+    visit_id = mapped_column(ForeignKey("visits.visit_id", ondelete="CASCADE"), nullable=False, index=True)
     timepoint = mapped_column(String(10))
-    file = mapped_column(PickleType, nullable=True)
-    screenshot = mapped_column(PickleType)
+    file = mapped_column(PickleType, nullable=True, deferred=True)
+    screenshot = mapped_column(PickleType, deferred=True)
 
     def toDict(self):
         return {c.key: getattr(self, c.key) for c in inspect(self).mapper.column_attrs}
@@ -267,9 +300,9 @@ class EndoflipFile(Base):
 class EndoflipImage(Base):
     __tablename__ = "endoflip_images"
     endoflip_image_id = mapped_column(Integer, primary_key=True, autoincrement=True)
-    visit_id = mapped_column(ForeignKey("visits.visit_id", ondelete="CASCADE"), nullable=False)
+    visit_id = mapped_column(ForeignKey("visits.visit_id", ondelete="CASCADE"), nullable=False, index=True)
     timepoint = mapped_column(String(10))
-    file = mapped_column(PickleType, nullable=True)
+    file = mapped_column(PickleType, nullable=True, deferred=True)
 
     def toDict(self):
         return {c.key: getattr(self, c.key) for c in inspect(self).mapper.column_attrs}
@@ -279,8 +312,8 @@ class EndosonographyImage(Base):
     __tablename__ = "endosonography_images"
     endosonography_image_id = mapped_column(Integer, primary_key=True, autoincrement=True)
     image_position = mapped_column(Integer, nullable=False)
-    visit_id = mapped_column(ForeignKey("visits.visit_id", ondelete="CASCADE"), nullable=False)
-    file = mapped_column(PickleType, nullable=False)
+    visit_id = mapped_column(ForeignKey("visits.visit_id", ondelete="CASCADE"), nullable=False, index=True)
+    file = mapped_column(PickleType, nullable=False, deferred=True)
 
     def toDict(self):
         return {c.key: getattr(self, c.key) for c in inspect(self).mapper.column_attrs}
@@ -289,18 +322,77 @@ class EndosonographyImage(Base):
 class EndosonographyVideo(Base):
     __tablename__ = "endosonography_videos"
     endosonography_video_id = mapped_column(Integer, primary_key=True, autoincrement=True)
-    visit_id = mapped_column(ForeignKey("visits.visit_id", ondelete="CASCADE"), nullable=False)
+    visit_id = mapped_column(ForeignKey("visits.visit_id", ondelete="CASCADE"), nullable=False, index=True)
     video_oid = mapped_column(Integer, nullable=False)
 
     def toDict(self):
         return {c.key: getattr(self, c.key) for c in inspect(self).mapper.column_attrs}
 
 
+class ImageThumbnail(Base):
+    """
+    Downscaled JPEG of a stored image, one row per image and pyramid level (config.thumbnail_heights).
+    Filled in the background after an upload (see logic/datainput/thumbnail_generation.py).
+    """
+    __tablename__ = "image_thumbnails"
+    __table_args__ = (UniqueConstraint("image_type", "image_id", "height"),)
+    thumbnail_id = mapped_column(Integer, primary_key=True, autoincrement=True)
+    visit_id = mapped_column(ForeignKey("visits.visit_id", ondelete="CASCADE"), nullable=False, index=True)
+    # barium_swallow, endoscopy, endoflip or endosonography (see thumbnail_generation.IMAGE_TYPES)
+    image_type = mapped_column(String(20), nullable=False)
+    image_id = mapped_column(Integer, nullable=False)
+    # Pyramid level, images smaller than the level are stored in their original size
+    height = mapped_column(Integer, nullable=False)
+    file = mapped_column(LargeBinary, nullable=False)
+
+    def toDict(self):
+        return {c.key: getattr(self, c.key) for c in inspect(self).mapper.column_attrs}
+
+
 class Reconstruction(Base):
     __tablename__ = "reconstructions"
     reconstruction_id = mapped_column(Integer, primary_key=True, autoincrement=True)
-    visit_id = mapped_column(ForeignKey("visits.visit_id", ondelete="CASCADE"), nullable=False)
-    reconstruction_file = mapped_column(PickleType, nullable=False)
+    visit_id = mapped_column(ForeignKey("visits.visit_id", ondelete="CASCADE"), nullable=False, index=True)
+    # Legacy pickled VisitData, converted to reconstruction_images by the migration
+    reconstruction_file = mapped_column(PickleType, nullable=True, deferred=True)
+    name = mapped_column(String)
+    image_count = mapped_column(Integer)
+    # MD5 of the stored image data, used by the export manifest to detect changes
+    content_hash = mapped_column(String(32))
+
+    def toDict(self):
+        return {c.key: getattr(self, c.key) for c in inspect(self).mapper.column_attrs}
+
+
+class ReconstructionImage(Base):
+    """
+    One reconstructed barium swallow image of a reconstruction.
+    The image itself is referenced by tbe_file_id, the pressure matrix, endoscopy and
+    EndoFLIP data are loaded from their tables (see ReconstructionStorageService).
+    """
+    __tablename__ = "reconstruction_images"
+    reconstruction_image_id = mapped_column(Integer, primary_key=True, autoincrement=True)
+    reconstruction_id = mapped_column(
+        ForeignKey("reconstructions.reconstruction_id", ondelete="CASCADE"), nullable=False, index=True
+    )
+    image_index = mapped_column(Integer, nullable=False)
+    tbe_file_id = mapped_column(ForeignKey("barium_swallow_files.tbe_file_id", ondelete="SET NULL"), index=True)
+    # Scalar parameters and positions (JSON)
+    parameters = mapped_column(JSON, nullable=False)
+    # Polygons, mask, paths, widths and slopes (npz, see array_storage.encode_array_dict)
+    annotations = mapped_column(LargeBinary)
+    # figure_x, figure_y, figure_z as float32 array (3 x slices x angles)
+    geometry = mapped_column(LargeBinary)
+    geometry_slices = mapped_column(Integer)
+    geometry_angles = mapped_column(Integer)
+    # Pressure per frame and slice as float32 array (frames x slices)
+    surface_colors = mapped_column(LargeBinary)
+    surface_frames = mapped_column(Integer)
+    surface_slices = mapped_column(Integer)
+    # EndoFLIP surface colors per balloon volume and aggregation (npz)
+    endoflip_colors = mapped_column(LargeBinary)
+    # Metrics of the figure creator (npz)
+    metrics = mapped_column(LargeBinary)
 
     def toDict(self):
         return {c.key: getattr(self, c.key) for c in inspect(self).mapper.column_attrs}
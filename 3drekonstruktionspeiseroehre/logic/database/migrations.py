@@ -0,0 +1,275 @@
+"""
+Versioned migrations of existing databases.
+
+create_all() only creates missing tables, columns added to existing tables, indexes and conversions of
+stored data are done here. The applied versions are recorded in the table schema_migrations, every
+migration of MIGRATIONS that is not recorded yet is run in order on start (after create_all()).
+New migrations are appended with the next version number, applied migrations must not be changed.
+Indexes added to the models later are created by appending another version of create_model_indexes.
+The migrations are idempotent, so databases created before the versioning can run all of them.
+"""
+
+import logging
+import pickle
+import time
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+from logic.database.array_storage import compress_file, decode_array, encode_array
+from logic.database.data_declarative_models import Base
+
+logger = logging.getLogger(__name__)
+
+# Key of the advisory lock held by run_migrations (any constant bigint, unique within the database)
+MIGRATIONS_LOCK_KEY = 31752024
+
+
+def run_migrations(engine: Engine):
+    """
+    Run the migrations that are not recorded in schema_migrations yet.
+
+    Clients starting at the same time would run the same migrations, so the runner holds an advisory lock
+    (in a transaction of its own connection) until all migrations are recorded. Clients waiting for the lock
+    read the applied versions afterwards and skip them.
+    """
+    with engine.connect() as lock_connection, lock_connection.begin():
+        lock_connection.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": MIGRATIONS_LOCK_KEY})
+        with engine.begin() as connection:
+            connection.execute(text(
+                "CREATE TABLE IF NOT EXISTS schema_migrations ("
+                "version INT PRIMARY KEY, "
+                "name VARCHAR NOT NULL, "
+                "applied_at TIMESTAMP NOT NULL DEFAULT now())"
+            ))
+            applied = set(connection.execute(text("SELECT version FROM schema_migrations")).scalars().all())
+
+        for version, migration in MIGRATIONS:
+            if version in applied:
+                continue
+            logger.info("Running migration %s: %s", version, migration.__name__)
+            migration(engine)
+            with engine.begin() as connection:
+                connection.execute(
+                    text("INSERT INTO schema_migrations (version, name) VALUES (:version, :name)"),
+                    {"version": version, "name": migration.__name__},
+                )
+
+
+def create_model_indexes(engine: Engine):
+    """
+    Create the indexes of the models that are missing in the database (create_all() does not add indexes
+    to existing tables): the foreign keys (visit_id, patient_id, ...) and the filters of the patient table.
+    """
+    with engine.begin() as connection:
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(connection, checkfirst=True)
+
+
+def migrate_manometry_files(engine: Engine, batch_size: int = 20):
+    """
+    Convert the pickled pressure matrices and DataFrames of the manometry files to the typed columns
+    (raw float32 buffer + dtype and shape, gzip compressed CSV). Prints the row size and the load time
+    of the pressure matrices before and after the conversion.
+    """
+    with engine.begin() as connection:
+        connection.execute(text(
+            "ALTER TABLE manometry_files "
+            "ADD COLUMN IF NOT EXISTS pressure_data BYTEA, "
+            "ADD COLUMN IF NOT EXISTS pressure_dtype VARCHAR(16), "
+            "ADD COLUMN IF NOT EXISTS pressure_rows INT, "
+            "ADD COLUMN IF NOT EXISTS pressure_columns INT, "
+            "ADD COLUMN IF NOT EXISTS csv_file BYTEA, "
+            "ALTER COLUMN file DROP NOT NULL, "
+            "ALTER COLUMN pressure_matrix DROP NOT NULL"
+        ))
+        ids = connection.execute(text(
+            "SELECT manometry_file_id FROM manometry_files WHERE pressure_matrix IS NOT NULL "
+            "ORDER BY manometry_file_id"
+        )).scalars().all()
+    if not ids:
+        return
+
+    logger.info("Converting %s manometry files to typed storage", len(ids))
+    size_before = _row_size(engine, ids)
+    load_before = _load_seconds(engine, ids, legacy=True)
+
+    for start in range(0, len(ids), batch_size):
+        batch = ids[start:start + batch_size]
+        with engine.begin() as connection:
+            rows = connection.execute(
+                text("SELECT manometry_file_id, file, pressure_matrix FROM manometry_files "
+                     "WHERE manometry_file_id = ANY(:ids)"),
+                {"ids": batch},
+            ).all()
+            for row in rows:
+                try:
+                    pressure_data, pressure_dtype, (rows_count, columns_count) = encode_array(
+                        _unpickle(row.pressure_matrix)
+                    )
+                    # The uploaded file is not available anymore, the CSV is written from the DataFrame
+                    csv_file = compress_file(_unpickle(row.file).to_csv().encode("utf-8")) if row.file else None
+                except Exception as e:
+                    logger.warning("Manometry file %s could not be converted: %s", row.manometry_file_id, e)
+                    continue
+                connection.execute(
+                    text("UPDATE manometry_files SET pressure_data = :pressure_data, "
+                         "pressure_dtype = :pressure_dtype, pressure_rows = :pressure_rows, "
+                         "pressure_columns = :pressure_columns, csv_file = :csv_file, "
+                         "file = NULL, pressure_matrix = NULL WHERE manometry_file_id = :id"),
+                    {
+                        "pressure_data": pressure_data,
+                        "pressure_dtype": pressure_dtype,
+                        "pressure_rows": rows_count,
+                        "pressure_columns": columns_count,
+                        "csv_file": csv_file,
+                        "id": row.manometry_file_id,
+                    },
+                )
+
+    size_after = _row_size(engine, ids)
+    load_after = _load_seconds(engine, ids, legacy=False)
+    logger.info(
+        "Manometry files: row size %.1fMB -> %.1fMB, pressure matrix load time %.2fs -> %.2fs",
+        size_before / 1e6, size_after / 1e6, load_before, load_after,
+    )
+
+
+def migrate_reconstructions(engine: Engine):
+    """
+    Convert the pickled VisitData of the reconstructions to the decomposed storage (header row and
+    reconstruction_images, see ReconstructionStorageService). A reconstruction that cannot be
+    unpickled is kept as it is and still loaded from the pickle. The pickles of the converted
+    reconstructions are kept, they are removed by clear_verified_reconstructions.
+    """
+    from sqlalchemy.orm import Session
+    from logic.services.reconstruction_storage_service import ReconstructionStorageService
+
+    with engine.begin() as connection:
+        connection.execute(text(
+            "ALTER TABLE reconstructions "
+            "ADD COLUMN IF NOT EXISTS name VARCHAR, "
+            "ADD COLUMN IF NOT EXISTS image_count INT, "
+            "ADD COLUMN IF NOT EXISTS content_hash VARCHAR(32), "
+            "ALTER COLUMN reconstruction_file DROP NOT NULL"
+        ))
+        ids = connection.execute(text(
+            "SELECT reconstruction_id FROM reconstructions WHERE reconstruction_file IS NOT NULL "
+            "AND image_count IS NULL ORDER BY reconstruction_id"
+        )).scalars().all()
+    if not ids:
+        return
+
+    logger.info("Converting %s reconstructions to the decomposed storage", len(ids))
+    size_before = _table_size(engine, "reconstructions") + _table_size(engine, "reconstruction_images")
+    converted = 0
+    with Session(bind=engine) as session:
+        service = ReconstructionStorageService(session)
+        for reconstruction_id in ids:
+            try:
+                if service.convert_legacy_reconstruction(reconstruction_id):
+                    converted += 1
+                    continue
+                logger.warning("Reconstruction %s does not contain a VisitData", reconstruction_id)
+            except Exception as e:
+                session.rollback()
+                logger.warning("Reconstruction %s could not be converted: %s", reconstruction_id, e)
+            # Marked as processed, so the conversion is not tried again on every start
+            with engine.begin() as connection:
+                connection.execute(
+                    text("UPDATE reconstructions SET image_count = 0 WHERE reconstruction_id = :id"),
+                    {"id": reconstruction_id},
+                )
+    size_after = _table_size(engine, "reconstructions") + _table_size(engine, "reconstruction_images")
+    logger.info(
+        "Reconstructions: %s of %s converted, stored data %.1fMB -> %.1fMB (the pickles are kept until "
+        "the conversion is verified)",
+        converted, len(ids), size_before / 1e6, size_after / 1e6,
+    )
+
+
+def clear_verified_reconstructions(engine: Engine):
+    """
+    Remove the pickles of the converted reconstructions after loading their image rows and comparing
+    them with the pickle. If the comparison fails, the image rows are removed instead and the
+    reconstruction is loaded from the pickle as before the conversion.
+    """
+    from sqlalchemy.orm import Session
+    from logic.services.reconstruction_storage_service import ReconstructionStorageService
+
+    with engine.connect() as connection:
+        ids = connection.execute(text(
+            "SELECT reconstruction_id FROM reconstructions r WHERE reconstruction_file IS NOT NULL AND EXISTS "
+            "(SELECT 1 FROM reconstruction_images i WHERE i.reconstruction_id = r.reconstruction_id) "
+            "ORDER BY reconstruction_id"
+        )).scalars().all()
+    if not ids:
+        return
+
+    verified = 0
+    with Session(bind=engine) as session:
+        service = ReconstructionStorageService(session)
+        for reconstruction_id in ids:
+            try:
+                if service.clear_verified_legacy_reconstruction(reconstruction_id):
+                    verified += 1
+                    continue
+            except Exception as e:
+                session.rollback()
+                logger.warning("Reconstruction %s could not be verified: %s", reconstruction_id, e)
+                continue
+            logger.warning("Reconstruction %s differs from its pickle, it is loaded from the pickle", reconstruction_id)
+    logger.info("Reconstructions: %s of %s verified, their pickles were removed", verified, len(ids))
+
+
+# (version, migration) in the order they are applied
+MIGRATIONS = [
+    (1, migrate_manometry_files),
+    (2, migrate_reconstructions),
+    (3, create_model_indexes),
+    (4, clear_verified_reconstructions),
+    (5, create_model_indexes),
+]
+
+
+def _table_size(engine: Engine, table: str) -> int:
+    with engine.connect() as connection:
+        return connection.execute(
+            text(f"SELECT COALESCE(SUM(pg_column_size({table}.*)), 0) FROM {table}")
+        ).scalar()
+
+
+def _unpickle(value: bytes):
+    # The legacy PickleType columns contain the bytes of pickle.dumps(), i.e. the objects are pickled twice
+    value = pickle.loads(value)
+    return pickle.loads(value) if isinstance(value, bytes) else value
+
+
+def _row_size(engine: Engine, ids) -> int:
+    with engine.connect() as connection:
+        return connection.execute(
+            text("SELECT COALESCE(SUM(pg_column_size(manometry_files.*)), 0) FROM manometry_files "
+                 "WHERE manometry_file_id = ANY(:ids)"),
+            {"ids": ids},
+        ).scalar()
+
+
+def _load_seconds(engine: Engine, ids, legacy: bool) -> float:
+    """Time to load and deserialize the pressure matrices of the given rows."""
+    start = time.perf_counter()
+    with engine.connect() as connection:
+        if legacy:
+            for value in connection.execute(
+                text("SELECT pressure_matrix FROM manometry_files WHERE manometry_file_id = ANY(:ids)"),
+                {"ids": ids},
+            ).scalars():
+                _unpickle(value)
+        else:
+            for row in connection.execute(
+                text("SELECT pressure_data, pressure_dtype, pressure_rows, pressure_columns "
+                     "FROM manometry_files WHERE manometry_file_id = ANY(:ids)"),
+                {"ids": ids},
+            ):
+                decode_array(row.pressure_data, row.pressure_dtype, (row.pressure_rows, row.pressure_columns))
+    return time.perf_counter() - start
@@ -1,6 +1,8 @@
 from PyQt6 import QtCore, QtWidgets
 from PyQt6.QtCore import Qt
+import config
 from logic.database import database
+from logic.database.data_declarative_models import Patient
 from logic.services.patient_service import PatientService
 from logic.services.previous_therapy_service import PreviousTherapyService
 from logic.services.visit_service import VisitService
@@ -10,18 +12,62 @@ from logic.services.visit_service import VisitService
 class CustomPatientModel(QtCore.QAbstractTableModel):
     """
     Custom Table Model to handle DB-Data
+    Filtering and sorting are done by the database, the rows are fetched in pages of config.patient_page_size
+    when the view scrolls to the end (canFetchMore / fetchMore).
     """
 
-    def __init__(self, data):
+    def __init__(self, filters: dict = None):
         QtCore.QAbstractTableModel.__init__(self)
-        if data is None: # in case a database-connection could not be established
-            self.patient_array = []
-            self.columns = []
-        else:
-            self.patient_array = data
-            self.columns = list(self.patient_array[0].keys()) if self.patient_array else [] # in case there are no data in the database
+        self.columns = [column.key for column in Patient.__table__.columns]
+        self.filters = filters or {}
+        self.sort_column = "patient_id"
+        self.descending = False
+        self.patient_array = []
+        self.has_more = False
         self.db = database.get_db()
         self.patient_service = PatientService(self.db)
+        self.refresh()
+
+    def refresh(self):
+        """
+        Load the first page again
+        """
+        self.beginResetModel()
+        self.patient_array = []
+        self.patient_array = self.__fetch_page()
+        self.endResetModel()
+
+    def set_filters(self, filters: dict):
+        if filters != self.filters:
+            self.filters = filters
+            self.refresh()
+
+    def __fetch_page(self):
+        rows = self.patient_service.get_patients_page(
+            self.filters, self.sort_column, self.descending, len(self.patient_array), config.patient_page_size
+        )
+        rows = rows or []  # in case a database-connection could not be established
+        self.has_more = len(rows) == config.patient_page_size
+        return rows
+
+    def canFetchMore(self, parent=QtCore.QModelIndex()):
+        return not parent.isValid() and self.has_more
+
+    def fetchMore(self, parent=QtCore.QModelIndex()):
+        rows = self.__fetch_page()
+        if rows:
+            row_count = len(self.patient_array)
+            self.beginInsertRows(QtCore.QModelIndex(), row_count, row_count + len(rows) - 1)
+            self.patient_array.extend(rows)
+            self.endInsertRows()
+
+    def sort(self, column, order=Qt.SortOrder.AscendingOrder):
+        """
+        Sort by a column in the database
+        """
+        self.sort_column = self.columns[column]
+        self.descending = order == Qt.SortOrder.DescendingOrder
+        self.refresh()
 
     def flags(self, index):
         """
@@ -32,11 +78,11 @@ class CustomPatientModel(QtCore.QAbstractTableModel):
         else:
             return Qt.ItemFlag.ItemIsEnabled | Qt.ItemFlag.ItemIsSelectable
 
-    def rowCount(self, *args, **kwargs):
+    def rowCount(self, parent=QtCore.QModelIndex(), *args, **kwargs):
         """
         set row counts
         """
-        return len(self.patient_array)
+        return 0 if parent.isValid() else len(self.patient_array)
 
     def columnCount(self, *args, **kwargs):
         """
@@ -0,0 +1,167 @@
+"""
+Latency of the lookup queries of the services on a generated large database, without and with the
+indexes of the models (see migrations.create_model_indexes).
+
+The data are generated in a separate database (<database>_benchmark), the database of the application
+is not changed. Run from the application directory with:
+    python -m logic.database.query_benchmark [number of patients]
+"""
+
+import statistics
+import time
+
+from sqlalchemy import create_engine, func, select, text
+from sqlalchemy.engine import Engine
+
+from logic.database.data_declarative_models import (
+    BariumSwallowFile,
+    Base,
+    EckardtScore,
+    EndoscopyFile,
+    Manometry,
+    Patient,
+    Reconstruction,
+    Visit,
+)
+
+VISITS_PER_PATIENT = 3
+
+# name -> statement for a random (patient_id, visit_id), as the services query them
+QUERIES = {
+    "visits of a patient": lambda patient_id, visit_id: select(Visit).where(Visit.patient_id == patient_id),
+    "eckardt score of a visit": lambda patient_id, visit_id: select(EckardtScore).where(EckardtScore.visit_id == visit_id),
+    "manometry of a visit": lambda patient_id, visit_id: select(Manometry).where(Manometry.visit_id == visit_id),
+    "barium swallow image ids": lambda patient_id, visit_id: (
+        select(BariumSwallowFile.tbe_file_id)
+        .where(BariumSwallowFile.visit_id == visit_id)
+        .order_by(BariumSwallowFile.tbe_file_id)
+    ),
+    "endoscopy positions": lambda patient_id, visit_id: (
+        select(EndoscopyFile.image_position)
+        .where(EndoscopyFile.visit_id == visit_id)
+        .order_by(EndoscopyFile.egd_file_id)
+    ),
+    "reconstruction of a visit": lambda patient_id, visit_id: (
+        select(Reconstruction.reconstruction_id).where(Reconstruction.visit_id == visit_id)
+    ),
+    "patient id prefix": lambda patient_id, visit_id: (
+        select(Patient).where(Patient.patient_id.startswith(patient_id[:-2])).order_by(Patient.patient_id).limit(100)
+    ),
+}
+
+
+def create_benchmark_engine(database_url: str) -> Engine:
+    """Engine of <database>_benchmark, the database is created if it does not exist."""
+    base_url, database_name = database_url.rsplit("/", 1)
+    benchmark_name = f"{database_name}_benchmark"
+    admin_engine = create_engine(database_url, isolation_level="AUTOCOMMIT")
+    with admin_engine.connect() as connection:
+        exists = connection.execute(
+            text("SELECT 1 FROM pg_database WHERE datname = :name"), {"name": benchmark_name}
+        ).scalar()
+        if not exists:
+            connection.execute(text(f'CREATE DATABASE "{benchmark_name}"'))
+    admin_engine.dispose()
+    return create_engine(f"{base_url}/{benchmark_name}")
+
+
+def generate_large_database(engine: Engine, patients: int):
+    """
+    Fill the tables with generated patients, VISITS_PER_PATIENT visits per patient and per visit the rows
+    the lookup queries read (the image files are placeholder bytes).
+    """
+    Base.metadata.create_all(engine)
+    with engine.begin() as connection:
+        if connection.execute(select(func.count()).select_from(Patient)).scalar() >= patients:
+            return
+        print(f"Generating {patients} patients with {VISITS_PER_PATIENT} visits each")
+        connection.execute(text("TRUNCATE patients CASCADE"))
+        connection.execute(text(
+            "INSERT INTO patients (patient_id, gender, ethnicity, birth_year, year_first_diagnosis, "
+            "year_first_symptoms, center, height_cm) "
+            "SELECT 'P' || lpad(g::text, 7, '0'), (ARRAY['male', 'female'])[1 + g % 2], "
+            "(ARRAY['Asian', 'Black', 'Hispanic', 'White', 'Other'])[1 + g % 5], 1930 + g % 80, "
+            "1990 + g % 34, 1985 + g % 39, 'Center ' || g % 40, 150 + g % 50 "
+            "FROM generate_series(1, :patients) g"
+        ), {"patients": patients})
+        connection.execute(text(
+            "INSERT INTO visits (patient_id, year_of_visit, visit_type) "
+            "SELECT patient_id, 2000 + v, "
+            "(ARRAY['Initial Diagnostic', 'Therapy', 'Follow-Up Diagnostic'])[1 + (v - 1) % 3] "
+            "FROM patients CROSS JOIN generate_series(1, :visits) v"
+        ), {"visits": VISITS_PER_PATIENT})
+        connection.execute(text(
+            "INSERT INTO eckardt_scores (visit_id, total_score) SELECT visit_id, visit_id % 13 FROM visits"
+        ))
+        connection.execute(text(
+            "INSERT INTO manometries (visit_id, catheter_type) SELECT visit_id, 'CE4-0062' FROM visits"
+        ))
+        connection.execute(text(
+            "INSERT INTO barium_swallow_files (visit_id, minute_of_picture, file) "
+            "SELECT visit_id, m, decode('00', 'hex') FROM visits CROSS JOIN generate_series(0, 4) m"
+        ))
+        connection.execute(text(
+            "INSERT INTO endoscopy_files (visit_id, image_position, file) "
+            "SELECT visit_id, p * 2, decode('00', 'hex') FROM visits CROSS JOIN generate_series(1, 3) p"
+        ))
+        connection.execute(text(
+            "INSERT INTO reconstructions (visit_id, name, image_count) "
+            "SELECT visit_id, 'benchmark', 5 FROM visits WHERE visit_id % 3 = 0"
+        ))
+
+
+def set_model_indexes(engine: Engine, enabled: bool):
+    with engine.begin() as connection:
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                if enabled:
+                    index.create(connection, checkfirst=True)
+                else:
+                    index.drop(connection, checkfirst=True)
+        connection.execute(text("ANALYZE"))
+
+
+def measure_queries(engine: Engine, keys) -> dict:
+    """Median and 95th percentile latency in ms of every query of QUERIES for the (patient_id, visit_id) keys."""
+    results = {}
+    with engine.connect() as connection:
+        for name, query in QUERIES.items():
+            latencies = []
+            for patient_id, visit_id in keys:
+                start = time.perf_counter()
+                connection.execute(query(patient_id, visit_id)).all()
+                latencies.append((time.perf_counter() - start) * 1000)
+            latencies.sort()
+            results[name] = (statistics.median(latencies), latencies[max(0, int(len(latencies) * 0.95) - 1)])
+    return results
+
+
+def run_benchmark(patients: int = 50000, samples: int = 200):
+    from logic.database.database import DATABASE_URL
+
+    engine = create_benchmark_engine(DATABASE_URL)
+    generate_large_database(engine, patients)
+    with engine.connect() as connection:
+        keys = connection.execute(
+            select(Visit.patient_id, Visit.visit_id).order_by(func.random()).limit(samples)
+        ).all()
+
+    set_model_indexes(engine, enabled=False)
+    without_indexes = measure_queries(engine, keys)
+    set_model_indexes(engine, enabled=True)
+    with_indexes = measure_queries(engine, keys)
+    engine.dispose()
+
+    print(f"Query latency with {patients} patients, {patients * VISITS_PER_PATIENT} visits "
+          f"(median / p95 in ms of {samples} queries):")
+    print(f"  {'query':<28}{'without indexes':>22}{'with indexes':>22}")
+    for name in QUERIES:
+        before, after = without_indexes[name], with_indexes[name]
+        print(f"  {name:<28}{before[0]:>11.2f} / {before[1]:>7.2f}{after[0]:>11.2f} / {after[1]:>7.2f}")
+    return without_indexes, with_indexes
+
+
+if __name__ == "__main__":
+    import sys
+
+    run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 50000)
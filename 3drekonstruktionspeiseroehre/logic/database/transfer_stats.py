@@ -0,0 +1,136 @@
+"""
+Measurement of the data transferred from the database.
+
+TransferCounter hooks into the ORM execution of a session and adds up the size of every returned
+value (byte length of blobs and strings, 8 bytes for numbers). Deferred columns loaded on access are
+counted as well. It is an estimate of the payload, the protocol overhead is not included.
+"""
+
+from contextlib import contextmanager
+
+from sqlalchemy import event, select
+from sqlalchemy.engine import Row
+from sqlalchemy.orm import Session, undefer
+
+
+def value_size(value) -> int:
+    if value is None:
+        return 0
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return len(value)
+    if isinstance(value, str):
+        return len(value.encode("utf-8"))
+    if hasattr(value, "_sa_instance_state"):
+        return sum(value_size(item) for key, item in vars(value).items() if key != "_sa_instance_state")
+    if hasattr(value, "nbytes"):
+        return int(value.nbytes)
+    return 8
+
+
+class TransferCounter:
+    def __init__(self):
+        self.bytes = 0
+        self.queries = 0
+
+
+@contextmanager
+def count_transfer(session: Session):
+    """
+    Count the queries and the bytes returned to the session within the block.
+
+    Usage:
+        with count_transfer(db) as counter:
+            ...
+        print(counter.bytes)
+    """
+    counter = TransferCounter()
+
+    def on_execute(orm_execute_state):
+        if not orm_execute_state.is_select:
+            return None
+        frozen = orm_execute_state.invoke_statement().freeze()
+        counter.queries += 1
+        # Results of a single entity are frozen as the entities, other results as rows
+        counter.bytes += sum(
+            sum(value_size(value) for value in row) if isinstance(row, (Row, tuple)) else value_size(row)
+            for row in frozen.data
+        )
+        return frozen()
+
+    event.listen(session, "do_orm_execute", on_execute)
+    try:
+        yield counter
+    finally:
+        event.remove(session, "do_orm_execute", on_execute)
+
+
+def measure_visit_opening(visit_id: int):
+    """
+    Compare the data transferred when a visit is opened in the data window: before (full entities of
+    all file tables, as the services loaded them without deferred columns) and after (the metadata
+    queries and the first image of every image type, as the data window loads them now).
+
+    Run from the application directory with:
+        python -m logic.database.transfer_stats <visit_id>
+    """
+    from logic.database import database
+    from logic.database.data_declarative_models import (
+        BariumSwallowFile,
+        EndoflipFile,
+        EndoflipImage,
+        EndoscopyFile,
+        EndosonographyImage,
+        ManometryFile,
+        Reconstruction,
+    )
+    from logic.services.barium_swallow_service import BariumSwallowFileService
+    from logic.services.endoflip_service import EndoflipFileService, EndoflipImageService
+    from logic.services.endoscopy_service import EndoscopyFileService
+    from logic.services.endosonography_service import EndosonographyImageService
+    from logic.services.manometry_service import ManometryFileService
+    from logic.services.reconstruction_storage_service import ReconstructionStorageService
+
+    db = database.get_db()
+    with count_transfer(db) as before:
+        # Every image table was queried twice (images and minutes / positions / timepoints)
+        for model in (BariumSwallowFile, EndoscopyFile, EndoflipImage, EndosonographyImage):
+            for _ in range(2):
+                db.execute(select(model).where(model.visit_id == visit_id).options(undefer("*"))).all()
+        for model in (ManometryFile, EndoflipFile, Reconstruction):
+            db.execute(select(model).where(model.visit_id == visit_id).options(undefer("*"))).all()
+    db.expunge_all()
+
+    with count_transfer(db) as after:
+        ManometryFileService(db).get_manometry_file_for_visit(visit_id)
+        EndoflipFileService(db).get_endoflip_file_timepoints_for_visit(visit_id)
+        ReconstructionStorageService(db).has_reconstruction(visit_id)
+        barium_service = BariumSwallowFileService(db)
+        endoscopy_service = EndoscopyFileService(db)
+        endoflip_image_service = EndoflipImageService(db)
+        endosonography_service = EndosonographyImageService(db)
+        for ids, metadata, load_image in (
+            (barium_service.get_barium_swallow_file_ids_for_visit, barium_service.get_barium_swallow_minutes_for_visit, barium_service.get_barium_swallow_image),
+            (endoscopy_service.get_endoscopy_file_ids_for_visit, endoscopy_service.get_endoscopy_positions_for_visit, endoscopy_service.get_endoscopy_image),
+            (endoflip_image_service.get_endoflip_image_ids_for_visit, endoflip_image_service.get_endoflip_timepoints_for_visit, endoflip_image_service.get_endoflip_image),
+            (endosonography_service.get_endosonography_image_ids_for_visit, endosonography_service.get_endosonography_positions_for_visit, endosonography_service.get_endosonography_image),
+        ):
+            image_ids = ids(visit_id)
+            metadata(visit_id)
+            if image_ids:
+                # Only the first image is displayed
+                load_image(image_ids[0])
+    db.close()
+
+    print(f"Opening visit {visit_id}:")
+    print(f"  before: {before.bytes / 1e6:8.2f}MB in {before.queries} queries")
+    print(f"  after:  {after.bytes / 1e6:8.2f}MB in {after.queries} queries")
+    return {"before_bytes": before.bytes, "after_bytes": after.bytes}
+
+
+if __name__ == "__main__":
+    import sys
+    from PyQt6.QtWidgets import QApplication
+
+    # The image services return QPixmaps, which need an application object
+    app = QApplication(sys.argv)
+    measure_visit_opening(int(sys.argv[1]))
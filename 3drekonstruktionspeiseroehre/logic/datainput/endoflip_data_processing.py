@@ -1,10 +1,10 @@
 import os
-from PIL import Image
-from io import BytesIO
 import pandas as pd
 import re
 from logic.services.endoflip_service import EndoflipFileService, EndoflipImageService
 from logic.database import database
+from logic.datainput.image_upload import upload_images
+from logic.datainput.thumbnail_generation import start_thumbnail_generation
 import pickle
 from gui.show_message import ShowMessage
 
@@ -92,6 +92,7 @@ def process_endoflip_xlsx(file_path: str) -> dict:
 
 
 def process_and_upload_endoflip_images(selected_visit, filenames):
+    rows = []
     for i, filename in enumerate(filenames):
         timeextract = os.path.basename(filename)
         match = re.search(r'(before|during|after)', timeextract)
@@ -99,29 +100,22 @@ def process_and_upload_endoflip_images(selected_visit, filenames):
             timepoint = match.group(0)
             fileextension = os.path.splitext(filename)[1][1:]
 
-            if fileextension.lower() in ['jpg', 'jpeg']:
-                extension = 'JPEG'
-            elif fileextension.lower() in ['png']:
-                extension = 'JPEG'
-            else:
+            if fileextension.lower() not in ['jpg', 'jpeg', 'png']:
                 ShowMessage.wrong_format(fileextension, ['JPEG', 'PNG'])
                 break
 
-            file = Image.open(filename)
-
-            if file.mode in ["RGBA", "P"]:
-                file = file.convert("RGB")
-
-            file_bytes = BytesIO()
-            file.save(file_bytes, format=extension)
-            file_bytes = file_bytes.getvalue()
-
-            endoflip_image_dict = {
+            rows.append({
                 'visit_id': selected_visit,
                 'timepoint': timepoint,
-                'file': file_bytes
-            }
+                'filename': filename
+            })
+
+    # The files are encoded in parallel and inserted in one transaction
+    db = database.get_db()
+    endoflip_service = EndoflipImageService(db)
+    uploaded = upload_images(rows, endoflip_service.create_endoflip_images)
+    db.close()
 
-            db = database.get_db()
-            endoflip_service = EndoflipImageService(db)
-            endoflip_service.create_endoflip_image(endoflip_image_dict)
+    # The thumbnails of the data window are generated in the background
+    start_thumbnail_generation(selected_visit)
+    return uploaded
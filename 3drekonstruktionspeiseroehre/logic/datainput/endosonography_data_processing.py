@@ -1,14 +1,15 @@
 import re
 
-from PIL import Image
-from io import BytesIO
 import os
 from logic.services.endosonography_service import EndosonographyImageService
 from logic.database import database
+from logic.datainput.image_upload import upload_images
+from logic.datainput.thumbnail_generation import start_thumbnail_generation
 from gui.show_message import ShowMessage
 
 
 def process_and_upload_endosonography_images(selected_visit, filenames):
+    rows = []
     for i, filename in enumerate(filenames):
         positionextract = os.path.basename(filename)
         match = re.search(r'_(?P<pos>[0-9]+)cm', positionextract)
@@ -16,29 +17,22 @@ def process_and_upload_endosonography_images(selected_visit, filenames):
             position = int(match.group('pos'))
             fileextension = os.path.splitext(filename)[1][1:]
 
-            if fileextension.lower() in ['jpg', 'jpeg']:
-                extension = 'JPEG'
-            elif fileextension.lower() in ['png']:
-                extension = 'JPEG'
-            else:
+            if fileextension.lower() not in ['jpg', 'jpeg', 'png']:
                 ShowMessage.wrong_format(fileextension, ['JPEG', 'PNG'])
                 break
 
-            file = Image.open(filename)
-
-            if file.mode in ["RGBA", "P"]:
-                file = file.convert("RGB")
-
-            file_bytes = BytesIO()
-            file.save(file_bytes, format=extension)
-            file_bytes = file_bytes.getvalue()
-
-            endosono_file_dict = {
+            rows.append({
                 'visit_id': selected_visit,
                 'image_position': position,
-                'file': file_bytes
-            }
-
-            db = database.get_db()
-            endosonography_service = EndosonographyImageService(db)
-            endosonography_service.create_endosonography_file(endosono_file_dict)
+                'filename': filename
+            })
+
+    # The files are encoded in parallel and inserted in one transaction
+    db = database.get_db()
+    endosonography_service = EndosonographyImageService(db)
+    uploaded = upload_images(rows, endosonography_service.create_endosonography_files)
+    db.close()
+
+    # The thumbnails of the data window are generated in the background
+    start_thumbnail_generation(selected_visit)
+    return uploaded
@@ -0,0 +1,65 @@
+"""
+Bulk upload of image files: the files are decoded and encoded in parallel in a thread pool (PIL releases
+the GIL while decoding and encoding), then all rows are inserted by the service with one executemany in a
+single transaction. Files that cannot be processed are reported per file and not uploaded.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from typing import Callable
+
+from PIL import Image
+
+import config
+from gui.show_message import ShowMessage
+
+
+def encode_image_file(filename: str) -> bytes:
+    """
+    Bytes of an image file as they are stored: the file unchanged (re-encoding a JPEG would only lose
+    quality, PNG files stay lossless), palette and alpha images are converted to RGB in their format.
+    Raises an exception if the file cannot be decoded.
+    """
+    with open(filename, "rb") as file:
+        data = file.read()
+    image = Image.open(BytesIO(data))
+    image_format = image.format
+    if image_format not in ("JPEG", "PNG"):
+        raise ValueError(f"{image_format} is no valid format")
+    # Decodes the whole image, damaged files fail here
+    image.load()
+    if image.mode not in ["RGBA", "P"]:
+        return data
+    file_bytes = BytesIO()
+    image.convert("RGB").save(file_bytes, format=image_format)
+    return file_bytes.getvalue()
+
+
+def upload_images(rows: list[dict], create_files: Callable) -> int:
+    """
+    Encode the files of the rows in parallel and insert them in one transaction.
+    :param rows: one dict per file with the column values of the row and the path in 'filename'
+    :param create_files: bulk insert method of the service (e.g. BariumSwallowFileService.create_barium_swallow_files)
+    :return: number of uploaded files
+    """
+    if not rows:
+        return 0
+    with ThreadPoolExecutor(max_workers=config.upload_workers or None) as executor:
+        futures = [executor.submit(encode_image_file, row["filename"]) for row in rows]
+
+    data = []
+    errors = {}
+    for row, future in zip(rows, futures):
+        try:
+            file_bytes = future.result()
+        except Exception as e:
+            errors[row["filename"]] = str(e)
+            continue
+        values = {key: value for key, value in row.items() if key != "filename"}
+        values["file"] = file_bytes
+        data.append(values)
+
+    uploaded = create_files(data) if data else 0
+    if errors:
+        ShowMessage.upload_failed(errors)
+    return uploaded or 0
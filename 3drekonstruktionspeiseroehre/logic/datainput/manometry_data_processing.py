@@ -4,7 +4,7 @@ from PyQt6.QtWidgets import QMessageBox
 import config
 from logic.services.manometry_service import ManometryFileService
 from logic.database import database
-import pickle
+from logic.database.array_storage import encode_array, compress_file
 
 
 def process_and_upload_manometry_file(selected_visit, filename):
@@ -22,12 +22,18 @@ def process_and_upload_manometry_file(selected_visit, filename):
         QMessageBox.critical(None, "Invalid File", "Error: The file does not have the expected format.")
 
     if not error:
-        pressure_matrix_bytes = pickle.dumps(pressure_matrix)
-        file_bytes = pickle.dumps(file)
+        pressure_data, pressure_dtype, (pressure_rows, pressure_columns) = encode_array(pressure_matrix)
+        with open(filename, "rb") as csv_file:
+            csv_bytes = compress_file(csv_file.read())
         manometry_file_dict = {
             'visit_id': selected_visit,
-            'file': file_bytes,
-            'pressure_matrix': pressure_matrix_bytes
+            'file': None,
+            'pressure_matrix': None,
+            'pressure_data': pressure_data,
+            'pressure_dtype': pressure_dtype,
+            'pressure_rows': pressure_rows,
+            'pressure_columns': pressure_columns,
+            'csv_file': csv_bytes
         }
         db = database.get_db()
         manometry_file_service = ManometryFileService(db)
@@ -0,0 +1,165 @@
+"""
+Generation of the thumbnail pyramid of the stored images (see ImageThumbnail).
+
+After an upload the thumbnails of the visit are generated by a background worker, the thumbnails of
+images stored before are generated by a backfill job on start (config.thumbnail_backfill_on_start).
+The backfill can also be run from the application directory with:
+    python -m logic.datainput.thumbnail_generation
+"""
+
+from io import BytesIO
+
+from PIL import Image
+from PyQt6.QtCore import QRunnable, QThreadPool
+from sqlalchemy import delete, func, select
+from sqlalchemy.exc import IntegrityError, OperationalError
+from sqlalchemy.orm import Session
+
+import config
+from logic.database import database
+from logic.database.data_declarative_models import (
+    BariumSwallowFile,
+    EndoflipImage,
+    EndoscopyFile,
+    EndosonographyImage,
+    ImageThumbnail,
+)
+
+# image_type of the thumbnails -> model and primary key of the image table
+IMAGE_TYPES = {
+    "barium_swallow": (BariumSwallowFile, BariumSwallowFile.tbe_file_id),
+    "endoscopy": (EndoscopyFile, EndoscopyFile.egd_file_id),
+    "endoflip": (EndoflipImage, EndoflipImage.endoflip_image_id),
+    "endosonography": (EndosonographyImage, EndosonographyImage.endosonography_image_id),
+}
+
+
+def create_thumbnail_pyramid(image_bytes: bytes, heights=None) -> dict:
+    """
+    Downscale an image to the pyramid levels, every level is computed from the next larger one.
+    :param image_bytes: stored image (JPEG or PNG)
+    :param heights: heights of the levels in px, config.thumbnail_heights by default
+    :return: dict height -> JPEG bytes
+    """
+    heights = sorted(heights or config.thumbnail_heights, reverse=True)
+    image = Image.open(BytesIO(image_bytes))
+    # JPEGs are decoded at a reduced scale (1/2 to 1/8), as long as it is larger than the largest level
+    image.draft("RGB", (max(1, image.width * heights[0] // image.height), heights[0]))
+    image = image.convert("RGB")
+
+    thumbnails = {}
+    for height in heights:
+        # Images smaller than a level are stored in their original size
+        if image.height > height:
+            width = max(1, round(image.width * height / image.height))
+            image = image.resize((width, height), Image.Resampling.LANCZOS)
+        file_bytes = BytesIO()
+        image.save(file_bytes, format="JPEG", quality=config.thumbnail_jpeg_quality)
+        thumbnails[height] = file_bytes.getvalue()
+    return thumbnails
+
+
+def generate_missing_thumbnails(db: Session, visit_id: int = None, batch_size: int = None) -> int:
+    """
+    Generate the thumbnails of all images without thumbnails, committed in batches.
+    :param visit_id: only the images of this visit, all images if None
+    :return: number of images for which thumbnails were generated
+    """
+    batch_size = batch_size or config.thumbnail_batch_size
+    generated = 0
+    for image_type, (model, id_column) in IMAGE_TYPES.items():
+        with_thumbnails = select(ImageThumbnail.image_id).where(ImageThumbnail.image_type == image_type)
+        stmt = select(id_column).where(id_column.not_in(with_thumbnails)).order_by(id_column)
+        if visit_id is not None:
+            stmt = stmt.where(model.visit_id == visit_id)
+        ids = db.execute(stmt).scalars().all()
+
+        for start in range(0, len(ids), batch_size):
+            batch = ids[start:start + batch_size]
+            rows = db.execute(select(id_column, model.visit_id, model.file).where(id_column.in_(batch))).all()
+            count = 0
+            for image_id, image_visit_id, file in rows:
+                if file is None:
+                    continue
+                try:
+                    thumbnails = create_thumbnail_pyramid(file)
+                except Exception as e:
+                    print(f"No thumbnails for {image_type} image {image_id}: {e}")
+                    continue
+                db.add_all(
+                    ImageThumbnail(visit_id=image_visit_id, image_type=image_type, image_id=image_id,
+                                   height=height, file=data)
+                    for height, data in thumbnails.items()
+                )
+                count += 1
+            try:
+                db.commit()
+                generated += count
+            except IntegrityError:
+                # Generated by another worker in the meantime (e.g. backfill and upload of the same visit)
+                db.rollback()
+    return generated
+
+
+def load_display_image(db: Session, image_type: str, image_id: int, height: int):
+    """
+    Bytes to display an image with the given height: the smallest pyramid level with at least this height
+    (the largest level if all are smaller) or the full image if its thumbnails have not been generated yet.
+    :return: JPEG bytes, None if the image does not exist
+    """
+    data = db.execute(
+        select(ImageThumbnail.file)
+        .where(ImageThumbnail.image_type == image_type, ImageThumbnail.image_id == image_id)
+        .order_by(ImageThumbnail.height < height, func.abs(ImageThumbnail.height - height))
+        .limit(1)
+    ).scalar()
+    if data is None:
+        model, id_column = IMAGE_TYPES[image_type]
+        data = db.execute(select(model.file).where(id_column == image_id)).scalar()
+    return data
+
+
+def delete_orphaned_thumbnails(db: Session):
+    """Delete the thumbnails of deleted images (the IDs of the images are not reused)."""
+    for image_type, (model, id_column) in IMAGE_TYPES.items():
+        db.execute(
+            delete(ImageThumbnail).where(
+                ImageThumbnail.image_type == image_type, ImageThumbnail.image_id.not_in(select(id_column))
+            )
+        )
+    db.commit()
+
+
+class ThumbnailWorker(QRunnable):
+    """Generates the missing thumbnails in a thread of the global QThreadPool with its own session."""
+
+    def __init__(self, visit_id: int = None):
+        """
+        init ThumbnailWorker
+        :param visit_id: only the images of this visit, all images (backfill) if None
+        """
+        super().__init__()
+        self.visit_id = visit_id
+
+    def run(self):
+        db = database.get_db()
+        try:
+            if self.visit_id is None:
+                delete_orphaned_thumbnails(db)
+            generated = generate_missing_thumbnails(db, self.visit_id)
+            if generated:
+                print(f"Thumbnails generated for {generated} images")
+        except OperationalError as e:
+            # No message box, the worker does not run in the GUI thread
+            print(f"Thumbnails could not be generated: {e}")
+        finally:
+            db.close()
+
+
+def start_thumbnail_generation(visit_id: int = None):
+    """Generate the missing thumbnails of a visit (or of all images if None) in the background."""
+    QThreadPool.globalInstance().start(ThumbnailWorker(visit_id))
+
+
+if __name__ == "__main__":
+    ThumbnailWorker().run()
@@ -0,0 +1,124 @@
+"""
+Upload and download of the endosonography videos in a thread of the global QThreadPool. The videos are
+streamed in chunks of config.video_chunk_size bytes between the files and the large objects, so their
+size is not limited by the memory, and the progress over all videos is reported in percent.
+"""
+
+import os
+from abc import ABCMeta, abstractmethod
+
+from PyQt6.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+from logic.database import database
+from logic.services.endosonography_service import EndosonographyVideoService
+
+
+class VideoTransferSignals(QObject):
+    progress_value = pyqtSignal(int)
+    # number of transferred videos
+    finished = pyqtSignal(int)
+    error_occurred = pyqtSignal(str)
+
+
+class _AbstractRunnableMeta(type(QRunnable), ABCMeta):
+    """Metaclass of abstract QRunnables (ABC cannot be combined with the metaclass of the Qt classes)"""
+
+
+class VideoTransferWorker(QRunnable, metaclass=_AbstractRunnableMeta):
+    """Base class of the transfer workers, each worker uses its own session and connections."""
+
+    def __init__(self):
+        super().__init__()
+        self.signals = VideoTransferSignals()
+        self.total_bytes = 0
+        self.done_bytes = 0
+        self.is_cancelled = False
+        self.__last_percent = -1
+
+    def cancel(self):
+        """Stops the transfer after the current chunk (may be called from the GUI thread)"""
+        self.is_cancelled = True
+
+    def run(self):
+        db = database.get_db()
+        service = EndosonographyVideoService(db, database.get_engine())
+        try:
+            transferred = self.transfer(service)
+        except Exception as e:
+            # No message box, the worker does not run in the GUI thread
+            print(f"Video transfer failed: {e}")
+            self.signals.error_occurred.emit(str(e))
+            return
+        finally:
+            db.close()
+        self.signals.finished.emit(transferred)
+
+    @abstractmethod
+    def transfer(self, service: EndosonographyVideoService) -> int:
+        """
+        Transfers the videos with the service
+        :return: number of transferred videos
+        """
+        pass
+
+    def _report(self, file_bytes: int):
+        """Progress callback of the service, file_bytes are the bytes of the current video"""
+        percent = int(100 * (self.done_bytes + file_bytes) / self.total_bytes) if self.total_bytes else 100
+        # Only changed values are emitted, a video has thousands of chunks
+        if percent != self.__last_percent:
+            self.__last_percent = percent
+            self.signals.progress_value.emit(percent)
+
+    def _cancelled(self):
+        return self.is_cancelled
+
+
+class VideoUploadWorker(VideoTransferWorker):
+    def __init__(self, visit_id: int, filenames: list[str]):
+        """
+        init VideoUploadWorker
+        :param visit_id: visit the videos are saved for
+        :param filenames: paths of the video files
+        """
+        super().__init__()
+        self.visit_id = visit_id
+        self.filenames = filenames
+
+    def transfer(self, service: EndosonographyVideoService) -> int:
+        sizes = [os.path.getsize(filename) for filename in self.filenames]
+        self.total_bytes = sum(sizes)
+        uploaded = 0
+        for filename, size in zip(self.filenames, sizes):
+            if service.save_video_for_visit(self.visit_id, filename, self._report, self._cancelled) is None:
+                break
+            uploaded += 1
+            self.done_bytes += size
+        return uploaded
+
+
+class VideoDownloadWorker(VideoTransferWorker):
+    def __init__(self, oids: list[int], destination_directory: str):
+        """
+        init VideoDownloadWorker
+        :param oids: OIDs of the large objects of the videos
+        :param destination_directory: the videos are written to <index>.mp4 in this directory
+        """
+        super().__init__()
+        self.oids = oids
+        self.destination_directory = destination_directory
+
+    def transfer(self, service: EndosonographyVideoService) -> int:
+        sizes = service.get_video_sizes(self.oids)
+        self.total_bytes = sum(sizes)
+        downloaded = 0
+        for i, (oid, size) in enumerate(zip(self.oids, sizes)):
+            path = os.path.join(self.destination_directory, f"{i}.mp4")
+            if not service.download_video(oid, path, self._report, self._cancelled):
+                break
+            downloaded += 1
+            self.done_bytes += size
+        return downloaded
+
+
+def start_video_transfer(worker: VideoTransferWorker):
+    QThreadPool.globalInstance().start(worker)
@@ -0,0 +1,139 @@
+"""
+Manifest of a mass VTKHDF export directory.
+
+The manifest (export_manifest.json in the output directory) records for every exported reconstruction
+the hash of its pickled reconstruction file, the export settings and the written files. A later mass
+export into the same directory skips reconstructions whose hash, settings and files are unchanged,
+re-exports changed ones and removes the files of reconstructions that no longer exist.
+
+An entry is only recorded after its export finished and the manifest is rewritten atomically after
+every entry, so an export that crashed or was canceled resumes with the reconstructions that are
+missing.
+"""
+
+import json
+import os
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+MANIFEST_FILE_NAME = "export_manifest.json"
+MANIFEST_VERSION = 1
+
+
+class ExportManifest:
+    """
+    Reads and writes the export manifest of an output directory.
+
+    Entries are keyed by reconstruction ID:
+        {"visit_id": 12, "content_hash": "...", "settings": {...},
+         "files": [{"index": 0, "path": "Visit_12_....vtkhdf"}], "validation_files": [...],
+         "exported_at": "..."}
+    File paths are stored relative to the output directory.
+    """
+
+    def __init__(self, output_directory: str):
+        self.output_directory = output_directory
+        self.file_path = os.path.join(output_directory, MANIFEST_FILE_NAME)
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self.load()
+
+    def load(self):
+        if not os.path.exists(self.file_path):
+            return
+        try:
+            with open(self.file_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+            if manifest.get("version") == MANIFEST_VERSION:
+                self.entries = manifest.get("reconstructions", {})
+            else:
+                print("Export manifest has an unknown version, all reconstructions will be exported")
+        except Exception as e:
+            # A broken manifest only costs a full export
+            print(f"Could not read export manifest, all reconstructions will be exported: {e}")
+            self.entries = {}
+
+    def save(self):
+        """Write the manifest atomically, a crash never leaves a half written manifest behind."""
+        temporary_path = self.file_path + ".tmp"
+        try:
+            with open(temporary_path, "w", encoding="utf-8") as f:
+                json.dump(
+                    {"version": MANIFEST_VERSION, "reconstructions": self.entries}, f, indent=2
+                )
+            os.replace(temporary_path, self.file_path)
+        except Exception as e:
+            print(f"Could not write export manifest: {e}")
+
+    def is_current(self, reconstruction_id: int, content_hash: str, settings: Dict[str, Any]) -> bool:
+        """True if the reconstruction was exported with the same content and settings and all files exist."""
+        entry = self.entries.get(str(reconstruction_id))
+        if entry is None or not content_hash:
+            return False
+        if entry.get("content_hash") != content_hash or entry.get("settings") != settings:
+            return False
+        files = entry.get("files", [])
+        return bool(files) and all(
+            os.path.exists(os.path.join(self.output_directory, f["path"])) for f in files
+        )
+
+    def files(self, reconstruction_id: int) -> List[str]:
+        """Absolute paths of the mesh and validation files recorded for a reconstruction."""
+        entry = self.entries.get(str(reconstruction_id), {})
+        paths = [f["path"] for f in entry.get("files", [])] + entry.get("validation_files", [])
+        return [os.path.join(self.output_directory, path) for path in paths]
+
+    def record(
+        self,
+        reconstruction_id: int,
+        visit_id: Optional[int],
+        content_hash: str,
+        settings: Dict[str, Any],
+        file_paths: List[str],
+        validation_file_paths: Iterable[str] = (),
+    ):
+        """Record a finished export. Files of an earlier export that were not written again are removed."""
+        validation_file_paths = list(validation_file_paths)
+        new_files = [os.path.abspath(path) for path in file_paths + validation_file_paths]
+        for old_path in self.files(reconstruction_id):
+            if os.path.abspath(old_path) not in new_files:
+                _remove_file(old_path)
+
+        self.entries[str(reconstruction_id)] = {
+            "visit_id": visit_id,
+            "content_hash": content_hash,
+            "settings": settings,
+            "files": [
+                {"index": index, "path": os.path.relpath(path, self.output_directory)}
+                for index, path in enumerate(file_paths)
+            ],
+            "validation_files": [
+                os.path.relpath(path, self.output_directory) for path in validation_file_paths
+            ],
+            "exported_at": datetime.now().isoformat(timespec="seconds"),
+        }
+        self.save()
+
+    def remove_orphans(self, existing_reconstruction_ids: Iterable[int]) -> int:
+        """
+        Remove the files and entries of reconstructions that are no longer in the database.
+
+        Returns:
+            int: Number of removed entries
+        """
+        existing = {str(reconstruction_id) for reconstruction_id in existing_reconstruction_ids}
+        orphans = [key for key in self.entries if key not in existing]
+        for key in orphans:
+            for path in self.files(int(key)):
+                _remove_file(path)
+            del self.entries[key]
+        if orphans:
+            self.save()
+        return len(orphans)
+
+
+def _remove_file(path: str):
+    try:
+        if os.path.exists(path):
+            os.remove(path)
+    except OSError as e:
+        print(f"Could not remove {path}: {e}")
@@ -0,0 +1,280 @@
+"""
+Export profiles of the VTKHDF export.
+
+A profile (config.export_profiles) sets the compression of the mesh file written by VTK and the
+storage of the pressure data, which is written with h5py after the mesh:
+
+- lossless:     float32 pressures, byte shuffle + gzip
+- compact:      16-bit fixed point pressures within config.pressure_quantization_precision_mmhg,
+                byte shuffle + gzip. The datasets carry the attributes scale_factor and add_offset,
+                pressure = stored value * scale_factor + add_offset (see decode_pressure). VTK and
+                pyvista ignore these attributes, so the arrays are named <name>_quantized (e.g.
+                pressure_frame_000_quantized) and their units attribute is "quantized", they are
+                not mistaken for pressures in mmHg.
+- fast_write:   float32 pressures and mesh without compression
+
+Only the filters built into HDF5 (gzip, shuffle) are used, VTK cannot read the lzf filter of h5py.
+
+Pressure data are the per-vertex arrays pressure_frame_NNN (point data), the per-slice matrix
+pressure_slice_matrix_flat (field data) and the PressureData/vertex_pressure dataset.
+"""
+
+import os
+import tempfile
+import time
+from typing import Any, Dict, Optional, Tuple
+
+import h5py
+import numpy as np
+
+import config
+
+SCALE_ATTRIBUTE = "scale_factor"
+OFFSET_ATTRIBUTE = "add_offset"
+QUANTIZED_SUFFIX = "_quantized"
+FIELD_PRESSURE_ARRAYS = ("pressure_slice_matrix_flat",)
+
+
+def get_export_profile(name: Optional[str] = None) -> Dict[str, Any]:
+    """Settings of an export profile, the default profile of the config if name is None."""
+    name = name or config.export_profile
+    if name not in config.export_profiles:
+        print(f"Unknown export profile '{name}', using '{config.export_profile}'")
+        name = config.export_profile
+    return dict(config.export_profiles[name], name=name)
+
+
+def is_pressure_point_array(name: str) -> bool:
+    return name.startswith("pressure_frame_")
+
+
+def stored_array_name(name: str, attributes: Dict[str, Any]) -> str:
+    """Name of a pressure array in the file, quantized arrays (see encode_pressure) get QUANTIZED_SUFFIX."""
+    return name + QUANTIZED_SUFFIX if SCALE_ATTRIBUTE in attributes else name
+
+
+def get_pressure_array(group: h5py.Group, name: str) -> Optional[h5py.Dataset]:
+    """Pressure array of a PointData or FieldData group, stored as float or quantized."""
+    for stored_name in (name, name + QUANTIZED_SUFFIX):
+        if stored_name in group:
+            return group[stored_name]
+    return None
+
+
+def encode_pressure(values: np.ndarray, profile: Dict[str, Any]) -> Tuple[np.ndarray, Dict[str, Any]]:
+    """
+    Convert pressures to the storage type of the profile.
+
+    Returns:
+        (stored values, attributes of the dataset)
+    """
+    values = np.asarray(values, dtype=np.float32)
+    attributes = {"units": "mmHg"}
+    if not profile.get("quantize") or values.size == 0:
+        return values, attributes
+
+    # 16-bit fixed point around the middle of the value range
+    scale = float(config.pressure_quantization_precision_mmhg)
+    value_min, value_max = float(np.nanmin(values)), float(np.nanmax(values))
+    if (value_max - value_min) / scale > 65534:
+        # The range does not fit into 16 bit with the configured precision
+        scale = (value_max - value_min) / 65534
+        print(f"Pressure range too large for the configured precision, using {scale:.4f} mmHg")
+    offset = (value_max + value_min) / 2
+    stored = np.clip(np.round((np.nan_to_num(values, nan=offset) - offset) / scale), -32767, 32767)
+    attributes.update(
+        {
+            "units": "quantized",
+            "description": f"pressure in mmHg = value * {SCALE_ATTRIBUTE} + {OFFSET_ATTRIBUTE}",
+            SCALE_ATTRIBUTE: scale,
+            OFFSET_ATTRIBUTE: offset,
+        }
+    )
+    return stored.astype(np.int16), attributes
+
+
+def decode_pressure(values: np.ndarray, attributes) -> np.ndarray:
+    """Pressures in mmHg from stored values and the attributes of their dataset."""
+    if SCALE_ATTRIBUTE not in attributes:
+        return np.asarray(values)
+    return np.asarray(values, dtype=np.float32) * np.float32(attributes[SCALE_ATTRIBUTE]) + np.float32(
+        attributes[OFFSET_ATTRIBUTE]
+    )
+
+
+def dataset_options(profile: Dict[str, Any], shape: Tuple[int, ...], chunks=True) -> Dict[str, Any]:
+    """Keyword arguments of h5py create_dataset for the pressure datasets of a profile."""
+    compression = profile.get("pressure_compression")
+    if compression is None or 0 in shape:
+        return {}
+    options = {"compression": compression, "shuffle": bool(profile.get("shuffle")), "chunks": chunks}
+    if compression == "gzip":
+        options["compression_opts"] = profile.get("pressure_compression_level", 4)
+    return options
+
+
+def detach_pressure_arrays(surface) -> Tuple[Dict[str, np.ndarray], Dict[str, np.ndarray]]:
+    """Remove the pressure arrays from a mesh, they are written by write_pressure_arrays instead of VTK."""
+    point_arrays = {}
+    for name in [name for name in surface.point_data.keys() if is_pressure_point_array(name)]:
+        point_arrays[name] = np.asarray(surface.point_data[name])
+        del surface.point_data[name]
+    field_arrays = {}
+    for name in FIELD_PRESSURE_ARRAYS:
+        if name in surface.field_data:
+            field_arrays[name] = np.asarray(surface.field_data[name])
+            del surface.field_data[name]
+    return point_arrays, field_arrays
+
+
+def write_pressure_arrays(
+    file_path: str,
+    point_arrays: Dict[str, np.ndarray],
+    field_arrays: Dict[str, np.ndarray],
+    profile: Dict[str, Any],
+):
+    """Add detached pressure arrays to the PointData and FieldData groups of a VTKHDF file."""
+    if not point_arrays and not field_arrays:
+        return
+    with h5py.File(file_path, "a") as f:
+        root = f["VTKHDF"]
+        for group_name, arrays in (("PointData", point_arrays), ("FieldData", field_arrays)):
+            if not arrays:
+                continue
+            group = root.require_group(group_name)
+            for name, values in arrays.items():
+                stored, attributes = encode_pressure(values, profile)
+                dataset = group.create_dataset(
+                    stored_array_name(name, attributes), data=stored, **dataset_options(profile, stored.shape)
+                )
+                for key, value in attributes.items():
+                    dataset.attrs[key] = value
+
+
+def verify_pressure_arrays(
+    file_path: str,
+    point_arrays: Dict[str, np.ndarray],
+    field_arrays: Dict[str, np.ndarray],
+):
+    """
+    Read the pressure arrays written by write_pressure_arrays back and compare them with the exported values:
+    shape, storage type (int16 with scale_factor and add_offset or float32) and the decoded pressures within
+    half a quantization step. Raises ValueError if an array is missing or differs.
+    """
+    with h5py.File(file_path, "r") as f:
+        root = f["VTKHDF"]
+        for group_name, arrays in (("PointData", point_arrays), ("FieldData", field_arrays)):
+            for name, values in arrays.items():
+                values = np.asarray(values, dtype=np.float32)
+                dataset = get_pressure_array(root[group_name], name) if group_name in root else None
+                if dataset is None:
+                    raise ValueError(f"Pressure array {group_name}/{name} is missing")
+                if dataset.shape != values.shape:
+                    raise ValueError(f"Pressure array {dataset.name} has the shape {dataset.shape}, not {values.shape}")
+                if SCALE_ATTRIBUTE in dataset.attrs:
+                    if dataset.dtype != np.int16 or OFFSET_ATTRIBUTE not in dataset.attrs:
+                        raise ValueError(f"Quantized pressure array {dataset.name} is not int16 with scale and offset")
+                    tolerance = float(dataset.attrs[SCALE_ATTRIBUTE]) / 2 + 1e-4 * float(np.nanmax(np.abs(values), initial=0))
+                elif dataset.dtype != np.float32:
+                    raise ValueError(f"Pressure array {dataset.name} is {dataset.dtype}, not float32")
+                else:
+                    tolerance = 0
+                finite = np.isfinite(values)
+                error = np.abs(decode_pressure(dataset[()], dataset.attrs)[finite] - values[finite])
+                if error.size and float(error.max()) > tolerance:
+                    raise ValueError(f"Pressure array {dataset.name} differs by {float(error.max()):.4f} mmHg")
+
+
+def benchmark_export_profiles(
+    vtkhdf_path: Optional[str] = None,
+    output_directory: Optional[str] = None,
+    n_frames: int = 1200,
+    n_slices: int = 200,
+    n_angles: int = config.figure_number_of_angles,
+) -> Dict[str, Dict[str, float]]:
+    """
+    Write the per-vertex pressure of one reconstruction with every profile and compare write time,
+    file size and the time to read all pressure frames.
+
+    The per-slice pressure is taken from an exported .vtkhdf file (pressure_slice_matrix_flat) if one
+    is given, otherwise a synthetic swallow of n_frames (peristaltic wave on top of the resting
+    pressure) is used.
+
+    Run from the application directory with:
+        python -m logic.dataoutput.export_profiles [exported .vtkhdf file]
+
+    Returns:
+        Dictionary with the measurements per profile
+    """
+    from logic.dataoutput.ring_mesh import build_ring_stack_mesh, synthetic_ring_stack
+    from logic.dataoutput.vtkhdf_exporter import VTKHDFExporter
+    from logic.dataoutput.vtkhdf_reader import ReconstructionDataset
+
+    if vtkhdf_path:
+        with ReconstructionDataset(os.path.dirname(os.path.abspath(vtkhdf_path))) as dataset:
+            name = os.path.splitext(os.path.basename(vtkhdf_path))[0]
+            slice_matrix = dataset[dataset.names.index(name)].slice_pressure()
+        n_frames, n_slices = slice_matrix.shape
+    else:
+        time_axis = np.arange(n_frames)[:, None] / config.csv_values_per_second
+        position = np.linspace(0, 1, n_slices)[None, :]
+        wave = 120 * np.exp(-(((position - (time_axis % 10) / 8) / 0.05) ** 2))
+        noise = np.random.default_rng(0).normal(0, 2, (n_frames, n_slices))
+        slice_matrix = (10 + wave + noise).astype(np.float32)
+
+    if output_directory is None:
+        output_directory = tempfile.mkdtemp(prefix="profile_benchmark_")
+    os.makedirs(output_directory, exist_ok=True)
+
+    surface = build_ring_stack_mesh(*synthetic_ring_stack(n_slices, n_angles)[:3])
+    results = {}
+
+    for profile_name in config.export_profiles:
+        exporter = VTKHDFExporter(export_profile=profile_name)
+        file_path = os.path.join(output_directory, f"{profile_name}.vtkhdf")
+        profile_surface = surface.copy()
+        start = time.perf_counter()
+        pressure_matrix = exporter._map_pressure_to_vertices(slice_matrix, profile_surface, None)
+        for frame_idx in range(n_frames):
+            profile_surface[f"pressure_frame_{frame_idx:03d}"] = pressure_matrix[frame_idx]
+        profile_surface.field_data["pressure_slice_matrix_flat"] = slice_matrix.ravel()
+        exporter._export_to_vtkhdf(profile_surface, file_path)
+        write_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        with h5py.File(file_path, "r") as f:
+            point_data = f["VTKHDF/PointData"]
+            for frame_idx in range(n_frames):
+                dataset = get_pressure_array(point_data, f"pressure_frame_{frame_idx:03d}")
+                decode_pressure(dataset[()], dataset.attrs)
+        read_seconds = time.perf_counter() - start
+
+        results[profile_name] = {
+            "write_seconds": write_seconds,
+            "file_size_mb": os.path.getsize(file_path) / 1e6,
+            "read_seconds": read_seconds,
+            "max_error_mmhg": float(
+                np.max(np.abs(decode_pressure(*_read_frame(file_path, 0)) - pressure_matrix[0]))
+            ),
+        }
+
+    print(f"Export profile benchmark ({n_frames} frames, {surface.n_points} vertices) in {output_directory}")
+    for profile_name, values in results.items():
+        print(
+            f"  {profile_name:<13} write {values['write_seconds']:7.2f}s  "
+            f"size {values['file_size_mb']:8.1f}MB  read {values['read_seconds']:7.2f}s  "
+            f"max error {values['max_error_mmhg']:.3f}mmHg"
+        )
+    return results
+
+
+def _read_frame(file_path: str, frame_idx: int):
+    with h5py.File(file_path, "r") as f:
+        dataset = get_pressure_array(f["VTKHDF/PointData"], f"pressure_frame_{frame_idx:03d}")
+        return dataset[()], dict(dataset.attrs)
+
+
+if __name__ == "__main__":
+    import sys
+
+    benchmark_export_profiles(sys.argv[1] if len(sys.argv) > 1 else None)
@@ -0,0 +1,437 @@
+"""
+Binary glTF (.glb) export of the reconstructions for external web viewers.
+
+A .glb file holds one indexed triangle mesh built from figure_x/y/z (see ring_mesh) with:
+
+- POSITION: 16-bit quantized (KHR_mesh_quantization), the node's scale and translation restore
+  the coordinates
+- NORMAL: 8-bit normalized
+- TEXCOORD_0: lookup into a 256 x 1 colormap texture built from config.colorscale. The u coordinate
+  is the pressure of the vertex (config.cmin..config.cmax) in the first frame.
+- _SLICE_INDEX: slice (ring) of every vertex
+
+The pressure of all frames is stored once per slice as uint8 (frames x slices) accessor, referenced
+by mesh.extras["pressure_frames"]. A viewer animates the colors by writing the u coordinate of
+every vertex from its slice in the current frame:
+    u = (0.5 + value) / 256,  value = frames[frame * slices + slice_index]
+"""
+
+import base64
+import io
+import json
+import os
+import re
+import struct
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from PyQt6.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+import config
+from logic.dataoutput.ring_mesh import build_ring_stack_mesh, vertex_normals
+
+GLB_MAGIC = 0x46546C67
+JSON_CHUNK = 0x4E4F534A
+BIN_CHUNK = 0x004E4942
+COLORMAP_WIDTH = 256
+
+# glTF constants
+UNSIGNED_BYTE = 5121
+BYTE = 5120
+UNSIGNED_SHORT = 5123
+UNSIGNED_INT = 5125
+FLOAT = 5126
+ARRAY_BUFFER = 34962
+ELEMENT_ARRAY_BUFFER = 34963
+CLAMP_TO_EDGE = 33071
+LINEAR = 9729
+
+
+def colormap_png(width: int = COLORMAP_WIDTH) -> bytes:
+    """PNG image (width x 1) of config.colorscale."""
+    from PIL import Image
+
+    positions = [float(position) for position, _ in config.colorscale]
+    colors = np.array(
+        [[int(c) for c in re.findall(r"\d+", color)[:3]] for _, color in config.colorscale], dtype=float
+    )
+    samples = (np.arange(width) + 0.5) / width
+    row = np.stack([np.interp(samples, positions, colors[:, c]) for c in range(3)], axis=1)
+    image = Image.fromarray(np.round(row).astype(np.uint8)[None, :, :], mode="RGB")
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def normalize_pressure(pressure: np.ndarray) -> np.ndarray:
+    """Pressure in mmHg to the colormap position 0..255 (uint8)."""
+    values = (np.asarray(pressure, dtype=float) - config.cmin) / (config.cmax - config.cmin)
+    return np.round(np.clip(np.nan_to_num(values), 0, 1) * (COLORMAP_WIDTH - 1)).astype(np.uint8)
+
+
+class _GlbBuilder:
+    """Collects buffer views and accessors of one binary buffer."""
+
+    def __init__(self):
+        self.data = bytearray()
+        self.buffer_views: List[Dict[str, Any]] = []
+        self.accessors: List[Dict[str, Any]] = []
+
+    def add_buffer_view(self, payload: bytes, target: Optional[int] = None, byte_stride: Optional[int] = None) -> int:
+        # Every buffer view starts at a 4-byte boundary
+        self.data.extend(b"\x00" * (-len(self.data) % 4))
+        view = {"buffer": 0, "byteOffset": len(self.data), "byteLength": len(payload)}
+        if target is not None:
+            view["target"] = target
+        if byte_stride is not None:
+            view["byteStride"] = byte_stride
+        self.data.extend(payload)
+        self.buffer_views.append(view)
+        return len(self.buffer_views) - 1
+
+    def add_accessor(self, buffer_view: int, component_type: int, count: int, accessor_type: str, **extra) -> int:
+        accessor = {
+            "bufferView": buffer_view,
+            "componentType": component_type,
+            "count": int(count),
+            "type": accessor_type,
+        }
+        accessor.update(extra)
+        self.accessors.append(accessor)
+        return len(self.accessors) - 1
+
+
+def build_glb(
+    figure_x: np.ndarray,
+    figure_y: np.ndarray,
+    figure_z: np.ndarray,
+    surfacecolor_list: Optional[np.ndarray] = None,
+    name: str = "esophagus",
+) -> bytes:
+    """
+    Build the .glb file content of one reconstruction.
+
+    Args:
+        figure_x, figure_y, figure_z: Coordinates with shape (slices, angles)
+        surfacecolor_list: Pressure per frame and slice in mmHg, shape (frames, slices)
+        name: Name of the mesh and node
+
+    Returns:
+        bytes: Binary glTF
+    """
+    surface = build_ring_stack_mesh(figure_x, figure_y, figure_z, geometric_attributes=False)
+    points = np.asarray(surface.points, dtype=float)
+    triangles = np.asarray(surface.regular_faces)
+    slice_index = np.asarray(surface.point_data["slice_index"])
+    n_vertices = len(points)
+    builder = _GlbBuilder()
+
+    # Positions: 16-bit per axis, padded to 8 bytes per vertex (attributes are 4-byte aligned)
+    position_min = points.min(axis=0)
+    extent = np.maximum(points.max(axis=0) - position_min, 1e-9)
+    quantized = np.zeros((n_vertices, 4), dtype=np.uint16)
+    quantized[:, :3] = np.round((points - position_min) / extent * 65535)
+    view = builder.add_buffer_view(quantized.tobytes(), ARRAY_BUFFER, byte_stride=8)
+    position_accessor = builder.add_accessor(
+        view,
+        UNSIGNED_SHORT,
+        n_vertices,
+        "VEC3",
+        min=quantized[:, :3].min(axis=0).tolist(),
+        max=quantized[:, :3].max(axis=0).tolist(),
+    )
+
+    # Normals: 8-bit normalized, padded to 4 bytes per vertex
+    normals = np.zeros((n_vertices, 4), dtype=np.int8)
+    normals[:, :3] = np.round(vertex_normals(points, triangles) * 127)
+    view = builder.add_buffer_view(normals.tobytes(), ARRAY_BUFFER, byte_stride=4)
+    normal_accessor = builder.add_accessor(view, BYTE, n_vertices, "VEC3", normalized=True)
+
+    # Pressure frames (uint8 per frame and slice) and texture coordinates of the first frame
+    n_slices = int(slice_index.max()) + 1
+    if surfacecolor_list is not None and len(surfacecolor_list) > 0:
+        frames = normalize_pressure(surfacecolor_list)
+    else:
+        frames = np.zeros((1, n_slices), dtype=np.uint8)
+    texcoords = np.empty((n_vertices, 2), dtype=np.uint16)
+    texcoords[:, 0] = np.round((0.5 + frames[0][slice_index]) / COLORMAP_WIDTH * 65535)
+    texcoords[:, 1] = 32768
+    view = builder.add_buffer_view(texcoords.tobytes(), ARRAY_BUFFER)
+    texcoord_accessor = builder.add_accessor(view, UNSIGNED_SHORT, n_vertices, "VEC2", normalized=True)
+
+    view = builder.add_buffer_view(slice_index.astype(np.float32).tobytes(), ARRAY_BUFFER)
+    slice_accessor = builder.add_accessor(view, FLOAT, n_vertices, "SCALAR")
+
+    index_type = (np.uint16, UNSIGNED_SHORT) if n_vertices < 65535 else (np.uint32, UNSIGNED_INT)
+    view = builder.add_buffer_view(
+        triangles.astype(index_type[0]).tobytes(), ELEMENT_ARRAY_BUFFER
+    )
+    index_accessor = builder.add_accessor(view, index_type[1], triangles.size, "SCALAR")
+
+    view = builder.add_buffer_view(np.ascontiguousarray(frames).tobytes())
+    frames_accessor = builder.add_accessor(view, UNSIGNED_BYTE, frames.size, "SCALAR")
+
+    image_view = builder.add_buffer_view(colormap_png())
+
+    gltf = {
+        "asset": {"version": "2.0", "generator": "EsophagusVisualization"},
+        "extensionsUsed": ["KHR_mesh_quantization"],
+        "extensionsRequired": ["KHR_mesh_quantization"],
+        "scene": 0,
+        "scenes": [{"nodes": [0]}],
+        "nodes": [
+            {
+                "name": name,
+                "mesh": 0,
+                "translation": position_min.tolist(),
+                "scale": (extent / 65535).tolist(),
+            }
+        ],
+        "meshes": [
+            {
+                "name": name,
+                "primitives": [
+                    {
+                        "attributes": {
+                            "POSITION": position_accessor,
+                            "NORMAL": normal_accessor,
+                            "TEXCOORD_0": texcoord_accessor,
+                            "_SLICE_INDEX": slice_accessor,
+                        },
+                        "indices": index_accessor,
+                        "material": 0,
+                    }
+                ],
+                "extras": {
+                    "pressure_frames": {
+                        "accessor": frames_accessor,
+                        "frames": int(frames.shape[0]),
+                        "slices": int(frames.shape[1]),
+                        "frame_rate": config.csv_values_per_second,
+                        "cmin": config.cmin,
+                        "cmax": config.cmax,
+                        "colormap_width": COLORMAP_WIDTH,
+                    }
+                },
+            }
+        ],
+        "materials": [
+            {
+                "name": "pressure",
+                "pbrMetallicRoughness": {
+                    "baseColorTexture": {"index": 0},
+                    "metallicFactor": 0.0,
+                    "roughnessFactor": 0.8,
+                },
+                "doubleSided": True,
+            }
+        ],
+        "textures": [{"source": 0, "sampler": 0}],
+        "samplers": [
+            {"magFilter": LINEAR, "minFilter": LINEAR, "wrapS": CLAMP_TO_EDGE, "wrapT": CLAMP_TO_EDGE}
+        ],
+        "images": [{"bufferView": image_view, "mimeType": "image/png"}],
+        "accessors": builder.accessors,
+        "bufferViews": builder.buffer_views,
+        "buffers": [{"byteLength": len(builder.data)}],
+    }
+
+    json_chunk = json.dumps(gltf, separators=(",", ":")).encode("utf-8")
+    json_chunk += b" " * (-len(json_chunk) % 4)
+    bin_chunk = bytes(builder.data) + b"\x00" * (-len(builder.data) % 4)
+    total_length = 12 + 8 + len(json_chunk) + 8 + len(bin_chunk)
+    return b"".join(
+        (
+            struct.pack("<III", GLB_MAGIC, 2, total_length),
+            struct.pack("<II", len(json_chunk), JSON_CHUNK),
+            json_chunk,
+            struct.pack("<II", len(bin_chunk), BIN_CHUNK),
+            bin_chunk,
+        )
+    )
+
+
+def export_glb(visualization_data, file_path: str) -> bool:
+    """Write the .glb file of one VisualizationData."""
+    try:
+        surfacecolor_list = None
+        figure_creator = getattr(visualization_data, "figure_creator", None)
+        if figure_creator is not None:
+            surfacecolor_list = figure_creator.get_surfacecolor_list()
+        content = build_glb(
+            visualization_data.figure_x,
+            visualization_data.figure_y,
+            visualization_data.figure_z,
+            surfacecolor_list,
+            name=os.path.splitext(os.path.basename(file_path))[0],
+        )
+        with open(file_path, "wb") as f:
+            f.write(content)
+        return True
+    except Exception as e:
+        print(f"Error exporting glTF {file_path}: {e}")
+        return False
+
+
+class GltfExportSignals(QObject):
+    progress_value = pyqtSignal(int)
+    # paths of the exported files
+    finished = pyqtSignal(object)
+    error_occurred = pyqtSignal(str)
+
+
+class GltfExportWorker(QRunnable):
+    """Runs export_glb for several reconstructions in a thread of the global QThreadPool."""
+
+    def __init__(self, reconstructions):
+        """
+        init GltfExportWorker
+        :param reconstructions: (VisualizationData, file path of the .glb file) per reconstruction
+        """
+        super().__init__()
+        self.reconstructions = reconstructions
+        self.signals = GltfExportSignals()
+        self.is_cancelled = False
+
+    def cancel(self):
+        """Stops the export after the current file (may be called from the GUI thread)"""
+        self.is_cancelled = True
+
+    def run(self):
+        exported_files = []
+        try:
+            for i, (visualization_data, file_path) in enumerate(self.reconstructions):
+                if self.is_cancelled:
+                    break
+                if export_glb(visualization_data, file_path):
+                    exported_files.append(file_path)
+                self.signals.progress_value.emit(int(100 * (i + 1) / len(self.reconstructions)))
+        except Exception as e:
+            # No message box, the worker does not run in the GUI thread
+            print(f"An error occurred during export: {e}")
+            self.signals.error_occurred.emit(str(e))
+            return
+        self.signals.finished.emit(exported_files)
+
+
+def start_gltf_export(worker: GltfExportWorker):
+    QThreadPool.globalInstance().start(worker)
+
+
+def read_glb(file_path: str) -> Dict[str, Any]:
+    """Parse a .glb file into its JSON and the decoded positions, indices and pressure frames."""
+    with open(file_path, "rb") as f:
+        content = f.read()
+    json_length = struct.unpack_from("<I", content, 12)[0]
+    gltf = json.loads(content[20 : 20 + json_length])
+    binary = memoryview(content)[20 + json_length + 8 :]
+
+    def accessor_array(index: int, dtype, components: int) -> np.ndarray:
+        accessor = gltf["accessors"][index]
+        view = gltf["bufferViews"][accessor["bufferView"]]
+        stride = view.get("byteStride", np.dtype(dtype).itemsize * components) // np.dtype(dtype).itemsize
+        data = np.frombuffer(binary, dtype=dtype, count=accessor["count"] * stride, offset=view["byteOffset"])
+        return data.reshape(accessor["count"], stride)[:, :components]
+
+    primitive = gltf["meshes"][0]["primitives"][0]
+    node = gltf["nodes"][0]
+    positions = accessor_array(primitive["attributes"]["POSITION"], np.uint16, 3) * np.array(
+        node["scale"]
+    ) + np.array(node["translation"])
+    index_dtype = np.uint16 if gltf["accessors"][primitive["indices"]]["componentType"] == UNSIGNED_SHORT else np.uint32
+    frames_info = gltf["meshes"][0]["extras"]["pressure_frames"]
+    return {
+        "gltf": gltf,
+        "positions": positions,
+        "triangles": accessor_array(primitive["indices"], index_dtype, 1).reshape(-1, 3),
+        "pressure_frames": accessor_array(frames_info["accessor"], np.uint8, 1).reshape(
+            frames_info["frames"], frames_info["slices"]
+        ),
+    }
+
+
+def read_html_figure(file_path: str) -> Dict[str, Any]:
+    """
+    Parse an HTML file written by figure.write_html ("Download for Display") into the traces and layout of the
+    embedded figure, with the coordinates and colors of the traces as arrays (the counterpart of read_glb).
+    """
+    with open(file_path, "r", encoding="utf-8") as f:
+        content = f.read()
+    decoder = json.JSONDecoder()
+    # Plotly.newPlot("<div id>", [traces], {layout}, {config}), the last call (plotly.js contains others)
+    position = content.rindex("Plotly.newPlot(") + len("Plotly.newPlot(")
+    _, position = decoder.raw_decode(content, content.index('"', position))
+    traces, position = decoder.raw_decode(content, content.index("[", position))
+    layout, _ = decoder.raw_decode(content, content.index("{", position))
+    for trace in traces:
+        for key in ("x", "y", "z", "surfacecolor", "intensity"):
+            if key in trace:
+                trace[key] = _html_array(trace[key])
+    return {"traces": traces, "layout": layout}
+
+
+def _html_array(value) -> np.ndarray:
+    """Array of a trace property, plotly 6 writes numpy arrays as base64 typed arrays, older versions as lists"""
+    if isinstance(value, dict) and "bdata" in value:
+        array = np.frombuffer(base64.b64decode(value["bdata"]), dtype=np.dtype(value["dtype"]))
+        if "shape" in value:
+            array = array.reshape([int(size) for size in str(value["shape"]).split(",")])
+        return array
+    return np.asarray(value, dtype=np.float64)
+
+
+def benchmark_against_html(
+    visualization_data=None, output_directory: Optional[str] = None, repetitions: int = 5
+) -> Dict[str, Dict[str, float]]:
+    """
+    Compare the .glb export of a reconstruction with the HTML export of its Plotly figure, written as by
+    "Download for Display" (figure.write_html, including plotly.js).
+
+    Load time is the time to read the file from disk and decode its mesh into arrays (read_glb and
+    read_html_figure, mean of the repetitions), the rendering in a browser is not included. The .glb file holds
+    the pressure of all frames, the HTML file the coloring of the current frame.
+
+    Run from the application directory with: python -m logic.dataoutput.gltf_exporter
+
+    Returns:
+        Dictionary with file size (MB), write and load time (s) per format
+    """
+    import tempfile
+
+    from logic.dataoutput.ring_mesh import synthetic_visualization_data
+
+    if visualization_data is None:
+        visualization_data = synthetic_visualization_data()
+    output_directory = output_directory or tempfile.mkdtemp(prefix="gltf_benchmark_")
+    figure = visualization_data.figure_creator.get_figure()
+    files = {
+        "glb": (os.path.join(output_directory, "benchmark.glb"), lambda path: export_glb(visualization_data, path), read_glb),
+        "html": (os.path.join(output_directory, "benchmark.html"), figure.write_html, read_html_figure),
+    }
+
+    results = {}
+    for format_type, (file_path, write, load) in files.items():
+        start = time.perf_counter()
+        write(file_path)
+        write_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        for _ in range(repetitions):
+            load(file_path)
+        results[format_type] = {
+            "file_size_mb": os.path.getsize(file_path) / 1e6,
+            "write_seconds": write_seconds,
+            "load_seconds": (time.perf_counter() - start) / repetitions,
+        }
+
+    print(f"glTF vs HTML export ({visualization_data.figure_x.shape[0]} slices) in {output_directory}")
+    for format_type, values in results.items():
+        print(
+            f"  {format_type:<4} size {values['file_size_mb']:8.2f}MB  "
+            f"write {values['write_seconds']:6.2f}s  load {values['load_seconds']:6.3f}s"
+        )
+    return results
+
+
+if __name__ == "__main__":
+    benchmark_against_html()
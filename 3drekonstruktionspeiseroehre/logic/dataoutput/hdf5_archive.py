@@ -0,0 +1,260 @@
+"""
+Single HDF5 archive with all exported reconstructions.
+
+Instead of one .vtkhdf file per barium swallow image, the archive export of the mass VTKHDF export
+stores every reconstruction as a group /reconstructions/<name> of one HDF5 file. A group holds the
+content of the reconstruction's VTKHDF file (the VTKHDF group with points, polygons, point/cell/field
+data and, if exported, the PressureData group) and optionally the validation attributes as JSON.
+
+All datasets are written with the compression settings of the archive (stored as root attributes).
+The top-level /index table has one row per reconstruction, so a loader finds a reconstruction
+without scanning the groups:
+
+    group, patient_id, visit_id, visit_type, xray_minute, n_vertices, n_cells, n_slices,
+    vertex_offset, cell_offset
+
+vertex_offset and cell_offset are the positions of the reconstruction's vertices and cells if the
+vertices and cells of all reconstructions are concatenated in index order.
+"""
+
+import json
+import os
+from typing import Any, Dict, List, Optional
+
+import h5py
+import numpy as np
+
+import config
+
+RECONSTRUCTIONS_GROUP = "reconstructions"
+INDEX_DATASET = "index"
+VALIDATION_DATASET = "validation_attributes"
+ARCHIVE_VERSION = 1
+
+INDEX_DTYPE = np.dtype(
+    [
+        ("group", "S128"),
+        ("patient_id", "S64"),
+        ("visit_id", "i8"),
+        ("visit_type", "S64"),
+        ("xray_minute", "S32"),
+        ("n_vertices", "i8"),
+        ("n_cells", "i8"),
+        ("n_slices", "i8"),
+        ("vertex_offset", "i8"),
+        ("cell_offset", "i8"),
+    ]
+)
+
+
+class ReconstructionArchiveWriter:
+    """
+    Appends exported .vtkhdf files to an archive.
+
+    Usage:
+        with ReconstructionArchiveWriter(archive_path) as archive:
+            archive.add(vtkhdf_path, {"patient_id": ..., "visit_id": ..., ...})
+    """
+
+    def __init__(self, archive_path: str):
+        self.archive_path = archive_path
+        self.file = h5py.File(archive_path, "w")
+        self.file.attrs["version"] = ARCHIVE_VERSION
+        self.file.attrs["compression"] = "gzip"
+        self.file.attrs["compression_level"] = config.archive_compression_level
+        self.file.attrs["shuffle"] = config.archive_shuffle
+        self.reconstructions = self.file.create_group(RECONSTRUCTIONS_GROUP)
+        # Index rows without the offsets, they are computed from the final order in close()
+        self.index_rows: List[tuple] = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def add(
+        self, vtkhdf_path: str, info: Dict[str, Any], validation_path: Optional[str] = None
+    ) -> bool:
+        """
+        Copy an exported .vtkhdf file (and its validation attributes) into a new group of the archive.
+        A group of the same name (file name) is replaced together with its index row.
+
+        Args:
+            vtkhdf_path: File written by VTKHDFExporter
+            info: patient_id, visit_id, visit_type, xray_minute and n_slices of the reconstruction
+            validation_path: Optional validation attributes JSON of the reconstruction
+
+        Returns:
+            bool: True if the reconstruction was added
+        """
+        group_name = os.path.splitext(os.path.basename(vtkhdf_path))[0]
+        try:
+            if group_name in self.reconstructions:
+                del self.reconstructions[group_name]
+                self.index_rows = [row for row in self.index_rows if row[0] != group_name]
+            group = self.reconstructions.create_group(group_name)
+            with h5py.File(vtkhdf_path, "r") as source:
+                _copy_group(source, group)
+                n_vertices = int(source["VTKHDF/NumberOfPoints"][0])
+                n_cells = int(np.sum(source["VTKHDF/Polygons/NumberOfCells"][()]))
+
+            if validation_path and os.path.exists(validation_path):
+                with open(validation_path, "r", encoding="utf-8") as f:
+                    group.create_dataset(VALIDATION_DATASET, data=f.read(), dtype=h5py.string_dtype())
+
+            for key in ("patient_id", "visit_id", "visit_type", "xray_minute"):
+                group.attrs[key] = info.get(key) if info.get(key) is not None else ""
+
+            self.index_rows.append(
+                (
+                    group_name,
+                    str(info.get("patient_id", "")),
+                    int(info.get("visit_id") or -1),
+                    str(info.get("visit_type", "")),
+                    str(info.get("xray_minute", "")),
+                    n_vertices,
+                    n_cells,
+                    int(info.get("n_slices") or -1),
+                )
+            )
+            return True
+
+        except Exception as e:
+            print(f"Error adding {vtkhdf_path} to the archive: {e}")
+            if group_name in self.reconstructions:
+                del self.reconstructions[group_name]
+            return False
+
+    def close(self):
+        """Write the index table and close the archive."""
+        if not self.file:
+            return
+        try:
+            index = np.zeros(len(self.index_rows), dtype=INDEX_DTYPE)
+            for position, row in enumerate(self.index_rows):
+                index[position] = tuple(_encode(value) for value in row) + (0, 0)
+            # Positions of the vertices and cells if those of all reconstructions are concatenated in index order
+            index["vertex_offset"][1:] = np.cumsum(index["n_vertices"])[:-1]
+            index["cell_offset"][1:] = np.cumsum(index["n_cells"])[:-1]
+            self.file.create_dataset(INDEX_DATASET, data=index)
+        finally:
+            self.file.close()
+            self.file = None
+
+
+class ReconstructionArchive:
+    """
+    Random access to the reconstructions of an archive.
+
+    Only the index table is read on opening; read() and to_polydata() load the datasets of a single
+    reconstruction group.
+
+    Usage:
+        with ReconstructionArchive(archive_path) as archive:
+            rows = archive.find(patient_id="P001")
+            mesh = archive.to_polydata(rows[0])
+    """
+
+    def __init__(self, archive_path: str):
+        self.file = h5py.File(archive_path, "r")
+        self.index = self.file[INDEX_DATASET][()]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def find(self, **criteria) -> List[int]:
+        """Positions in the index of the reconstructions matching all criteria (e.g. visit_id=12)."""
+        mask = np.ones(len(self.index), dtype=bool)
+        for key, value in criteria.items():
+            column = self.index[key]
+            mask &= column == (_encode(str(value)) if column.dtype.kind == "S" else value)
+        return np.flatnonzero(mask).tolist()
+
+    def group(self, position: int) -> h5py.Group:
+        return self.file[RECONSTRUCTIONS_GROUP][self.index["group"][position].decode()]
+
+    def read(self, position: int, point_arrays: Optional[List[str]] = None) -> Dict[str, Any]:
+        """
+        Read one reconstruction.
+
+        Args:
+            position: Position in the index table
+            point_arrays: Names of the point data arrays to read (None for all)
+
+        Returns:
+            Dictionary with 'points', 'triangles', 'point_data', 'cell_data' and 'attributes'
+        """
+        group = self.group(position)
+        vtkhdf = group["VTKHDF"]
+        connectivity = vtkhdf["Polygons/Connectivity"][()]
+        point_data = vtkhdf["PointData"] if "PointData" in vtkhdf else {}
+        cell_data = vtkhdf["CellData"] if "CellData" in vtkhdf else {}
+        names = point_arrays if point_arrays is not None else list(point_data.keys())
+        return {
+            "points": vtkhdf["Points"][()],
+            # The exporter writes triangle meshes only
+            "triangles": connectivity.reshape(-1, 3),
+            "point_data": {name: point_data[name][()] for name in names},
+            "cell_data": {name: cell_data[name][()] for name in cell_data.keys()},
+            "attributes": dict(group.attrs),
+        }
+
+    def validation_attributes(self, position: int) -> Optional[Dict[str, Any]]:
+        group = self.group(position)
+        if VALIDATION_DATASET not in group:
+            return None
+        value = group[VALIDATION_DATASET][()]
+        return json.loads(value.decode() if isinstance(value, bytes) else value)
+
+    def to_polydata(self, position: int, point_arrays: Optional[List[str]] = None):
+        """Read one reconstruction as pyvista PolyData."""
+        import pyvista as pv
+
+        data = self.read(position, point_arrays)
+        surface = pv.PolyData.from_regular_faces(data["points"], data["triangles"])
+        for name, values in data["point_data"].items():
+            surface.point_data[name] = values
+        for name, values in data["cell_data"].items():
+            surface.cell_data[name] = values
+        return surface
+
+    def close(self):
+        self.file.close()
+
+
+def _copy_group(source: h5py.Group, target: h5py.Group):
+    """Copy all groups, datasets and attributes, numeric datasets are written with the archive compression."""
+    for key, value in source.attrs.items():
+        target.attrs[key] = value
+    for name, item in source.items():
+        if isinstance(item, h5py.Group):
+            _copy_group(item, target.create_group(name))
+            continue
+        data = item[()]
+        if item.ndim > 0 and item.size > 0 and item.dtype.kind in "biuf":
+            # The chunks of VTK's resizable datasets can be larger than the data, the archive datasets have a
+            # fixed shape
+            chunks = item.chunks if item.chunks and all(c <= n for c, n in zip(item.chunks, item.shape)) else True
+            dataset = target.create_dataset(
+                name,
+                data=data,
+                compression="gzip",
+                compression_opts=config.archive_compression_level,
+                shuffle=config.archive_shuffle,
+                chunks=chunks,
+            )
+        else:
+            dataset = target.create_dataset(name, data=data, dtype=item.dtype)
+        for key, value in item.attrs.items():
+            dataset.attrs[key] = value
+
+
+def _encode(value):
+    return value.encode() if isinstance(value, str) else value
@@ -0,0 +1,255 @@
+"""
+Per-vertex HRM pressure stored as one chunked dataset next to the VTKHDF geometry.
+
+Instead of one point-data array per frame (pressure_frame_000 ... pressure_frame_NNN), all frames
+are written into a single (frames x vertices) float32 dataset /PressureData/vertex_pressure of the
+.vtkhdf file. The dataset is chunked along the time axis and compressed, so reading a single frame
+only touches one chunk. VTK ignores the additional group, the geometry stays readable with pyvista.
+"""
+
+import os
+import tempfile
+import time
+from typing import Any, Dict, Optional
+
+import h5py
+import numpy as np
+
+import config
+from logic.dataoutput.export_profiles import dataset_options, decode_pressure, encode_pressure
+
+PRESSURE_GROUP = "PressureData"
+PRESSURE_DATASET = "vertex_pressure"
+
+
+def write_pressure_dataset(
+    file_path: str, pressure_matrix: np.ndarray, profile: Optional[Dict[str, Any]] = None
+) -> bool:
+    """
+    Write the (frames x vertices) pressure matrix into an existing VTKHDF file.
+
+    Args:
+        file_path: Path of the .vtkhdf file written by VTKHDFExporter
+        pressure_matrix: Pressure in mmHg, shape (frames, vertices)
+        profile: Export profile (see export_profiles), sets compression and storage type.
+            Without profile the dataset is float32 with gzip (config.pressure_dataset_compression_level)
+
+    Returns:
+        bool: True if the dataset was written
+    """
+    try:
+        pressure_matrix = np.asarray(pressure_matrix, dtype=np.float32)
+        n_frames, n_vertices = pressure_matrix.shape
+        if n_frames == 0 or n_vertices == 0:
+            return False
+
+        with h5py.File(file_path, "a") as f:
+            if PRESSURE_GROUP in f:
+                del f[PRESSURE_GROUP]
+            group = f.create_group(PRESSURE_GROUP)
+            chunks = (min(config.pressure_dataset_chunk_frames, n_frames), n_vertices)
+            if profile is None:
+                dataset = group.create_dataset(
+                    PRESSURE_DATASET,
+                    data=pressure_matrix,
+                    chunks=chunks,
+                    compression="gzip",
+                    compression_opts=config.pressure_dataset_compression_level,
+                    shuffle=True,
+                )
+                dataset.attrs["units"] = "mmHg"
+            else:
+                stored, attributes = encode_pressure(pressure_matrix, profile)
+                dataset = group.create_dataset(
+                    PRESSURE_DATASET, data=stored, **dataset_options(profile, stored.shape, chunks)
+                )
+                for key, value in attributes.items():
+                    dataset.attrs[key] = value
+            dataset.attrs["axes"] = "frames, vertices"
+            dataset.attrs["frame_rate"] = config.csv_values_per_second
+        return True
+
+    except Exception as e:
+        print(f"Error writing pressure dataset: {e}")
+        return False
+
+
+class PressureDatasetReader:
+    """
+    Reads frames of the pressure dataset written by write_pressure_dataset.
+
+    Usage:
+        with PressureDatasetReader(file_path) as reader:
+            pressure = reader.frame(120)
+    """
+
+    def __init__(self, file_path: str):
+        self.file = h5py.File(file_path, "r")
+        try:
+            self.dataset = self.file[f"{PRESSURE_GROUP}/{PRESSURE_DATASET}"]
+        except KeyError:
+            # File without pressure dataset, the file is not left open
+            self.file.close()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @property
+    def n_frames(self) -> int:
+        return self.dataset.shape[0]
+
+    @property
+    def n_vertices(self) -> int:
+        return self.dataset.shape[1]
+
+    @property
+    def frame_rate(self) -> float:
+        return float(self.dataset.attrs.get("frame_rate", config.csv_values_per_second))
+
+    def frame(self, frame_index: int) -> np.ndarray:
+        """Pressure of all vertices at one frame, shape (vertices,)."""
+        return decode_pressure(self.dataset[frame_index], self.dataset.attrs)
+
+    def frames(self, start: int, stop: int) -> np.ndarray:
+        """Pressure of all vertices for the frames start..stop-1, shape (frames, vertices)."""
+        return decode_pressure(self.dataset[start:stop], self.dataset.attrs)
+
+    def vertex_series(self, vertex_index: int) -> np.ndarray:
+        """Pressure of one vertex over all frames, shape (frames,)."""
+        return decode_pressure(self.dataset[:, vertex_index], self.dataset.attrs)
+
+    def close(self):
+        self.file.close()
+
+
+def benchmark_pressure_layouts(
+    output_directory: Optional[str] = None,
+    n_frames: int = 2000,
+    n_slices: int = 200,
+    n_angles: int = config.figure_number_of_angles,
+    n_random_reads: int = 200,
+) -> Dict[str, Dict[str, float]]:
+    """
+    Compare the per-frame point arrays with the chunked pressure dataset on a synthetic reconstruction.
+
+    Measures write time, file size and the latency of reading random frames.
+
+    Run from the application directory with: python -m logic.dataoutput.pressure_dataset
+
+    Returns:
+        Dictionary with the measurements per layout
+    """
+    import pyvista as pv
+
+    from logic.dataoutput.ring_mesh import synthetic_ring_stack
+    from logic.dataoutput.vtkhdf_exporter import VTKHDFExporter
+
+    if output_directory is None:
+        output_directory = tempfile.mkdtemp(prefix="pressure_benchmark_")
+    os.makedirs(output_directory, exist_ok=True)
+
+    x, y, z, _ = synthetic_ring_stack(n_slices, n_angles)
+    surface = pv.StructuredGrid(x, y, z).extract_surface().clean(tolerance=1e-6).triangulate()
+
+    rng = np.random.default_rng(0)
+    pressure_matrix = rng.uniform(config.cmin, config.cmax, (n_frames, surface.n_points)).astype(np.float32)
+    read_indices = rng.integers(0, n_frames, n_random_reads)
+    exporter = VTKHDFExporter()
+    results = {}
+
+    # Current layout: one point-data array per frame
+    per_frame_path = os.path.join(output_directory, "per_frame_arrays.vtkhdf")
+    per_frame_surface = surface.copy()
+    start = time.perf_counter()
+    for frame_idx in range(n_frames):
+        per_frame_surface[f"pressure_frame_{frame_idx:03d}"] = pressure_matrix[frame_idx]
+    exporter._export_to_vtkhdf(per_frame_surface, per_frame_path)
+    write_seconds = time.perf_counter() - start
+
+    with h5py.File(per_frame_path, "r") as f:
+        point_data = f["VTKHDF/PointData"]
+        start = time.perf_counter()
+        for frame_idx in read_indices:
+            point_data[f"pressure_frame_{frame_idx:03d}"][:]
+        read_seconds = (time.perf_counter() - start) / n_random_reads
+    results["per_frame_arrays"] = {
+        "write_seconds": write_seconds,
+        "file_size_mb": os.path.getsize(per_frame_path) / 1e6,
+        "random_frame_read_ms": read_seconds * 1000,
+    }
+
+    # New layout: one chunked (frames x vertices) dataset
+    dataset_path = os.path.join(output_directory, "pressure_dataset.vtkhdf")
+    start = time.perf_counter()
+    exporter._export_to_vtkhdf(surface.copy(), dataset_path)
+    write_pressure_dataset(dataset_path, pressure_matrix)
+    write_seconds = time.perf_counter() - start
+
+    with PressureDatasetReader(dataset_path) as reader:
+        start = time.perf_counter()
+        for frame_idx in read_indices:
+            reader.frame(frame_idx)
+        read_seconds = (time.perf_counter() - start) / n_random_reads
+    results["pressure_dataset"] = {
+        "write_seconds": write_seconds,
+        "file_size_mb": os.path.getsize(dataset_path) / 1e6,
+        "random_frame_read_ms": read_seconds * 1000,
+    }
+
+    print(f"Pressure layout benchmark ({n_frames} frames, {surface.n_points} vertices) in {output_directory}")
+    for layout, values in results.items():
+        print(
+            f"  {layout:<18} write {values['write_seconds']:8.2f}s  "
+            f"size {values['file_size_mb']:8.1f}MB  "
+            f"random frame read {values['random_frame_read_ms']:8.3f}ms"
+        )
+    return results
+
+
+def verify_pressure_mapping(
+    n_frames: int = 50,
+    n_slices: int = 200,
+    n_angles: int = config.figure_number_of_angles,
+) -> bool:
+    """
+    Check the pressure-to-vertex mapping of VTKHDFExporter on a synthetic reconstruction.
+
+    Every slice of the synthetic ring stack has its own height, so the expected slice of a vertex
+    is the slice with the nearest height. The mesh runs through the same cleaning and triangulation
+    as the export before the mapped pressure is compared with the pressure of the expected slice.
+
+    Returns:
+        bool: True if every vertex got the pressure of its own slice
+    """
+    from logic.dataoutput.ring_mesh import synthetic_ring_stack
+    from logic.dataoutput.vtkhdf_exporter import VTKHDFExporter
+
+    x, y, z, heights = synthetic_ring_stack(n_slices, n_angles)
+
+    exporter = VTKHDFExporter()
+    surface = exporter._create_mesh_from_coords(x, y, z)
+    surface = surface.triangulate().clean(tolerance=1e-6)
+
+    rng = np.random.default_rng(0)
+    slice_matrix = rng.uniform(config.cmin, config.cmax, (n_frames, n_slices)).astype(np.float32)
+    start = time.perf_counter()
+    pressure_matrix = exporter._map_pressure_to_vertices(slice_matrix, surface, None)
+    mapping_seconds = time.perf_counter() - start
+
+    expected_slices = np.abs(surface.points[:, 2][:, None] - heights[None, :]).argmin(axis=1)
+    mismatches = int(np.count_nonzero(pressure_matrix != slice_matrix[:, expected_slices]))
+
+    print(
+        f"Pressure mapping ({n_frames} frames, {surface.n_points} vertices): "
+        f"{mapping_seconds * 1000:.2f}ms, {mismatches} mismatching values"
+    )
+    return mismatches == 0
+
+
+if __name__ == "__main__":
+    verify_pressure_mapping()
+    benchmark_pressure_layouts()
@@ -0,0 +1,191 @@
+"""
+Watertight meshes of the reconstructions for 3D printing (binary STL / PLY).
+
+The mesh is built directly from the (slices x angles) ring stack of a reconstruction with both ends
+capped (see ring_mesh), instead of reconstructing a surface from the point cloud. It can be decimated
+to a target number of triangles; the decimation keeps the topology, so the mesh stays closed.
+Larger exports run in parallel worker processes. The export is started from the GUI in a
+PrintMeshExportWorker thread, which reports the progress and can be cancelled.
+"""
+
+import multiprocessing
+import os
+from typing import Any, Callable, Dict, List, Tuple
+
+import numpy as np
+import pyvista as pv
+from PyQt6.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+import config
+from logic.dataoutput.ring_mesh import build_ring_stack_mesh
+
+PRINT_MESH_FORMATS = ("stl", "ply")
+
+
+def build_print_mesh(
+    figure_x: np.ndarray,
+    figure_y: np.ndarray,
+    figure_z: np.ndarray,
+    target_triangles: int = 0,
+) -> pv.PolyData:
+    """
+    Build the capped triangle mesh of a reconstruction.
+
+    Args:
+        figure_x, figure_y, figure_z: Coordinates with shape (slices, angles)
+        target_triangles: Decimate to about this many triangles (0 = no decimation)
+
+    Returns:
+        pv.PolyData: Closed triangle mesh with outward facing triangles
+    """
+    surface = build_ring_stack_mesh(figure_x, figure_y, figure_z, end_caps=True, geometric_attributes=False)
+    del surface.point_data["slice_index"]
+
+    if 0 < target_triangles < surface.n_cells:
+        reduction = 1 - target_triangles / surface.n_cells
+        surface = surface.decimate_pro(
+            reduction, preserve_topology=True, boundary_vertex_deletion=False
+        )
+    return surface
+
+
+def write_print_mesh(surface: pv.PolyData, file_path: str):
+    """Write a mesh as binary STL or PLY, the format is taken from the file extension."""
+    surface.save(file_path, binary=True)
+
+
+def _export_print_mesh_worker(
+    figure_x: np.ndarray,
+    figure_y: np.ndarray,
+    figure_z: np.ndarray,
+    file_path: str,
+    target_triangles: int,
+) -> Dict[str, Any]:
+    """Build and write one mesh inside a worker process."""
+    result = {"file_path": file_path, "n_triangles": 0, "watertight": False, "error": None}
+    try:
+        surface = build_print_mesh(figure_x, figure_y, figure_z, target_triangles)
+        write_print_mesh(surface, file_path)
+        result["n_triangles"] = surface.n_cells
+        result["watertight"] = surface.n_open_edges == 0
+    except Exception as e:
+        result["error"] = str(e)
+    return result
+
+
+def _export_print_mesh_job(job: tuple) -> Dict[str, Any]:
+    return _export_print_mesh_worker(*job)
+
+
+def export_print_meshes(
+    reconstructions: List[Tuple[str, np.ndarray, np.ndarray, np.ndarray]],
+    output_directory: str,
+    file_format: str = "stl",
+    target_triangles: int = config.print_mesh_target_triangles,
+    progress: Callable[[int, int], None] = None,
+    cancelled: Callable[[], bool] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Export the meshes of several reconstructions, in parallel worker processes if there are at least
+    config.print_mesh_parallel_min_meshes meshes. Starting the processes takes longer than building a
+    few meshes.
+
+    Args:
+        reconstructions: (file name without extension, figure_x, figure_y, figure_z) per reconstruction
+        output_directory: Directory of the files
+        file_format: 'stl' | 'ply'
+        target_triangles: Decimate every mesh to about this many triangles (0 = no decimation)
+        progress: Called with (finished meshes, all meshes) after every mesh
+        cancelled: Called after every mesh, the remaining meshes are not exported if it returns True
+
+    Returns:
+        List with 'file_path', 'n_triangles', 'watertight' and 'error' (None on success) per exported mesh
+    """
+    if file_format not in PRINT_MESH_FORMATS:
+        raise ValueError(f"Unknown mesh format: {file_format}")
+    jobs = [
+        (x, y, z, os.path.join(output_directory, f"{name}.{file_format}"), target_triangles)
+        for name, x, y, z in reconstructions
+    ]
+    if not jobs:
+        return []
+
+    results = []
+
+    def add_result(result) -> bool:
+        """Returns False if the export was cancelled"""
+        results.append(result)
+        if progress is not None:
+            progress(len(results), len(jobs))
+        return cancelled is None or not cancelled()
+
+    workers = min(config.print_mesh_workers or max(1, (os.cpu_count() or 2) - 1), len(jobs))
+    if workers < 2 or len(jobs) < config.print_mesh_parallel_min_meshes:
+        for job in jobs:
+            if not add_result(_export_print_mesh_job(job)):
+                break
+    else:
+        # Leaving the with block terminates the remaining workers if the export is cancelled
+        with multiprocessing.get_context("spawn").Pool(processes=workers) as pool:
+            for result in pool.imap_unordered(_export_print_mesh_job, jobs):
+                if not add_result(result):
+                    break
+
+    for result in results:
+        if result["error"]:
+            print(f"Error exporting {result['file_path']}: {result['error']}")
+        elif not result["watertight"]:
+            print(f"Warning: {result['file_path']} has open edges")
+    return results
+
+
+class PrintMeshExportSignals(QObject):
+    progress_value = pyqtSignal(int)
+    # results of export_print_meshes
+    finished = pyqtSignal(object)
+    error_occurred = pyqtSignal(str)
+
+
+class PrintMeshExportWorker(QRunnable):
+    """Runs export_print_meshes in a thread of the global QThreadPool."""
+
+    def __init__(self, reconstructions, output_directory: str, file_format: str, target_triangles: int):
+        """
+        init PrintMeshExportWorker
+        :param reconstructions: (file name without extension, figure_x, figure_y, figure_z) per reconstruction
+        :param output_directory: directory of the files
+        :param file_format: 'stl' | 'ply'
+        :param target_triangles: decimate every mesh to about this many triangles (0 = no decimation)
+        """
+        super().__init__()
+        self.reconstructions = reconstructions
+        self.output_directory = output_directory
+        self.file_format = file_format
+        self.target_triangles = target_triangles
+        self.signals = PrintMeshExportSignals()
+        self.is_cancelled = False
+
+    def cancel(self):
+        """Stops the export after the current mesh (may be called from the GUI thread)"""
+        self.is_cancelled = True
+
+    def run(self):
+        try:
+            results = export_print_meshes(
+                self.reconstructions,
+                self.output_directory,
+                self.file_format,
+                self.target_triangles,
+                progress=lambda done, total: self.signals.progress_value.emit(int(100 * done / total)),
+                cancelled=lambda: self.is_cancelled,
+            )
+        except Exception as e:
+            # No message box, the worker does not run in the GUI thread
+            print(f"An error occurred during export: {e}")
+            self.signals.error_occurred.emit(str(e))
+            return
+        self.signals.finished.emit(results)
+
+
+def start_print_mesh_export(worker: PrintMeshExportWorker):
+    QThreadPool.globalInstance().start(worker)
@@ -0,0 +1,239 @@
+"""
+Direct triangle mesh of the reconstruction's ring stack.
+
+The figure coordinates (figure_x, figure_y, figure_z) of a reconstruction are a stack of rings with
+shape (slices x angles), the last angle repeats the first one. The triangle connectivity of such a
+grid is known in advance, so it is built here with NumPy instead of pv.StructuredGrid followed by
+extract_surface(), clean(), triangulate() and clean() again. Point and cell normals are computed in
+NumPy as well, the mean curvature with a single VTK pass.
+"""
+
+import time
+from typing import Dict, Optional
+
+import numpy as np
+import pyvista as pv
+
+import config
+
+
+def build_ring_stack_mesh(
+    figure_x: np.ndarray,
+    figure_y: np.ndarray,
+    figure_z: np.ndarray,
+    end_caps: bool = False,
+    geometric_attributes: bool = True,
+) -> pv.PolyData:
+    """
+    Build the triangulated surface of a ring stack.
+
+    Every vertex carries the slice_index point array (index of its ring), so slice values like the
+    pressure can be mapped to the vertices directly.
+
+    Args:
+        figure_x, figure_y, figure_z: Coordinates with shape (slices, angles)
+        end_caps: Close the first and the last ring with a triangle fan around the ring center
+        geometric_attributes: Add point/cell normals ("Normals") and the mean curvature ("mean_curvature")
+
+    Returns:
+        pv.PolyData: Triangle mesh with outward facing triangles
+    """
+    x = np.asarray(figure_x, dtype=float)
+    y = np.asarray(figure_y, dtype=float)
+    z = np.asarray(figure_z, dtype=float)
+    n_slices, n_angles = x.shape
+
+    # Drop the repeated angle closing every ring, the connectivity wraps around instead
+    if n_angles > 3 and all(np.allclose(c[:, 0], c[:, -1]) for c in (x, y, z)):
+        x, y, z = x[:, :-1], y[:, :-1], z[:, :-1]
+        n_angles -= 1
+
+    # Points ordered slice by slice: point index = slice * n_angles + angle
+    points = np.column_stack((x.ravel(), y.ravel(), z.ravel()))
+    slice_index = np.repeat(np.arange(n_slices, dtype=np.int32), n_angles)
+
+    # Two triangles per quad between ring i and ring i + 1
+    ring = np.arange(n_slices - 1)[:, None] * n_angles
+    angle = np.arange(n_angles)[None, :]
+    next_angle = (angle + 1) % n_angles
+    p00 = (ring + angle).ravel()
+    p01 = (ring + next_angle).ravel()
+    p10 = (ring + n_angles + angle).ravel()
+    p11 = (ring + n_angles + next_angle).ravel()
+    triangles = np.concatenate(
+        (np.column_stack((p00, p01, p11)), np.column_stack((p00, p11, p10)))
+    )
+
+    # Orient the tube outwards: face normals should point away from the center of their ring
+    ring_centers = points.reshape(n_slices, n_angles, 3).mean(axis=1)
+    face_normals = _face_normals(points, triangles)
+    outward = points[triangles[:, 0]] - ring_centers[slice_index[triangles[:, 0]]]
+    if np.sum(face_normals * outward) < 0:
+        triangles = triangles[:, ::-1]
+
+    if end_caps and n_slices > 1:
+        cap_triangles = []
+        for cap_slice, inner_slice in ((0, 1), (n_slices - 1, n_slices - 2)):
+            center_index = len(points)
+            points = np.vstack((points, ring_centers[cap_slice]))
+            slice_index = np.append(slice_index, np.int32(cap_slice))
+            ring_points = cap_slice * n_angles + np.arange(n_angles)
+            fan = np.column_stack(
+                (
+                    np.full(n_angles, center_index),
+                    ring_points,
+                    np.roll(ring_points, -1),
+                )
+            )
+            # The cap faces away from the neighbouring ring
+            direction = ring_centers[cap_slice] - ring_centers[inner_slice]
+            if np.sum(_face_normals(points, fan) @ direction) < 0:
+                fan = fan[:, ::-1]
+            cap_triangles.append(fan)
+        triangles = np.vstack([triangles] + cap_triangles)
+
+    surface = pv.PolyData.from_regular_faces(points, triangles)
+    surface.point_data["slice_index"] = slice_index
+
+    if geometric_attributes:
+        add_normals_and_curvature(surface, triangles)
+    return surface
+
+
+def add_normals_and_curvature(surface: pv.PolyData, triangles: np.ndarray):
+    """Add point and cell normals (area weighted) and the mean curvature to a triangle mesh."""
+    points = np.asarray(surface.points, dtype=float)
+    face_normals = _face_normals(points, triangles)
+
+    surface.cell_data["Normals"] = _normalize(face_normals).astype(np.float32)
+    surface.point_data["Normals"] = vertex_normals(points, triangles, face_normals).astype(np.float32)
+    surface.point_data.active_normals_name = "Normals"
+    surface["mean_curvature"] = surface.curvature(curv_type="mean")
+
+
+def vertex_normals(
+    points: np.ndarray, triangles: np.ndarray, face_normals: Optional[np.ndarray] = None
+) -> np.ndarray:
+    """Unit vertex normals: sum of the area weighted normals of the adjacent triangles."""
+    if face_normals is None:
+        face_normals = _face_normals(points, triangles)
+    point_normals = np.zeros((len(points), 3))
+    for corner in range(3):
+        np.add.at(point_normals, triangles[:, corner], face_normals)
+    return _normalize(point_normals)
+
+
+def _face_normals(points: np.ndarray, triangles: np.ndarray) -> np.ndarray:
+    """Unnormalized triangle normals, their length is twice the triangle area."""
+    a = points[triangles[:, 0]]
+    return np.cross(points[triangles[:, 1]] - a, points[triangles[:, 2]] - a)
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    lengths = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return np.divide(vectors, lengths, out=np.zeros_like(vectors), where=lengths > 0)
+
+
+def synthetic_ring_stack(n_slices: int = 200, n_angles: int = config.figure_number_of_angles):
+    """
+    Ring stack shaped like a reconstruction (slices x angles) for the benchmarks and checks of the
+    exports. Every slice has its own height and the radius varies along the stack.
+
+    Returns:
+        (figure_x, figure_y, figure_z, heights): coordinates with shape (slices x angles) and the
+        height of every slice
+    """
+    angles = np.linspace(0, 2 * np.pi, n_angles)
+    heights = np.linspace(0, 25, n_slices)
+    radius = 1 + 0.3 * np.sin(heights / 3)[:, None]
+    figure_x = radius * np.cos(angles)[None, :]
+    figure_y = radius * np.sin(angles)[None, :]
+    figure_z = np.repeat(heights[:, None], n_angles, axis=1)
+    return figure_x, figure_y, figure_z, heights
+
+
+def synthetic_visualization_data(
+    n_slices: int = 200, n_angles: int = config.figure_number_of_angles, n_frames: int = 100
+):
+    """
+    VisualizationData of a synthetic_ring_stack with random pressures and the metrics calculated by
+    FigureCreator, for the benchmarks and tests of the exports.
+    """
+    from logic.figure_creator.figure_creator import FigureCreator
+    from logic.figure_creator.stored_figure_creator import StoredFigureCreator
+    from logic.visualization_data import VisualizationData
+
+    figure_x, figure_y, figure_z, _ = synthetic_ring_stack(n_slices, n_angles)
+    visualization_data = VisualizationData()
+    visualization_data.figure_x = figure_x
+    visualization_data.figure_y = figure_y
+    visualization_data.figure_z = figure_z
+    # center_path is (y, x), the positions are (x, y)
+    visualization_data.center_path = [(slice_index, 50) for slice_index in range(n_slices)]
+    visualization_data.sphincter_upper_pos = (50, int(n_slices * 2 / 3))
+    visualization_data.esophagus_exit_pos = (50, n_slices - 1)
+    visualization_data.xray_minute = 2
+    visualization_data.esophageal_pressurization_index = 1.5
+
+    surfacecolor_list = np.random.default_rng(0).uniform(-15, 200, (n_frames, n_slices))
+    metrics = FigureCreator.calculate_metrics(
+        visualization_data,
+        figure_x,
+        figure_y,
+        surfacecolor_list,
+        visualization_data.center_path,
+        n_slices - 1,
+        25.0,
+        n_slices,
+    )
+    visualization_data.figure_creator = StoredFigureCreator(visualization_data, surfacecolor_list, metrics, 25.0)
+    return visualization_data
+
+
+def benchmark_mesh_builders(
+    n_slices: int = 200,
+    n_angles: int = config.figure_number_of_angles,
+    repetitions: int = 10,
+) -> Dict[str, float]:
+    """
+    Compare the mesh pipeline of VTKHDFExporter with build_ring_stack_mesh on a synthetic ring stack.
+
+    Run from the application directory with: python -m logic.dataoutput.ring_mesh
+
+    Returns:
+        Dictionary with the mean seconds per mesh of both builders
+    """
+    from logic.dataoutput.vtkhdf_exporter import VTKHDFExporter
+
+    x, y, z, _ = synthetic_ring_stack(n_slices, n_angles)
+    exporter = VTKHDFExporter()
+
+    start = time.perf_counter()
+    for _ in range(repetitions):
+        # Same sequence of filters as the pipeline of _export_single_reconstruction
+        surface = exporter._create_mesh_from_coords(x, y, z)
+        surface = surface.compute_normals(point_normals=True, cell_normals=False)
+        surface["mean_curvature"] = surface.curvature()
+        surface = surface.triangulate().clean(tolerance=1e-6)
+        pipeline_mesh = surface.compute_normals(point_normals=True, cell_normals=True)
+    pipeline_seconds = (time.perf_counter() - start) / repetitions
+
+    start = time.perf_counter()
+    for _ in range(repetitions):
+        direct_mesh = build_ring_stack_mesh(x, y, z)
+    direct_seconds = (time.perf_counter() - start) / repetitions
+
+    print(f"Mesh builder benchmark ({n_slices} slices x {n_angles} angles, mean of {repetitions} runs)")
+    print(
+        f"  VTK pipeline  {pipeline_seconds * 1000:8.2f}ms  "
+        f"{pipeline_mesh.n_points} points, {pipeline_mesh.n_cells} cells"
+    )
+    print(
+        f"  direct        {direct_seconds * 1000:8.2f}ms  "
+        f"{direct_mesh.n_points} points, {direct_mesh.n_cells} cells"
+    )
+    return {"pipeline_seconds": pipeline_seconds, "direct_seconds": direct_seconds}
+
+
+if __name__ == "__main__":
+    benchmark_mesh_builders()
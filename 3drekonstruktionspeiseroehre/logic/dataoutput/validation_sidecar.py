@@ -0,0 +1,194 @@
+"""
+Binary sidecar files for the validation attributes of the VTKHDF export.
+
+The validation attributes contain large numeric lists (mesh vertices, center path, per-frame metrics).
+Written as JSON these lists make the files big and slow to parse. The binary formats store every
+numeric list as a typed array and the remaining structure as a small JSON header, in which every
+array is replaced by a reference {"__array__": "<key>"}:
+
+- npz:  compressed NumPy archive, the header is stored as the UTF-8 bytes of the array "__header__"
+- hdf5: HDF5 file, the header is the root attribute "header", the arrays are gzip compressed datasets
+
+load_validation_attributes() reads all three formats (JSON included) into the same dictionary, the
+arrays of the binary formats are returned as NumPy arrays.
+"""
+
+import json
+import os
+import tempfile
+import time
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+import config
+
+ARRAY_REFERENCE = "__array__"
+HEADER_KEY = "__header__"
+FILE_EXTENSIONS = {"json": ".json", "npz": ".npz", "hdf5": ".h5"}
+
+
+def split_arrays(data: Any, key: str = "") -> Tuple[Any, Dict[str, np.ndarray]]:
+    """
+    Separate the numeric arrays from the JSON structure.
+
+    Returns:
+        (header, arrays): header with array references, arrays by key ("center_path.points")
+    """
+    arrays = {}
+    if isinstance(data, dict):
+        header = {}
+        for name, value in data.items():
+            child_key = f"{key}.{name}" if key else str(name)
+            header[name], child_arrays = split_arrays(value, child_key)
+            arrays.update(child_arrays)
+        return header, arrays
+
+    if isinstance(data, (list, tuple, np.ndarray)):
+        try:
+            array = np.asarray(data)
+        except ValueError:
+            array = None
+        if (
+            array is not None
+            and array.dtype.kind in "biuf"
+            and array.size >= config.validation_sidecar_min_array_size
+        ):
+            # Floats are stored as float32, the values are centimeters and mmHg
+            arrays[key] = array.astype(np.float32) if array.dtype.kind == "f" else array
+            return {ARRAY_REFERENCE: key}, arrays
+        header = []
+        for index, value in enumerate(data):
+            child_header, child_arrays = split_arrays(value, f"{key}.{index}")
+            header.append(child_header)
+            arrays.update(child_arrays)
+        return header, arrays
+
+    if isinstance(data, np.generic):
+        return data.item(), arrays
+    return data, arrays
+
+
+def merge_arrays(header: Any, arrays: Dict[str, np.ndarray]) -> Any:
+    """Replace the array references of a header by the arrays."""
+    if isinstance(header, dict):
+        if set(header) == {ARRAY_REFERENCE}:
+            return arrays[header[ARRAY_REFERENCE]]
+        return {name: merge_arrays(value, arrays) for name, value in header.items()}
+    if isinstance(header, list):
+        return [merge_arrays(value, arrays) for value in header]
+    return header
+
+
+def save_validation_attributes(validation_data: Dict[str, Any], file_path: str, format_type: str) -> str:
+    """
+    Write the validation attributes in the given format ('json' | 'npz' | 'hdf5').
+
+    Args:
+        validation_data: Validation attributes (already sanitized for JSON)
+        file_path: Path of the file including the extension of the format
+
+    Returns:
+        str: file_path
+    """
+    if format_type == "json":
+        with open(file_path, "w", encoding="utf-8") as f:
+            json.dump(validation_data, f, indent=2, ensure_ascii=False)
+        return file_path
+
+    header, arrays = split_arrays(validation_data)
+    header_bytes = json.dumps(header, ensure_ascii=False).encode("utf-8")
+
+    if format_type == "npz":
+        # np.savez appends .npz to paths without it
+        with open(file_path, "wb") as f:
+            np.savez_compressed(f, **{HEADER_KEY: np.frombuffer(header_bytes, dtype=np.uint8)}, **arrays)
+        return file_path
+
+    if format_type == "hdf5":
+        import h5py
+
+        with h5py.File(file_path, "w") as f:
+            f.attrs["header"] = header_bytes.decode("utf-8")
+            for key, array in arrays.items():
+                f.create_dataset(
+                    key,
+                    data=array,
+                    compression="gzip" if array.size > 1 else None,
+                    shuffle=array.size > 1,
+                )
+        return file_path
+
+    raise ValueError(f"Unknown validation attributes format: {format_type}")
+
+
+def load_validation_attributes(file_path: str) -> Dict[str, Any]:
+    """Read validation attributes written in any of the formats."""
+    extension = os.path.splitext(file_path)[1].lower()
+    if extension == ".json":
+        with open(file_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    if extension == ".npz":
+        with np.load(file_path) as archive:
+            header = json.loads(archive[HEADER_KEY].tobytes().decode("utf-8"))
+            arrays = {key: archive[key] for key in archive.files if key != HEADER_KEY}
+        return merge_arrays(header, arrays)
+
+    if extension in (".h5", ".hdf5"):
+        import h5py
+
+        with h5py.File(file_path, "r") as f:
+            header = json.loads(f.attrs["header"])
+            arrays = {key: f[key][()] for key in f.keys()}
+        return merge_arrays(header, arrays)
+
+    raise ValueError(f"Unknown validation attributes file: {file_path}")
+
+
+def benchmark_validation_formats(
+    validation_data: Dict[str, Any], output_directory: Optional[str] = None, repetitions: int = 5
+) -> Dict[str, Dict[str, float]]:
+    """
+    Compare file size, write time and parse time of the validation attribute formats.
+
+    Run from the application directory with:
+        python -m logic.dataoutput.validation_sidecar <..._validation_attributes.json>
+
+    Returns:
+        Dictionary with the measurements per format
+    """
+    if output_directory is None:
+        output_directory = tempfile.mkdtemp(prefix="validation_benchmark_")
+    results = {}
+
+    for format_type, extension in FILE_EXTENSIONS.items():
+        file_path = os.path.join(output_directory, f"validation_attributes{extension}")
+        start = time.perf_counter()
+        save_validation_attributes(validation_data, file_path, format_type)
+        write_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for _ in range(repetitions):
+            load_validation_attributes(file_path)
+        parse_seconds = (time.perf_counter() - start) / repetitions
+
+        results[format_type] = {
+            "file_size_kb": os.path.getsize(file_path) / 1e3,
+            "write_ms": write_seconds * 1000,
+            "parse_ms": parse_seconds * 1000,
+        }
+
+    print(f"Validation attribute formats in {output_directory}")
+    for format_type, values in results.items():
+        print(
+            f"  {format_type:<5} size {values['file_size_kb']:10.1f}kB  "
+            f"write {values['write_ms']:8.2f}ms  parse {values['parse_ms']:8.2f}ms"
+        )
+    return results
+
+
+if __name__ == "__main__":
+    import sys
+
+    benchmark_validation_formats(load_validation_attributes(sys.argv[1]))
@@ -1,26 +1,40 @@
 import os
 import json
+import logging
 import pickle
+import time
 import numpy as np
 import pyvista as pv
+from pyvista.core.utilities.observers import VtkErrorCatcher
 from datetime import datetime
 from io import BytesIO
 from typing import Dict, List, Optional, Any, Tuple
 from sqlalchemy.orm import Session
 from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
 from scipy import spatial
 from logic.database.data_declarative_models import Patient, Visit, Manometry, BariumSwallow
 from logic.services.patient_service import PatientService
 from logic.services.visit_service import VisitService
 from logic.services.reconstruction_service import ReconstructionService
+from logic.services.reconstruction_storage_service import ReconstructionStorageService
 from logic.services.barium_swallow_service import BariumSwallowFileService
 from logic.services.manometry_service import ManometryFileService
 from logic.services.endoscopy_service import EndoscopyFileService
 from logic.services.endoflip_service import EndoflipFileService
 from logic.visualization_data import VisualizationData
+from logic.dataoutput.ring_mesh import build_ring_stack_mesh
+from logic.dataoutput.export_profiles import (
+    detach_pressure_arrays,
+    get_export_profile,
+    verify_pressure_arrays,
+    write_pressure_arrays,
+)
 from logic.visit_data import VisitData
 import config
 
+logger = logging.getLogger(__name__)
+
 
 class VTKHDFExporter:
     """
@@ -39,6 +53,10 @@ class VTKHDFExporter:
         db_session: Optional[Session] = None,
         max_pressure_frames: int = -1,
         pressure_export_mode: str = "per_vertex",
+        reuse_figure_creator: bool = True,
+        direct_mesh_builder: bool = config.vtkhdf_direct_mesh_builder,
+        mesh_end_caps: bool = config.vtkhdf_mesh_end_caps,
+        export_profile: Optional[str] = None,
     ):
         """
         Initialize the VTKHDF Exporter.
@@ -46,11 +64,27 @@ class VTKHDFExporter:
         Args:
             db_session: Database session for metadata extraction
             max_pressure_frames: Maximum number of pressure frames to export (-1 for all)
+            reuse_figure_creator: Use the outputs of visualization_data.figure_creator instead of
+                rebuilding the reconstruction (a rebuild still happens if they are missing or invalid)
+            direct_mesh_builder: Build the triangle mesh of the ring stack directly (build_ring_stack_mesh)
+                instead of the StructuredGrid/clean/triangulate pipeline
+            mesh_end_caps: Close both ends of the mesh (direct mesh builder only)
+            export_profile: Name of the export profile in config.export_profiles (None for
+                config.export_profile), sets the compression and storage type of the pressure data
         """
         self.db_session = db_session
         self.max_pressure_frames = max_pressure_frames
         # pressure_export_mode: 'per_vertex' | 'per_slice' | 'none'
         self.pressure_export_mode = pressure_export_mode
+        self.reuse_figure_creator = reuse_figure_creator
+        self.direct_mesh_builder = direct_mesh_builder
+        self.mesh_end_caps = mesh_end_caps
+        self.export_profile = get_export_profile(export_profile)
+        # Statistics about figure creator usage, reset for every visit
+        self._figure_creator_reuses = 0
+        self._figure_creator_rebuild_seconds = []
+        # Durations of all rebuilds of this exporter, used to estimate the time saved by reusing
+        self._all_rebuild_seconds = []
 
     def _sanitize_for_json(self, data: Any) -> Any:
         """
@@ -104,13 +138,16 @@ class VTKHDFExporter:
             patient_id: Patient ID for metadata
             visit_id: Visit ID for database metadata lookup
             export_validation_attributes: Whether to export validation attributes
-            validation_attributes_format: Ignored (JSON is always used)
+            validation_attributes_format: 'json' | 'npz' | 'hdf5' (see validation_sidecar)
 
         Returns:
             Dictionary with 'mesh_files' and 'validation_files' lists
         """
         created_mesh_files = []
         created_validation_files = []
+        export_start = time.perf_counter()
+        self._figure_creator_reuses = 0
+        self._figure_creator_rebuild_seconds = []
 
         # Minimal export log
         print(f"Starting VTKHDF export for visit: {visit_name}")
@@ -158,6 +195,7 @@ class VTKHDFExporter:
             f"{successful_exports}/{total_visualizations} meshes, "
             f"{len(created_validation_files)} validation files"
         )
+        self._log_figure_creator_usage(visit_name, time.perf_counter() - export_start)
 
         return {"mesh_files": created_mesh_files, "validation_files": created_validation_files}
 
@@ -387,8 +425,11 @@ class VTKHDFExporter:
                 print("No 3D mesh data available")
                 return False
 
-            # Create structured mesh
-            surface = self._create_mesh_from_coords(figure_x, figure_y, figure_z)
+            # Create mesh: the direct builder returns the final triangle mesh with normals and curvature
+            if self.direct_mesh_builder:
+                surface = self._create_ring_stack_mesh(figure_x, figure_y, figure_z)
+            else:
+                surface = self._create_mesh_from_coords(figure_x, figure_y, figure_z)
             if surface is None:
                 return False
 
@@ -396,7 +437,8 @@ class VTKHDFExporter:
             self._add_pressure_attributes(surface, visualization_data)
             self._add_wall_thickness_attributes(surface, visualization_data)
             self._add_anatomical_region_attributes(surface, visualization_data)
-            surface = self._add_geometric_attributes(surface, visualization_data)
+            if not self.direct_mesh_builder:
+                surface = self._add_geometric_attributes(surface, visualization_data)
 
             # Prepare comprehensive metadata
             metadata = self._prepare_comprehensive_metadata(
@@ -416,6 +458,11 @@ class VTKHDFExporter:
                     elif isinstance(value, dict):
                         sanitized_value = self._sanitize_for_json(value)
                         surface.field_data[f"{key}"] = [json.dumps(sanitized_value)]
+                        if self._is_numeric_array_dict(value):
+                            # Per-frame metrics ({"max": [...], "min": [...], "mean": [...]}) additionally
+                            # as typed arrays, the JSON string is kept for existing consumers
+                            for sub_key, sub_value in value.items():
+                                surface.field_data[f"{key}_{sub_key}"] = np.asarray(sub_value, dtype=np.float64)
                     elif isinstance(value, (list, tuple)) and len(value) > 0:
                         # Prefer numeric arrays for flat numeric lists; otherwise JSON
                         try:
@@ -434,22 +481,42 @@ class VTKHDFExporter:
             except Exception as e:
                 print(f"Warning: Could not add metadata to mesh: {e}")
 
-            # Ensure triangular faces
-            surface = surface.triangulate()
+            if not self.direct_mesh_builder:
+                # Ensure triangular faces
+                surface = surface.triangulate()
 
-            # Clean the mesh
-            surface = surface.clean(tolerance=1e-6)
+                # Clean the mesh
+                surface = surface.clean(tolerance=1e-6)
 
-            # Compute normals for better ML features
-            surface = surface.compute_normals(point_normals=True, cell_normals=True)
+                # Compute normals for better ML features
+                surface = surface.compute_normals(point_normals=True, cell_normals=True)
 
             # Export to VTKHDF
-            return self._export_to_vtkhdf(surface, file_path)
+            if not self._export_to_vtkhdf(surface, file_path):
+                return False
+
+            # Per-vertex pressure of all frames as one chunked dataset next to the geometry
+            if self.pressure_export_mode == "per_vertex_dataset" and self.max_pressure_frames != 0:
+                return self._add_pressure_dataset(surface, visualization_data, file_path)
+            return True
 
         except Exception as e:
             print(f"Error in single reconstruction export: {e}")
             return False
 
+    @staticmethod
+    def _is_numeric_array_dict(value: Dict[str, Any]) -> bool:
+        """True for non-empty dictionaries whose values are all flat numeric arrays."""
+        if not config.vtkhdf_typed_metric_arrays or not value:
+            return False
+        try:
+            return all(
+                np.asarray(sub_value).ndim == 1 and np.asarray(sub_value).dtype.kind in "biuf"
+                for sub_value in value.values()
+            )
+        except ValueError:
+            return False
+
     def _create_mesh_from_coords(
         self, figure_x: np.ndarray, figure_y: np.ndarray, figure_z: np.ndarray
     ) -> Optional[pv.PolyData]:
@@ -458,6 +525,12 @@ class VTKHDFExporter:
             # Create structured grid preserving topology
             grid = pv.StructuredGrid(figure_x, figure_y, figure_z)
 
+            # Slice (ring) index of every grid point. The points of the (slices x angles) grid are
+            # ordered with the slice index varying fastest. As point data the index follows every
+            # vertex through surface extraction, cleaning and triangulation.
+            n_slices, n_angles = np.shape(figure_x)[:2]
+            grid.point_data["slice_index"] = np.tile(np.arange(n_slices, dtype=np.int32), n_angles)
+
             # Extract surface while preserving structure
             surface = grid.extract_surface()
 
@@ -470,6 +543,16 @@ class VTKHDFExporter:
             print(f"Error creating mesh: {e}")
             return None
 
+    def _create_ring_stack_mesh(
+        self, figure_x: np.ndarray, figure_y: np.ndarray, figure_z: np.ndarray
+    ) -> Optional[pv.PolyData]:
+        """Create the triangle mesh with normals and curvature directly from the ring stack."""
+        try:
+            return build_ring_stack_mesh(figure_x, figure_y, figure_z, end_caps=self.mesh_end_caps)
+        except Exception as e:
+            print(f"Error creating mesh: {e}")
+            return None
+
     def _add_pressure_attributes(self, surface: pv.PolyData, visualization_data: VisualizationData):
         """Add HRM pressure to mesh: per-vertex (default) or compact per-slice."""
 
@@ -478,8 +561,6 @@ class VTKHDFExporter:
             return
 
         try:
-            n_vertices = surface.n_points
-
             # Get pressure data from figure creator
             if hasattr(visualization_data, "figure_creator") and hasattr(
                 visualization_data.figure_creator, "get_surfacecolor_list"
@@ -493,14 +574,14 @@ class VTKHDFExporter:
 
                 if self.pressure_export_mode == "per_vertex":
                     # Full per-vertex mapping
-                    pressure_per_frame = self._map_pressure_to_vertices(
-                        surfacecolor_list, n_vertices, visualization_data
-                    )
                     max_frames = (
                         n_frames
                         if self.max_pressure_frames == -1
                         else min(n_frames, self.max_pressure_frames)
                     )
+                    pressure_per_frame = self._map_pressure_to_vertices(
+                        surfacecolor_list[:max_frames], surface, visualization_data
+                    )
                     for frame_idx in range(max_frames):
                         surface[f"pressure_frame_{frame_idx:03d}"] = pressure_per_frame[frame_idx]
 
@@ -522,8 +603,9 @@ class VTKHDFExporter:
                     except Exception as e:
                         print(f"Error exporting per-slice matrix in per-vertex mode: {e}")
 
-                elif self.pressure_export_mode == "per_slice":
-                    # Compact: keep per-slice pressures only, no per-vertex arrays (numeric only)
+                elif self.pressure_export_mode in ("per_slice", "per_vertex_dataset"):
+                    # Compact: keep per-slice pressures only, no per-vertex arrays (numeric only).
+                    # In per_vertex_dataset mode the per-vertex pressure is added by _add_pressure_dataset.
                     max_frames = (
                         n_frames
                         if self.max_pressure_frames == -1
@@ -547,34 +629,69 @@ class VTKHDFExporter:
         except Exception as e:
             print(f"Error adding pressure attributes: {e}")
 
+    def _add_pressure_dataset(
+        self, surface: pv.PolyData, visualization_data: VisualizationData, file_path: str
+    ) -> bool:
+        """Write the per-vertex pressure of all frames as one (frames x vertices) dataset into the VTKHDF file."""
+        try:
+            from logic.dataoutput.pressure_dataset import write_pressure_dataset
+
+            # Same source of the surface colors as the metrics (rebuilds a missing figure creator)
+            _, surfacecolor_list, _ = self._invoke_figure_creator_metrics(visualization_data)
+            if surfacecolor_list is None:
+                logger.warning("No surface colors for the pressure dataset of %s, it is not written", file_path)
+                return False
+            if len(surfacecolor_list) == 0:
+                return True
+
+            n_frames = len(surfacecolor_list)
+            max_frames = (
+                n_frames if self.max_pressure_frames == -1 else min(n_frames, self.max_pressure_frames)
+            )
+            pressure_matrix = self._map_pressure_to_vertices(
+                surfacecolor_list[:max_frames], surface, visualization_data
+            )
+            return write_pressure_dataset(file_path, pressure_matrix, self.export_profile)
+
+        except Exception:
+            logger.exception("Error adding the pressure dataset to %s", file_path)
+            return False
+
     def _map_pressure_to_vertices(
         self,
         surfacecolor_list: List[List[float]],
-        n_vertices: int,
+        surface: pv.PolyData,
         visualization_data: VisualizationData,
     ) -> np.ndarray:
-        """Map pressure data from esophagus path to mesh vertices."""
-        n_frames = len(surfacecolor_list)
-        pressure_per_frame = np.zeros((n_frames, n_vertices))
+        """
+        Map the per-slice pressure of every frame to the mesh vertices.
+
+        Every vertex gets the pressure of its slice (ring), taken from the slice_index point array
+        of the mesh, so the whole (frames x vertices) matrix is a single gather.
+        """
+        n_vertices = surface.n_points
+        slice_matrix = np.asarray(surfacecolor_list, dtype=np.float32)  # shape (frames, slices)
 
         try:
-            for frame_idx in range(n_frames):
-                pressure_values = np.array(surfacecolor_list[frame_idx])
-
-                if len(pressure_values) == n_vertices:
-                    pressure_per_frame[frame_idx] = pressure_values
-                elif len(pressure_values) > 0:
-                    # Interpolate to match vertex count
-                    pressure_per_frame[frame_idx] = np.interp(
+            if "slice_index" in surface.point_data:
+                return slice_matrix[:, np.asarray(surface.point_data["slice_index"])]
+
+            # Meshes without slice index: stretch the slice values over the vertex order
+            print("Warning: Mesh has no slice_index, pressure is interpolated along the vertex order")
+            return np.stack(
+                [
+                    np.interp(
                         np.linspace(0, 1, n_vertices),
-                        np.linspace(0, 1, len(pressure_values)),
-                        pressure_values,
+                        np.linspace(0, 1, slice_matrix.shape[1]),
+                        frame_values,
                     )
+                    for frame_values in slice_matrix
+                ]
+            ).astype(np.float32)
 
         except Exception as e:
             print(f"Error in pressure mapping: {e}")
-
-        return pressure_per_frame
+            return np.zeros((len(surfacecolor_list), n_vertices), dtype=np.float32)
 
     def _add_wall_thickness_attributes(
         self, surface: pv.PolyData, visualization_data: VisualizationData
@@ -735,6 +852,7 @@ class VTKHDFExporter:
         attribute_description = {
             "wall_thickness": "Estimated wall thickness in centimeters",
             "anatomical_region": "1=tubular, 2=LES",
+            "slice_index": "Index of the reconstruction slice (ring) of each vertex, from top to bottom",
             "pressure_export_mode": "none | per_slice | per_vertex",
             "tbe_contrast_medium_type": "Type of contrast medium used in TBE",
             "tbe_contrast_medium_amount_ml": "Amount of contrast medium in milliliters",
@@ -755,6 +873,22 @@ class VTKHDFExporter:
         elif getattr(self, "pressure_export_mode", "per_vertex") == "per_slice":
             # Counts can be derived from pressure_slice_matrix_shape; no extra description necessary
             pass
+        elif getattr(self, "pressure_export_mode", "per_vertex") == "per_vertex_dataset":
+            attribute_description.update(
+                {
+                    "PressureData/vertex_pressure": "HRM pressure in mmHg as one (frames, vertices) float32 dataset, "
+                    "chunked along frames (see logic.dataoutput.pressure_dataset.PressureDatasetReader)"
+                }
+            )
+
+        if self.export_profile.get("quantize"):
+            attribute_description.update(
+                {
+                    "*_quantized": "Pressure arrays of the compact profile as 16-bit values, pressure in mmHg = "
+                    "value * scale_factor + add_offset (HDF5 attributes of the array, see "
+                    "logic.dataoutput.export_profiles.decode_pressure)"
+                }
+            )
 
         # Add EGD descriptions only if present in metadata
         if "egd_positions" in metadata or "egd_images_count" in metadata:
@@ -774,7 +908,24 @@ class VTKHDFExporter:
     def _invoke_figure_creator_metrics(
         self, visualization_data: "VisualizationData"
     ) -> Tuple[Optional[Dict[str, Any]], Optional[List], Optional[List]]:
-        """Gather parameters and invoke the static calculate_metrics from FigureCreator."""
+        """
+        Return metrics, surface colors and center path of a reconstruction.
+
+        The figure creator of the visualization is reused if its outputs are valid. Only
+        reconstructions without them (e.g. loaded from an older pickle) are rebuilt, and the
+        rebuilt creator is stored on the visualization data so that it is built only once.
+        """
+        figure_creator = getattr(visualization_data, "figure_creator", None)
+        if self.reuse_figure_creator and self._has_valid_figure_creator_outputs(
+            figure_creator, visualization_data
+        ):
+            self._figure_creator_reuses += 1
+            return (
+                figure_creator.get_metrics(),
+                figure_creator.get_surfacecolor_list(),
+                figure_creator.get_center_path(),
+            )
+
         try:
             # Import and instantiate the same FigureCreator as the visualization flow
             from logic.figure_creator.figure_creator_with_endoscopy import (
@@ -784,10 +935,15 @@ class VTKHDFExporter:
                 FigureCreatorWithoutEndoscopy,
             )
 
+            rebuild_start = time.perf_counter()
             if getattr(visualization_data, "endoscopy_polygons", None):
                 fc = FigureCreatorWithEndoscopy(visualization_data)
             else:
                 fc = FigureCreatorWithoutEndoscopy(visualization_data)
+            self._figure_creator_rebuild_seconds.append(time.perf_counter() - rebuild_start)
+            self._all_rebuild_seconds.append(self._figure_creator_rebuild_seconds[-1])
+            if self.reuse_figure_creator:
+                visualization_data.figure_creator = fc
 
             # Use exactly the same outputs as visualization for metrics and inputs
             calculated_metrics = fc.get_metrics()
@@ -799,6 +955,43 @@ class VTKHDFExporter:
             print(f"Error invoking FigureCreator.calculate_metrics: {e}")
             return None, None, None
 
+    def _has_valid_figure_creator_outputs(
+        self, figure_creator, visualization_data: "VisualizationData"
+    ) -> bool:
+        """Check that a figure creator holds metrics, surface colors and a center path matching the mesh."""
+        if figure_creator is None:
+            return False
+        try:
+            calculated_metrics = figure_creator.get_metrics()
+            surfacecolor_list = figure_creator.get_surfacecolor_list()
+            center_path = figure_creator.get_center_path()
+            if not calculated_metrics or "len_tubular" not in calculated_metrics:
+                return False
+            if surfacecolor_list is None or len(surfacecolor_list) == 0:
+                return False
+            if center_path is None or len(center_path) == 0:
+                return False
+            # The surface colors must have one value per mesh slice
+            figure_x = visualization_data.figure_x
+            if figure_x is not None and len(surfacecolor_list[0]) != np.shape(figure_x)[0]:
+                return False
+            return True
+        except Exception:
+            return False
+
+    def _log_figure_creator_usage(self, visit_name: str, export_seconds: float):
+        """Print how often the figure creator was reused and the estimated time saved for a visit."""
+        rebuilds = len(self._figure_creator_rebuild_seconds)
+        message = (
+            f"VTKHDF export of visit '{visit_name}' took {export_seconds:.2f}s "
+            f"(figure creator reused {self._figure_creator_reuses}x, rebuilt {rebuilds}x"
+        )
+        if self._figure_creator_reuses and self._all_rebuild_seconds:
+            # Every reuse replaces a rebuild, estimate its duration from the rebuilds measured so far
+            mean_rebuild_seconds = sum(self._all_rebuild_seconds) / len(self._all_rebuild_seconds)
+            message += f", ~{self._figure_creator_reuses * mean_rebuild_seconds:.2f}s saved"
+        print(message + ")")
+
     def _process_and_store_metrics(
         self,
         calculated_metrics: Dict[str, Any],
@@ -925,7 +1118,7 @@ class VTKHDFExporter:
             visit_name: Name identifier for the visit
             output_directory: Directory to save validation attributes
             base_metadata: Base metadata from database
-            format_type: Ignored (JSON is always exported)
+            format_type: 'json' | 'npz' | 'hdf5', the binary formats store numeric lists as typed arrays
 
         Returns:
             Path to created validation attributes file, or None if failed
@@ -937,10 +1130,17 @@ class VTKHDFExporter:
                 return None
 
             base_filename = f"{visit_name}_{visualization_data.xray_minute}_validation_attributes"
-            file_path = os.path.join(output_directory, f"{base_filename}.json")
-            return self._save_validation_json(validation_data, file_path)
+            if format_type == "json":
+                file_path = os.path.join(output_directory, f"{base_filename}.json")
+                return self._save_validation_json(validation_data, file_path)
 
-        except Exception:
+            from logic.dataoutput.validation_sidecar import FILE_EXTENSIONS, save_validation_attributes
+
+            file_path = os.path.join(output_directory, base_filename + FILE_EXTENSIONS[format_type])
+            return save_validation_attributes(validation_data, file_path, format_type)
+
+        except Exception as e:
+            print(f"Error exporting validation attributes: {e}")
             return None
 
     def _extract_validation_data(
@@ -1174,62 +1374,13 @@ class VTKHDFExporter:
         except Exception:
             return []
 
-    def _calculate_esophagus_length_px(self, sensor_path, esophagus_exit_pos):
-        """Calculate esophagus length in pixels (helper method)."""
-        path_length_px = 0
-        for i in range(1, len(sensor_path)):
-            path_length_px += np.sqrt(
-                (sensor_path[i][0] - sensor_path[i - 1][0]) ** 2
-                + (sensor_path[i][1] - sensor_path[i - 1][1]) ** 2
-            )
-            if (
-                sensor_path[i][1] == esophagus_exit_pos[1]
-                and sensor_path[i][0] == esophagus_exit_pos[0]
-            ):
-                break
-        return path_length_px
-
-    def _calculate_esophagus_full_length_cm(
-        self, sensor_path, esophagus_full_length_px, visualization_data
-    ):
-        """Calculate esophagus length in cm (helper method)."""
-        from scipy import spatial
-
-        # Map sensor indices to centimeter
-        first_sensor_cm = config.coords_sensors[visualization_data.first_sensor_index]
-        second_sensor_cm = config.coords_sensors[visualization_data.second_sensor_index]
-
-        # sensor_pos are coordinates (x, y) and sensor_path is a list of coordinates (y, x)
-        first_sensor_pos_switched = (
-            visualization_data.first_sensor_pos[1],
-            visualization_data.first_sensor_pos[0],
-        )
-        second_sensor_pos_switched = (
-            visualization_data.second_sensor_pos[1],
-            visualization_data.second_sensor_pos[0],
-        )
-
-        # KDTree to find nearest points on the sensor_path
-        _, index_first = spatial.KDTree(np.array(sensor_path)).query(
-            np.array(first_sensor_pos_switched)
-        )
-        _, index_second = spatial.KDTree(np.array(sensor_path)).query(
-            np.array(second_sensor_pos_switched)
-        )
-
-        path_length_px = 0
-        for i in range(index_second, index_first + 1):
-            if i > index_second:
-                path_length_px += np.sqrt(
-                    (sensor_path[i][0] - sensor_path[i - 1][0]) ** 2
-                    + (sensor_path[i][1] - sensor_path[i - 1][1]) ** 2
-                )
-
-        length_cm = first_sensor_cm - second_sensor_cm
-        return length_cm * (esophagus_full_length_px / path_length_px)
-
     def _export_to_vtkhdf(self, surface: pv.PolyData, file_path: str) -> bool:
-        """Export the mesh with all attributes to VTKHDF format with compression."""
+        """
+        Export the mesh with all attributes to VTKHDF format.
+
+        The mesh is compressed with the level of the export profile. Pressure arrays are written
+        afterwards with the filters and storage type of the profile (see export_profiles).
+        """
         try:
             import vtk
 
@@ -1237,15 +1388,23 @@ class VTKHDFExporter:
                 print("Error: vtkHDFWriter not found. Your VTK version may be too old.")
                 return False
 
+            # Pressure arrays are not written by VTK, detach them from a shallow copy of the mesh
+            surface = surface.copy(deep=False)
+            point_pressure_arrays, field_pressure_arrays = detach_pressure_arrays(surface)
+
             writer = vtk.vtkHDFWriter()
             writer.SetFileName(file_path)
             writer.SetInputData(surface)
 
             # Set compression - check for modern and legacy methods
-            if hasattr(writer, "SetUseDeflateCompression"):
-                writer.SetUseDeflateCompression(True)
+            compression_level = self.export_profile.get("vtk_compression_level", 5)
+            if compression_level > 0:
+                if hasattr(writer, "SetUseDeflateCompression"):
+                    writer.SetUseDeflateCompression(True)
+                if hasattr(writer, "SetCompressionLevel"):
+                    writer.SetCompressionLevel(compression_level)
             elif hasattr(writer, "SetCompressionLevel"):
-                writer.SetCompressionLevel(5)  # A good default compression level
+                writer.SetCompressionLevel(0)
 
             writer.Write()
 
@@ -1254,7 +1413,17 @@ class VTKHDFExporter:
                 print(f"Failed to create VTKHDF file: {file_path}")
                 return False
 
-            pv.read(file_path)
+            write_pressure_arrays(
+                file_path, point_pressure_arrays, field_pressure_arrays, self.export_profile
+            )
+
+            # The shipped file is verified: it is read by VTK without errors (including the pressure arrays
+            # written by h5py) and the pressure arrays match the exported values
+            with VtkErrorCatcher(raise_errors=True):
+                reader = vtk.vtkHDFReader()
+                reader.SetFileName(file_path)
+                reader.Update()
+            verify_pressure_arrays(file_path, point_pressure_arrays, field_pressure_arrays)
             return True
 
         except Exception as e:
@@ -1362,11 +1531,13 @@ def _reconstruct_visit_data_from_db(
             reconstruction_file = reconstruction.reconstruction_file
 
         if reconstruction_file is None:
-            print(f"Warning: No reconstruction file found")
-            return None
-
-        # Load the reconstructed visit data from pickle
-        visit_data = pickle.loads(reconstruction_file)
+            # Decomposed reconstruction, the images are added by _enhance_visit_data_with_db_info if needed
+            visit_data = ReconstructionStorageService(barium_service.db).load_visit_data(
+                visit.visit_id, include_files=False
+            )
+        else:
+            # Load the reconstructed visit data from pickle
+            visit_data = pickle.loads(reconstruction_file)
 
         # Verify it's a VisitData object
         if not isinstance(visit_data, VisitData):
@@ -1415,7 +1586,7 @@ def _enhance_visit_data_with_db_info(
             # Ensure pressure matrix is available
             if not hasattr(viz_data, "pressure_matrix") or viz_data.pressure_matrix is None:
                 if manometry_file:
-                    viz_data.pressure_matrix = pickle.loads(manometry_file.pressure_matrix)
+                    viz_data.pressure_matrix = ManometryFileService.pressure_matrix_of(manometry_file)
 
             # Ensure X-ray data is available
             if not hasattr(viz_data, "xray_file") or viz_data.xray_file is None:
@@ -1447,51 +1618,189 @@ def _enhance_visit_data_with_db_info(
         print(f"Warning: Could not enhance visit data with database info: {e}")
 
 
+# Database session of a mass export worker process, created once per process by _init_mass_export_worker
+_worker_db_session = None
+
+
+def _init_mass_export_worker():
+    """
+    Open the database session of a mass export worker process. The worker has no QApplication, so the
+    services must not show their error message box: database errors are raised instead and reported to the
+    parent process in the 'error' of the result.
+    """
+    global _worker_db_session
+    from logic.database.database import get_db
+    from logic.services.previous_therapy_service import PreviousTherapyService
+
+    for service in (
+        ReconstructionService,
+        ReconstructionStorageService,
+        PatientService,
+        VisitService,
+        PreviousTherapyService,
+        BariumSwallowFileService,
+        ManometryFileService,
+        EndoscopyFileService,
+        EndoflipFileService,
+    ):
+        service.show_error_msg = _raise_database_error
+    _worker_db_session = get_db()
+
+
+def _raise_database_error(self):
+    """show_error_msg of the services in a mass export worker, re-raises the handled OperationalError"""
+    raise
+
+
+def _export_reconstruction_worker(
+    reconstruction_id: int,
+    output_directory: str,
+    max_pressure_frames: int,
+    pressure_export_mode: str,
+    export_validation_attributes: bool = False,
+) -> Dict[str, Any]:
+    """
+    Load, unpickle and export a single reconstruction inside a mass export worker process.
+
+    Returns:
+        Dictionary with 'reconstruction_id', 'mesh_files', 'validation_files', 'mesh_info' (patient,
+        visit and image of every mesh file) and 'error' (None on success)
+    """
+    result = {
+        "reconstruction_id": reconstruction_id,
+        "mesh_files": [],
+        "validation_files": [],
+        "mesh_info": [],
+        "error": None,
+    }
+    db_session = _worker_db_session
+    try:
+        reconstruction = ReconstructionService(db_session).get_reconstruction(reconstruction_id)
+        if reconstruction is None:
+            result["error"] = "Reconstruction not found"
+            return result
+
+        visit = VisitService(db_session).get_visit(reconstruction.visit_id)
+        patient = PatientService(db_session).get_patient(visit.patient_id)
+
+        visit_data = _reconstruct_visit_data_from_db(
+            reconstruction,
+            visit,
+            BariumSwallowFileService(db_session),
+            ManometryFileService(db_session),
+            EndoscopyFileService(db_session),
+            EndoflipFileService(db_session),
+        )
+        # Release the pickled blob as soon as the visit data is restored
+        db_session.expunge(reconstruction)
+        del reconstruction
+
+        if visit_data is None:
+            result["error"] = "Reconstruction could not be restored"
+            return result
+
+        visit_name = (
+            f"Visit_{visit.visit_id}_{patient.patient_id}_"
+            f"{visit.visit_type.replace(' ', '')}_{visit.year_of_visit}"
+        )
+        exporter = VTKHDFExporter(
+            db_session, max_pressure_frames, pressure_export_mode=pressure_export_mode
+        )
+        export_result = exporter.export_visit_reconstructions(
+            visit_data,
+            visit_name,
+            output_directory,
+            patient_id=patient.patient_id,
+            visit_id=visit.visit_id,
+            export_validation_attributes=export_validation_attributes,
+        )
+        result["mesh_files"] = export_result.get("mesh_files", [])
+        result["validation_files"] = export_result.get("validation_files", [])
+        for visualization_data in visit_data.visualization_data_list:
+            base_path = os.path.join(output_directory, f"{visit_name}_{visualization_data.xray_minute}")
+            if base_path + ".vtkhdf" not in result["mesh_files"]:
+                continue
+            validation_path = base_path + "_validation_attributes.json"
+            result["mesh_info"].append(
+                {
+                    "path": base_path + ".vtkhdf",
+                    "validation_path": validation_path if validation_path in result["validation_files"] else None,
+                    "patient_id": patient.patient_id,
+                    "visit_id": visit.visit_id,
+                    "visit_type": visit.visit_type,
+                    "xray_minute": str(visualization_data.xray_minute),
+                    "n_slices": np.shape(visualization_data.figure_x)[0],
+                }
+            )
+        if not result["mesh_files"]:
+            result["error"] = "No mesh exported"
+
+    except Exception as e:
+        result["error"] = str(e)
+        try:
+            db_session.rollback()
+        except Exception:
+            pass
+    finally:
+        try:
+            # Do not keep loaded blobs in the identity map between tasks
+            db_session.expunge_all()
+        except Exception:
+            pass
+
+    return result
+
+
 def run_mass_export_with_progress(
     db_session: Session,
     output_directory: str,
     parent_widget=None,
     max_pressure_frames: int = -1,
     pressure_export_mode: str = "per_vertex",
+    export_validation_attributes: bool = False,
+    output_format: str = "files",
 ) -> Dict[str, any]:
     """
-    Export all reconstructions with progress tracking.
+    Export all reconstructions in parallel with progress tracking.
+
+    Reconstruction IDs are streamed from the database and handed to a bounded pool of worker
+    processes, which load and unpickle the reconstruction blobs themselves. Finished exports are
+    reported back through a queue; cancelling the progress dialog terminates the workers.
+
+    The export is incremental: the manifest of the output directory (see ExportManifest) records the
+    content hash and export settings of every exported reconstruction. Unchanged reconstructions are
+    skipped, changed ones exported again and the files of deleted reconstructions removed. A crashed
+    or canceled export continues with the missing reconstructions when it is started again.
+
+    With output_format 'archive' all reconstructions are written into one HDF5 archive
+    (config.archive_file_name, see hdf5_archive). The workers export into a staging directory, every
+    finished reconstruction is appended to the archive and its staged files are deleted. The archive
+    is written completely on every run and replaces the previous one only when the export finished.
 
     Args:
         db_session: Database session
         output_directory: Directory to save files
         parent_widget: Parent widget for progress dialog
         max_pressure_frames: Maximum pressure frames to export
+        pressure_export_mode: 'per_vertex' | 'per_slice' | 'per_vertex_dataset' | 'none'
+        export_validation_attributes: Also export the validation attributes of every reconstruction
+        output_format: 'files' (one .vtkhdf file per reconstruction) | 'archive' (one HDF5 archive)
 
     Returns:
         Dictionary with export results
     """
-    from logic.services.reconstruction_service import ReconstructionService
-    from logic.services.patient_service import PatientService
-    from logic.services.visit_service import VisitService
-    from logic.services.barium_swallow_service import BariumSwallowFileService
-    from logic.services.manometry_service import ManometryFileService
-    from logic.services.endoscopy_service import EndoscopyFileService
-    from logic.services.endoflip_service import EndoflipFileService
-
-    # Initialize services
-    reconstruction_service = ReconstructionService(db_session)
-    patient_service = PatientService(db_session)
-    visit_service = VisitService(db_session)
-    barium_service = BariumSwallowFileService(db_session)
-    manometry_service = ManometryFileService(db_session)
-    endoscopy_service = EndoscopyFileService(db_session)
-    endoflip_service = EndoflipFileService(db_session)
-
-    # Initialize one exporter for the entire run
-    exporter = VTKHDFExporter(
-        db_session, max_pressure_frames, pressure_export_mode=pressure_export_mode
-    )
+    import multiprocessing
+    import queue
+    import shutil
+    import tempfile
 
-    # Get all reconstructions
-    all_reconstructions = reconstruction_service.get_all_reconstructions()
+    from logic.dataoutput.export_manifest import ExportManifest
+    from logic.dataoutput.hdf5_archive import ReconstructionArchiveWriter
 
-    if not all_reconstructions:
+    reconstruction_service = ReconstructionService(db_session)
+    total_reconstructions = reconstruction_service.count_reconstructions()
+
+    if not total_reconstructions:
         return {
             "success": False,
             "message": "No reconstructions found in database",
@@ -1500,8 +1809,36 @@ def run_mass_export_with_progress(
             "file_paths": [],
         }
 
+    os.makedirs(output_directory, exist_ok=True)
+
+    archive = None
+    if output_format == "archive":
+        # The archive is rewritten completely, the manifest of the file export is not used
+        manifest = None
+        worker_directory = tempfile.mkdtemp(prefix=".archive_staging_", dir=output_directory)
+        archive_path = os.path.join(output_directory, config.archive_file_name)
+        archive = ReconstructionArchiveWriter(archive_path + ".partial")
+    else:
+        manifest = ExportManifest(output_directory)
+        worker_directory = output_directory
+    settings = {
+        "pressure_export_mode": pressure_export_mode,
+        "max_pressure_frames": max_pressure_frames,
+        "export_validation_attributes": export_validation_attributes,
+        "export_profile": config.export_profile,
+    }
+
     all_created_files = []
     successful_exports = 0
+    skipped_count = 0
+    removed_count = 0
+    finished = 0
+    canceled = False
+    # Reconstructions in the database and the content hash / visit of the ones that are exported
+    seen_reconstruction_ids = set()
+    # Orphans are only removed if all reconstructions were listed
+    listing_failed = False
+    submitted = {}
 
     # Create progress dialog if parent widget provided
     progress_dialog = None
@@ -1511,7 +1848,7 @@ def run_mass_export_with_progress(
             from PyQt6.QtCore import Qt
 
             progress_dialog = QProgressDialog(
-                "Exporting VTKHDF files...", "Cancel", 0, len(all_reconstructions), parent_widget
+                "Exporting VTKHDF files...", "Cancel", 0, total_reconstructions, parent_widget
             )
             progress_dialog.setWindowModality(Qt.WindowModality.WindowModal)
             progress_dialog.setMinimumDuration(0)
@@ -1519,82 +1856,160 @@ def run_mass_export_with_progress(
         except Exception as e:
             print(f"Could not create progress dialog: {e}")
 
-    for idx, reconstruction in enumerate(all_reconstructions):
-        try:
-            # Update progress
-            if progress_dialog:
-                progress_dialog.setValue(idx)
-                progress_dialog.setLabelText(
-                    f"Exporting Patient reconstruction(s) {idx + 1}/{len(all_reconstructions)}..."
+    workers = config.mass_export_workers or max(1, (os.cpu_count() or 2) - 1)
+    workers = min(workers, total_reconstructions)
+    max_in_flight = workers * config.mass_export_tasks_per_worker
+
+    # Filled by the result handler thread of the pool, drained here on the GUI thread
+    result_queue = queue.Queue()
+    reconstructions = reconstruction_service.iter_reconstruction_hashes()
+    in_flight = 0
+
+    pool = multiprocessing.get_context("spawn").Pool(
+        processes=workers, initializer=_init_mass_export_worker
+    )
+    try:
+
+        def submit_next() -> bool:
+            nonlocal listing_failed
+            try:
+                return submit_next_reconstruction()
+            except OperationalError as e:
+                # The reconstructions that are already submitted are finished, no further ones are listed
+                print(f"Listing the reconstructions failed: {e}")
+                listing_failed = True
+                return False
+
+        def submit_next_reconstruction() -> bool:
+            nonlocal finished, skipped_count
+            if listing_failed:
+                return False
+            for reconstruction_id, visit_id, content_hash in reconstructions:
+                seen_reconstruction_ids.add(reconstruction_id)
+                if manifest and manifest.is_current(reconstruction_id, content_hash, settings):
+                    # Unchanged since the last export into this directory
+                    finished += 1
+                    skipped_count += 1
+                    continue
+                submitted[reconstruction_id] = (visit_id, content_hash)
+                pool.apply_async(
+                    _export_reconstruction_worker,
+                    (
+                        reconstruction_id,
+                        worker_directory,
+                        max_pressure_frames,
+                        pressure_export_mode,
+                        export_validation_attributes,
+                    ),
+                    callback=result_queue.put,
+                    error_callback=lambda e, rid=reconstruction_id: result_queue.put(
+                        {
+                            "reconstruction_id": rid,
+                            "mesh_files": [],
+                            "validation_files": [],
+                            "mesh_info": [],
+                            "error": str(e),
+                        }
+                    ),
                 )
-                if progress_dialog.wasCanceled():
-                    break
+                return True
+            return False
 
-            # Get visit and patient info
-            visit_id = (
-                reconstruction["visit_id"]
-                if isinstance(reconstruction, dict)
-                else reconstruction.visit_id
-            )
-            visit = visit_service.get_visit(visit_id)
-            patient = patient_service.get_patient(visit.patient_id)
-
-            # Reconstruct visit data
-            visit_data = _reconstruct_visit_data_from_db(
-                reconstruction,
-                visit,
-                barium_service,
-                manometry_service,
-                endoscopy_service,
-                endoflip_service,
-            )
+        while in_flight < max_in_flight and submit_next():
+            in_flight += 1
 
-            if visit_data is None:
+        while in_flight > 0:
+            if progress_dialog:
+                from PyQt6.QtCore import QCoreApplication
+
+                QCoreApplication.processEvents()
+                if progress_dialog.wasCanceled():
+                    canceled = True
+                    break
+            try:
+                result = result_queue.get(timeout=0.1)
+            except queue.Empty:
                 continue
 
-            # Create visit name
-            visit_name = (
-                f"Visit_{visit.visit_id}_{patient.patient_id}_"
-                f"{visit.visit_type.replace(' ', '')}_{visit.year_of_visit}"
-            )
+            in_flight -= 1
+            finished += 1
+            if result["error"]:
+                print(f"Error exporting reconstruction {result['reconstruction_id']}: {result['error']}")
+            visit_id, content_hash = submitted.pop(result["reconstruction_id"])
+            if result["mesh_files"] and archive:
+                added = 0
+                for info in result["mesh_info"]:
+                    added += archive.add(info["path"], info, info["validation_path"])
+                for path in result["mesh_files"] + result["validation_files"]:
+                    os.remove(path)
+                if added:
+                    successful_exports += 1
+            elif result["mesh_files"]:
+                all_created_files.extend(result["mesh_files"])
+                successful_exports += 1
+                manifest.record(
+                    result["reconstruction_id"],
+                    visit_id,
+                    content_hash,
+                    settings,
+                    result["mesh_files"],
+                    result["validation_files"],
+                )
 
-            # Export using the single enhanced exporter instance
-            export_result = exporter.export_visit_reconstructions(
-                visit_data,
-                visit_name,
-                output_directory,
-                patient_id=patient.patient_id,
-                visit_id=visit.visit_id,
-            )
+            if progress_dialog:
+                progress_dialog.setValue(finished)
+                progress_dialog.setLabelText(
+                    f"Exported Patient reconstruction(s) {finished}/{total_reconstructions}..."
+                )
 
-            # Extract mesh files and extend the list
-            mesh_files = export_result.get("mesh_files", [])
-            all_created_files.extend(mesh_files)
-            if mesh_files:
-                successful_exports += 1
+            if submit_next():
+                in_flight += 1
 
-        except Exception as e:
-            reconstruction_id = (
-                reconstruction["reconstruction_id"]
-                if isinstance(reconstruction, dict)
-                else reconstruction.reconstruction_id
-            )
-            print(f"Error exporting reconstruction {reconstruction_id}: {e}")
-            continue
+    finally:
+        if canceled:
+            # Stop the reconstructions that are currently exported as well
+            pool.terminate()
+        else:
+            pool.close()
+        pool.join()
+        reconstructions.close()
+
+        if archive:
+            archive.close()
+            if canceled or not successful_exports:
+                os.remove(archive.archive_path)
+            else:
+                os.replace(archive.archive_path, archive_path)
+                all_created_files.append(archive_path)
+            shutil.rmtree(worker_directory, ignore_errors=True)
+
+    if manifest and not canceled and not listing_failed:
+        # All reconstructions were seen, remove the files of the ones deleted from the database
+        removed_count = manifest.remove_orphans(seen_reconstruction_ids)
 
     # Close progress dialog
     if progress_dialog:
-        progress_dialog.setValue(len(all_reconstructions))
+        progress_dialog.setValue(total_reconstructions)
         progress_dialog.close()
 
     # Provide a more detailed summary in the return dictionary
-    total_reconstructions = len(all_reconstructions)
-    failed_count = total_reconstructions - successful_exports
+    failed_count = finished - successful_exports - skipped_count
+    message = (
+        f"Exported {successful_exports}/{total_reconstructions} visits, "
+        f"{skipped_count} unchanged, {removed_count} removed."
+    )
+    if canceled:
+        message += " The export was canceled."
+    if listing_failed:
+        message += " The connection to the database was lost, not all reconstructions were exported."
 
     return {
-        "success": successful_exports > 0,
-        "message": f"Exported {successful_exports}/{total_reconstructions} visits.",
-        "exported_count": len(all_created_files),
+        "success": successful_exports + skipped_count > 0,
+        "message": message,
+        # In the archive format the number of reconstructions written into the archive
+        "exported_count": len(archive.index_rows) if archive else len(all_created_files),
+        "skipped_count": skipped_count,
+        "removed_count": removed_count,
         "failed_count": failed_count,
         "total_files": len(all_created_files),
         "output_directory": output_directory,
@@ -0,0 +1,270 @@
+"""
+Lightweight reader for exported reconstructions.
+
+Opens the files written by VTKHDFExporter (.vtkhdf) and the HDF5 archive of the mass export with
+h5py instead of VTK. Nothing is loaded on opening: geometry, per-slice pressure, per-vertex pressure
+and anatomical regions are returned as views that read only the requested rows. Datasets stored
+contiguous and uncompressed are memory-mapped, chunked datasets are read chunk by chunk through
+h5py slicing.
+
+Usage:
+    with ReconstructionDataset("/path/to/export") as dataset:
+        for reconstruction in dataset:
+            pressure = reconstruction.slice_pressure(0, 100)  # frames 0..99, shape (100, slices)
+"""
+
+import glob
+import json
+import os
+import time
+from typing import Any, Dict, Iterator, List, Optional, Union
+
+import h5py
+import numpy as np
+
+from logic.dataoutput.export_profiles import decode_pressure, get_pressure_array
+from logic.dataoutput.hdf5_archive import INDEX_DATASET, RECONSTRUCTIONS_GROUP
+from logic.dataoutput.pressure_dataset import PRESSURE_DATASET, PRESSURE_GROUP
+
+ArrayView = Union[np.ndarray, h5py.Dataset]
+
+
+class ExportedReconstruction:
+    """
+    View of one exported reconstruction, either a .vtkhdf file or a group of the archive.
+
+    All arrays are returned as views (np.memmap or h5py.Dataset), slicing them reads only the
+    requested part from the file.
+    """
+
+    def __init__(self, group: h5py.Group, name: str):
+        self.group = group
+        self.name = name
+        self.vtkhdf = group["VTKHDF"]
+
+    @property
+    def n_points(self) -> int:
+        return int(np.sum(self.vtkhdf["NumberOfPoints"][()]))
+
+    @property
+    def points(self) -> ArrayView:
+        """Vertex coordinates, shape (vertices, 3)."""
+        return _view(self.vtkhdf["Points"])
+
+    @property
+    def triangles(self) -> np.ndarray:
+        """Vertex indices of the triangles, shape (triangles, 3). The exporter writes triangle meshes only."""
+        return self.vtkhdf["Polygons/Connectivity"][()].reshape(-1, 3)
+
+    def point_array(self, name: str) -> Optional[ArrayView]:
+        point_data = self.vtkhdf.get("PointData")
+        if point_data is None or name not in point_data:
+            return None
+        return _view(point_data[name])
+
+    @property
+    def anatomical_region(self) -> Optional[ArrayView]:
+        """Region of every vertex (1=tubular, 2=LES)."""
+        return self.point_array("anatomical_region")
+
+    @property
+    def slice_index(self) -> Optional[ArrayView]:
+        """Slice (ring) of every vertex."""
+        return self.point_array("slice_index")
+
+    def field(self, name: str) -> Any:
+        """Value of a field data entry; JSON strings are decoded, single values unpacked."""
+        field_data = self.vtkhdf.get("FieldData")
+        if field_data is None or name not in field_data:
+            return None
+        value = field_data[name][()]
+        if value.dtype.kind in "SO":
+            value = value.ravel()[0]
+            value = value.decode() if isinstance(value, bytes) else value
+            try:
+                return json.loads(value)
+            except ValueError:
+                return value
+        value = np.ravel(value)
+        return value[0].item() if value.size == 1 else value
+
+    def field_names(self) -> List[str]:
+        field_data = self.vtkhdf.get("FieldData")
+        return list(field_data.keys()) if field_data is not None else []
+
+    def metrics(self) -> Dict[str, Any]:
+        """All metric_* field data entries (volumes, lengths, heights, per-frame pressures)."""
+        return {name: self.field(name) for name in self.field_names() if name.startswith("metric_")}
+
+    @property
+    def slice_pressure_shape(self) -> Optional[tuple]:
+        """(frames, slices) of the per-slice pressure matrix, None if it was not exported."""
+        field_data = self.vtkhdf.get("FieldData")
+        if field_data is None or "pressure_slice_matrix_shape" not in field_data:
+            return None
+        n_frames, n_slices = np.ravel(field_data["pressure_slice_matrix_shape"][()])[:2]
+        return int(n_frames), int(n_slices)
+
+    def slice_pressure(self, start: int = 0, stop: Optional[int] = None) -> Optional[np.ndarray]:
+        """
+        Per-slice pressure of the frames start..stop-1, shape (frames, slices).
+
+        Reads only the rows of the flat matrix (pressure_slice_matrix_flat) belonging to the frames.
+        """
+        shape = self.slice_pressure_shape
+        if shape is None:
+            return None
+        n_frames, n_slices = shape
+        start, stop, _ = slice(start, stop).indices(n_frames)
+        flat = get_pressure_array(self.vtkhdf["FieldData"], "pressure_slice_matrix_flat")
+        rows = decode_pressure(flat[start * n_slices : stop * n_slices], flat.attrs)
+        return rows.reshape(max(stop - start, 0), n_slices)
+
+    @property
+    def n_vertex_pressure_frames(self) -> int:
+        if PRESSURE_GROUP in self.group:
+            return self.group[PRESSURE_GROUP][PRESSURE_DATASET].shape[0]
+        point_data = self.vtkhdf.get("PointData")
+        if point_data is None:
+            return 0
+        return sum(1 for name in point_data.keys() if name.startswith("pressure_frame_"))
+
+    def vertex_pressure(self, frame_index: int) -> Optional[np.ndarray]:
+        """Pressure of all vertices at one frame, from the pressure dataset or the per-frame arrays."""
+        if PRESSURE_GROUP in self.group:
+            dataset = self.group[PRESSURE_GROUP][PRESSURE_DATASET]
+            return decode_pressure(dataset[frame_index], dataset.attrs)
+        point_data = self.vtkhdf.get("PointData")
+        dataset = get_pressure_array(point_data, f"pressure_frame_{frame_index:03d}") if point_data is not None else None
+        if dataset is None:
+            return None
+        return decode_pressure(dataset[()], dataset.attrs)
+
+    def vertex_pressure_view(self) -> Optional[h5py.Dataset]:
+        """
+        The (frames x vertices) pressure dataset, only available in the per_vertex_dataset mode.
+        Values of the compact profile are stored values, see export_profiles.decode_pressure.
+        """
+        if PRESSURE_GROUP in self.group:
+            return self.group[PRESSURE_GROUP][PRESSURE_DATASET]
+        return None
+
+
+class ReconstructionDataset:
+    """
+    Exported reconstructions of a directory of .vtkhdf files or of an HDF5 archive as a dataset.
+
+    Files of a directory are opened when an item is accessed and closed with the dataset, the
+    archive is opened once.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.archive = None
+        self.open_files: List[h5py.File] = []
+        if os.path.isdir(path):
+            self.file_paths = sorted(glob.glob(os.path.join(path, "*.vtkhdf")))
+            self.names = [os.path.splitext(os.path.basename(p))[0] for p in self.file_paths]
+        else:
+            self.archive = h5py.File(path, "r")
+            self.names = [name.decode() for name in self.archive[INDEX_DATASET]["group"]]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __getitem__(self, position: int) -> ExportedReconstruction:
+        name = self.names[position]
+        if self.archive is not None:
+            return ExportedReconstruction(self.archive[RECONSTRUCTIONS_GROUP][name], name)
+        file = h5py.File(self.file_paths[position], "r")
+        self.open_files.append(file)
+        return ExportedReconstruction(file, name)
+
+    def __iter__(self) -> Iterator[ExportedReconstruction]:
+        for position in range(len(self)):
+            if self.archive is not None:
+                yield self[position]
+                continue
+            # Iterating a directory keeps only the current file open
+            with h5py.File(self.file_paths[position], "r") as file:
+                yield ExportedReconstruction(file, self.names[position])
+
+    def close(self):
+        for file in self.open_files:
+            file.close()
+        self.open_files = []
+        if self.archive is not None:
+            self.archive.close()
+            self.archive = None
+
+
+def _view(dataset: h5py.Dataset) -> ArrayView:
+    """Memory-map contiguous uncompressed datasets, other datasets stay lazy h5py datasets."""
+    if dataset.chunks is None and dataset.compression is None and dataset.dtype.kind in "biuf":
+        offset = dataset.id.get_offset()
+        if offset is not None:
+            return np.memmap(
+                dataset.file.filename, dtype=dataset.dtype, mode="r", offset=offset, shape=dataset.shape
+            )
+    return dataset
+
+
+def benchmark_load_throughput(path: str) -> Dict[str, Dict[str, float]]:
+    """
+    Compare loading the per-slice pressure matrix and the metrics with pyvista and with this reader.
+
+    Run from the application directory with: python -m logic.dataoutput.vtkhdf_reader <export directory>
+
+    Returns:
+        Dictionary with the reconstructions per second and seconds of both readers
+    """
+    import pyvista as pv
+
+    file_paths = sorted(glob.glob(os.path.join(path, "*.vtkhdf")))
+    if not file_paths:
+        print(f"No .vtkhdf files found in {path}")
+        return {}
+    total_mb = sum(os.path.getsize(p) for p in file_paths) / 1e6
+    results = {}
+
+    # Both readers load the per-slice pressure and all metrics of every reconstruction and keep them
+    start = time.perf_counter()
+    loaded = []
+    for file_path in file_paths:
+        mesh = pv.read(file_path)
+        slice_pressure = None
+        if "pressure_slice_matrix_shape" in mesh.field_data:
+            shape = tuple(int(v) for v in mesh.field_data["pressure_slice_matrix_shape"])
+            slice_pressure = np.asarray(mesh.field_data["pressure_slice_matrix_flat"]).reshape(shape)
+        metrics = {name: mesh.field_data[name] for name in mesh.field_data.keys() if name.startswith("metric_")}
+        loaded.append((slice_pressure, metrics))
+    results["pyvista"] = {"seconds": time.perf_counter() - start}
+
+    start = time.perf_counter()
+    loaded = []
+    with ReconstructionDataset(path) as dataset:
+        for reconstruction in dataset:
+            loaded.append((reconstruction.slice_pressure(), reconstruction.metrics()))
+    results["vtkhdf_reader"] = {"seconds": time.perf_counter() - start}
+
+    print(f"Load throughput ({len(file_paths)} files, {total_mb:.1f}MB) in {path}")
+    for reader, values in results.items():
+        values["reconstructions_per_second"] = len(file_paths) / values["seconds"]
+        print(
+            f"  {reader:<14} {values['seconds']:8.2f}s  "
+            f"{values['reconstructions_per_second']:8.1f} reconstructions/s  "
+            f"{total_mb / values['seconds']:8.1f}MB/s"
+        )
+    return results
+
+
+if __name__ == "__main__":
+    import sys
+
+    benchmark_load_throughput(sys.argv[1] if len(sys.argv) > 1 else ".")
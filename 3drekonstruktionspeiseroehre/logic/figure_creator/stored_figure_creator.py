@@ -0,0 +1,73 @@
+import config
+from logic.figure_creator.figure_creator import FigureCreator
+from logic.visualization_data import VisualizationData
+
+
+class StoredFigureCreator(FigureCreator):
+    """
+    Implements FigureCreator for reconstructions loaded from the database.
+    The surface colors, metrics and lengths are not calculated again, the figure and the EndoFLIP
+    tables are created on first use.
+    """
+
+    def __init__(
+        self,
+        visualization_data: VisualizationData,
+        surfacecolor_list,
+        metrics,
+        esophagus_length_cm,
+        endoflip_surface_color=None,
+        with_endoscopy=False,
+    ):
+        """
+        init StoredFigureCreator
+        :param visualization_data: VisualizationData with figure_x, figure_y and figure_z
+        :param surfacecolor_list: pressure per frame and slice
+        :param metrics: metrics as calculated by FigureCreator.calculate_metrics
+        :param esophagus_length_cm: length in cm
+        :param endoflip_surface_color: EndoFLIP colors per balloon volume and aggregation or None
+        :param with_endoscopy: whether the reconstruction was created with endoscopy data
+        """
+        self.visualization_data = visualization_data
+        self.surfacecolor_list = surfacecolor_list
+        self.number_of_frames = len(surfacecolor_list)
+        self.metrics = metrics
+        self.esophagus_length_cm = esophagus_length_cm
+        self.endoflip_surface_color = endoflip_surface_color
+        self.with_endoscopy = with_endoscopy
+        self._figure = None
+        self._table_figures = None
+
+    def get_figure(self):
+        if self._figure is None:
+            title = config.title_with_endoscopy if self.with_endoscopy else config.title_without_endoscopy
+            self._figure = FigureCreator.create_figure(
+                self.visualization_data.figure_x,
+                self.visualization_data.figure_y,
+                self.visualization_data.figure_z,
+                self.surfacecolor_list,
+                title,
+            )
+        return self._figure
+
+    def get_endoflip_tables(self):
+        if self._table_figures is None and self.visualization_data.endoflip_screenshot:
+            self._table_figures = FigureCreator.colored_vertical_endoflip_tables_and_colors(
+                self.visualization_data.endoflip_screenshot
+            )
+        return self._table_figures
+
+    def get_endoflip_surface_color(self, ballon_volume: str, aggregate_function: str):
+        return self.endoflip_surface_color[ballon_volume][aggregate_function]
+
+    def get_surfacecolor_list(self):
+        return self.surfacecolor_list
+
+    def get_number_of_frames(self):
+        return self.number_of_frames
+
+    def get_metrics(self):
+        return self.metrics
+
+    def get_esophagus_full_length_cm(self):
+        return self.esophagus_length_cm
@@ -1,7 +1,7 @@
 from PyQt6 import QtGui
 from PyQt6.QtWidgets import QMessageBox
 from sqlalchemy import select, delete, update, insert
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, undefer
 from logic.database.data_declarative_models import BariumSwallowFile, BariumSwallow
 from sqlalchemy.exc import OperationalError
 
@@ -84,7 +84,7 @@ class BariumSwallowFileService:
         self.db = db_session
 
     def get_barium_swallow_file(self, id: int):
-        stmt = select(BariumSwallowFile).where(BariumSwallowFile.tbe_file_id == id)
+        stmt = select(BariumSwallowFile).where(BariumSwallowFile.tbe_file_id == id).options(undefer(BariumSwallowFile.file))
         try:
             result = self.db.execute(stmt).first()
             if result:
@@ -93,7 +93,12 @@ class BariumSwallowFileService:
             self.show_error_msg()
 
     def get_barium_swallow_files_for_visit(self, visit_id: int) -> list[BariumSwallowFile, None]:
-        stmt = select(BariumSwallowFile).where(BariumSwallowFile.visit_id == visit_id)
+        stmt = (
+            select(BariumSwallowFile)
+            .where(BariumSwallowFile.visit_id == visit_id)
+            .order_by(BariumSwallowFile.tbe_file_id)
+            .options(undefer(BariumSwallowFile.file))
+        )
         try:
             result = self.db.execute(stmt).all()
             if result:
@@ -104,11 +109,23 @@ class BariumSwallowFileService:
             self.show_error_msg()
 
     def get_barium_swallow_minutes_for_visit(self, visit_id: int) -> list[BariumSwallowFile, None]:
-        stmt = select(BariumSwallowFile).where(BariumSwallowFile.visit_id == visit_id)
+        stmt = select(BariumSwallowFile.minute_of_picture).where(BariumSwallowFile.visit_id == visit_id).order_by(BariumSwallowFile.tbe_file_id)
         try:
-            result = self.db.execute(stmt).all()
+            result = self.db.execute(stmt).scalars().all()
+            if result:
+                return list(result)
+            else:
+                return None
+        except OperationalError as e:
+            self.show_error_msg()
+
+    def get_barium_swallow_file_ids_for_visit(self, visit_id: int) -> list[int, None]:
+        """IDs of the files of a visit (without loading the files), in the order of get_barium_swallow_minutes_for_visit."""
+        stmt = select(BariumSwallowFile.tbe_file_id).where(BariumSwallowFile.visit_id == visit_id).order_by(BariumSwallowFile.tbe_file_id)
+        try:
+            result = self.db.execute(stmt).scalars().all()
             if result:
-                return [row[0].minute_of_picture for row in result]
+                return list(result)
             else:
                 return None
         except OperationalError as e:
@@ -154,8 +171,22 @@ class BariumSwallowFileService:
             self.db.rollback()
             self.show_error_msg()
 
+    def create_barium_swallow_files(self, data: list[dict]):
+        """
+        Insert all rows with one executemany in a single transaction
+        """
+        if not data:
+            return 0
+        try:
+            self.db.execute(insert(BariumSwallowFile), data)
+            self.db.commit()
+            return len(data)
+        except OperationalError as e:
+            self.db.rollback()
+            self.show_error_msg()
+
     def get_all_barium_swallow_files(self) -> list[BariumSwallowFile, None]:
-        stmt = select(BariumSwallowFile)
+        stmt = select(BariumSwallowFile).options(undefer(BariumSwallowFile.file))
         try:
             result = self.db.execute(stmt).all()
             return list(map(lambda row: row[0].toDict(), result))
@@ -163,27 +194,27 @@ class BariumSwallowFileService:
             self.show_error_msg()
 
     def get_barium_swallow_image(self, id: int):
-        stmt = select(BariumSwallowFile).where(BariumSwallowFile.tbe_file_id == id)
+        stmt = select(BariumSwallowFile.file).where(BariumSwallowFile.tbe_file_id == id)
         try:
             result = self.db.execute(stmt).first()
             if result:
-                image = result[0].file
+                image = result[0]
                 pixmap = QtGui.QPixmap()
-                pixmap.loadFromData(image, 'jpeg')
+                pixmap.loadFromData(image)
                 return pixmap
         except OperationalError as e:
             self.show_error_msg()
 
     def get_barium_swallow_images_for_visit(self, visit_id: int):
         try:
-            stmt = select(BariumSwallowFile).where(BariumSwallowFile.visit_id == visit_id)
+            stmt = select(BariumSwallowFile.file).where(BariumSwallowFile.visit_id == visit_id).order_by(BariumSwallowFile.tbe_file_id)
             results = self.db.execute(stmt).all()
             pixmaps = []
             if results:
                 for barium_swallow_file in results:
-                    image = barium_swallow_file[0].file
+                    image = barium_swallow_file[0]
                     pixmap = QtGui.QPixmap()
-                    pixmap.loadFromData(image, 'jpeg')
+                    pixmap.loadFromData(image)
                     pixmaps.append(pixmap)
             return pixmaps
         except OperationalError as e:
@@ -2,7 +2,7 @@ from PyQt6.QtWidgets import QMessageBox
 from PyQt6 import QtGui
 from sqlalchemy import select, delete, update, insert
 from sqlalchemy.exc import OperationalError
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, undefer
 from logic.database.data_declarative_models import Endoflip, EndoflipFile, EndoflipImage
 
 
@@ -93,7 +93,13 @@ class EndoflipFileService:
             self.show_error_msg()
 
     def get_endoflip_files_for_visit(self, visit_id: int) -> list[EndoflipFile, None]:
-        stmt = select(EndoflipFile).where(EndoflipFile.visit_id == visit_id)
+        # The screenshot is needed by the reconstruction, the .xlsx file is loaded on access
+        stmt = (
+            select(EndoflipFile)
+            .where(EndoflipFile.visit_id == visit_id)
+            .order_by(EndoflipFile.endoflip_file_id)
+            .options(undefer(EndoflipFile.screenshot))
+        )
         try:
             result = self.db.execute(stmt).all()
             if result:
@@ -103,6 +109,18 @@ class EndoflipFileService:
         except OperationalError as e:
             self.show_error_msg()
 
+    def get_endoflip_file_timepoints_for_visit(self, visit_id: int) -> list[str, None]:
+        """Timepoints of the EndoFLIP files of a visit (without loading the files)."""
+        stmt = select(EndoflipFile.timepoint).where(EndoflipFile.visit_id == visit_id).order_by(EndoflipFile.endoflip_file_id)
+        try:
+            result = self.db.execute(stmt).scalars().all()
+            if result:
+                return list(result)
+            else:
+                return None
+        except OperationalError as e:
+            self.show_error_msg()
+
     def delete_endoflip_file_for_visit(self, visit_id: int):
         stmt = delete(EndoflipFile).where(EndoflipFile.visit_id == visit_id)
         try:
@@ -167,11 +185,23 @@ class EndoflipImageService:
             self.show_error_msg()
 
     def get_endoflip_timepoints_for_visit(self, visit_id: int) -> list[EndoflipImage, None]:
-        stmt = select(EndoflipImage).where(EndoflipImage.visit_id == visit_id)
+        stmt = select(EndoflipImage.timepoint).where(EndoflipImage.visit_id == visit_id).order_by(EndoflipImage.endoflip_image_id)
         try:
-            result = self.db.execute(stmt).all()
+            result = self.db.execute(stmt).scalars().all()
+            if result:
+                return list(result)
+            else:
+                return None
+        except OperationalError as e:
+            self.show_error_msg()
+
+    def get_endoflip_image_ids_for_visit(self, visit_id: int) -> list[int, None]:
+        """IDs of the files of a visit (without loading the files), in the order of get_endoflip_timepoints_for_visit."""
+        stmt = select(EndoflipImage.endoflip_image_id).where(EndoflipImage.visit_id == visit_id).order_by(EndoflipImage.endoflip_image_id)
+        try:
+            result = self.db.execute(stmt).scalars().all()
             if result:
-                return [row[0].timepoint for row in result]
+                return list(result)
             else:
                 return None
         except OperationalError as e:
@@ -217,8 +247,22 @@ class EndoflipImageService:
             self.db.rollback()
             self.show_error_msg()
 
+    def create_endoflip_images(self, data: list[dict]):
+        """
+        Insert all rows with one executemany in a single transaction
+        """
+        if not data:
+            return 0
+        try:
+            self.db.execute(insert(EndoflipImage), data)
+            self.db.commit()
+            return len(data)
+        except OperationalError as e:
+            self.db.rollback()
+            self.show_error_msg()
+
     def get_all_endoflip_images(self) -> list[EndoflipImage, None]:
-        stmt = select(EndoflipImage)
+        stmt = select(EndoflipImage).options(undefer(EndoflipImage.file))
         try:
             result = self.db.execute(stmt).all()
             return list(map(lambda row: row[0].toDict(), result))
@@ -226,27 +270,27 @@ class EndoflipImageService:
             self.show_error_msg()
 
     def get_endoflip_image(self, id: int):
-        stmt = select(EndoflipImage).where(EndoflipImage.endoflip_image_id == id)
+        stmt = select(EndoflipImage.file).where(EndoflipImage.endoflip_image_id == id)
         try:
             result = self.db.execute(stmt).first()
             if result:
-                image = result[0].file
+                image = result[0]
                 pixmap = QtGui.QPixmap()
-                pixmap.loadFromData(image, 'jpeg')
+                pixmap.loadFromData(image)
                 return pixmap
         except OperationalError as e:
             self.show_error_msg()
 
     def get_endoflip_images_for_visit(self, visit_id: int):
         try:
-            stmt = select(EndoflipImage).where(EndoflipImage.visit_id == visit_id)
+            stmt = select(EndoflipImage.file).where(EndoflipImage.visit_id == visit_id).order_by(EndoflipImage.endoflip_image_id)
             results = self.db.execute(stmt).all()
             pixmaps = []
             if results:
                 for endoflip_file in results:
-                    image = endoflip_file[0].file
+                    image = endoflip_file[0]
                     pixmap = QtGui.QPixmap()
-                    pixmap.loadFromData(image, 'jpeg')
+                    pixmap.loadFromData(image)
                     pixmaps.append(pixmap)
             return pixmaps
         except OperationalError as e:
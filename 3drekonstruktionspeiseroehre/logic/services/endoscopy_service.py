@@ -1,7 +1,7 @@
 from PyQt6 import QtGui
 from PyQt6.QtWidgets import QMessageBox
 from sqlalchemy import select, delete, update, insert, func
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, undefer
 from logic.database.data_declarative_models import EndoscopyFile, Endoscopy
 from sqlalchemy.exc import OperationalError
 
@@ -84,7 +84,7 @@ class EndoscopyFileService:
         self.db = db_session
 
     def get_endoscopy_file(self, id: int):
-        stmt = select(EndoscopyFile).where(EndoscopyFile.egd_file_id == id)
+        stmt = select(EndoscopyFile).where(EndoscopyFile.egd_file_id == id).options(undefer(EndoscopyFile.file))
         try:
             result = self.db.execute(stmt).first()
             if result:
@@ -93,7 +93,12 @@ class EndoscopyFileService:
             self.show_error_msg()
 
     def get_endoscopy_files_for_visit(self, visit_id: int) -> list[EndoscopyFile, None]:
-        stmt = select(EndoscopyFile).where(EndoscopyFile.visit_id == visit_id)
+        stmt = (
+            select(EndoscopyFile)
+            .where(EndoscopyFile.visit_id == visit_id)
+            .order_by(EndoscopyFile.egd_file_id)
+            .options(undefer(EndoscopyFile.file))
+        )
         try:
             result = self.db.execute(stmt).all()
             if result:
@@ -104,11 +109,23 @@ class EndoscopyFileService:
             self.show_error_msg()
 
     def get_endoscopy_positions_for_visit(self, visit_id: int) -> list[EndoscopyFile, None]:
-        stmt = select(EndoscopyFile).where(EndoscopyFile.visit_id == visit_id)
+        stmt = select(EndoscopyFile.image_position).where(EndoscopyFile.visit_id == visit_id).order_by(EndoscopyFile.egd_file_id)
         try:
-            result = self.db.execute(stmt).all()
+            result = self.db.execute(stmt).scalars().all()
+            if result:
+                return list(result)
+            else:
+                return None
+        except OperationalError as e:
+            self.show_error_msg()
+
+    def get_endoscopy_file_ids_for_visit(self, visit_id: int) -> list[int, None]:
+        """IDs of the files of a visit (without loading the files), in the order of get_endoscopy_positions_for_visit."""
+        stmt = select(EndoscopyFile.egd_file_id).where(EndoscopyFile.visit_id == visit_id).order_by(EndoscopyFile.egd_file_id)
+        try:
+            result = self.db.execute(stmt).scalars().all()
             if result:
-                return [row[0].image_position for row in result]
+                return list(result)
             else:
                 return None
         except OperationalError as e:
@@ -154,8 +171,22 @@ class EndoscopyFileService:
             self.db.rollback()
             self.show_error_msg()
 
+    def create_endoscopy_files(self, data: list[dict]):
+        """
+        Insert all rows with one executemany in a single transaction
+        """
+        if not data:
+            return 0
+        try:
+            self.db.execute(insert(EndoscopyFile), data)
+            self.db.commit()
+            return len(data)
+        except OperationalError as e:
+            self.db.rollback()
+            self.show_error_msg()
+
     def get_all_endoscopy_files(self) -> list[EndoscopyFile, None]:
-        stmt = select(EndoscopyFile)
+        stmt = select(EndoscopyFile).options(undefer(EndoscopyFile.file))
         try:
             result = self.db.execute(stmt).all()
             return list(map(lambda row: row[0].toDict(), result))
@@ -163,27 +194,27 @@ class EndoscopyFileService:
             self.show_error_msg()
 
     def get_endoscopy_image(self, id: int):
-        stmt = select(EndoscopyFile).where(EndoscopyFile.egd_file_id == id)
+        stmt = select(EndoscopyFile.file).where(EndoscopyFile.egd_file_id == id)
         try:
             result = self.db.execute(stmt).first()
             if result:
-                image = result[0].file
+                image = result[0]
                 pixmap = QtGui.QPixmap()
-                pixmap.loadFromData(image, 'jpeg')
+                pixmap.loadFromData(image)
                 return pixmap
         except OperationalError as e:
             self.show_error_msg()
 
     def get_endoscopy_images_for_visit(self, visit_id: int):
         try:
-            stmt = select(EndoscopyFile).where(EndoscopyFile.visit_id == visit_id)
+            stmt = select(EndoscopyFile.file).where(EndoscopyFile.visit_id == visit_id).order_by(EndoscopyFile.egd_file_id)
             results = self.db.execute(stmt).all()
             pixmaps = []
             if results:
                 for endoscopy_file in results:
-                    image = endoscopy_file[0].file
+                    image = endoscopy_file[0]
                     pixmap = QtGui.QPixmap()
-                    pixmap.loadFromData(image, 'jpeg')
+                    pixmap.loadFromData(image)
                     pixmaps.append(pixmap)
             return pixmaps
         except OperationalError as e:
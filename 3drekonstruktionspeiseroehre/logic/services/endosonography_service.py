@@ -1,11 +1,13 @@
+import os
+
 from PyQt6 import QtGui
 from PyQt6.QtWidgets import QMessageBox
 from sqlalchemy import select, delete, update, insert, func
 import psycopg2
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, undefer
 from logic.database.data_declarative_models import EndosonographyImage, EndosonographyVideo
 from sqlalchemy.exc import OperationalError
-from gui.show_message import ShowMessage
+import config
 
 
 class EndosonographyImageService:
@@ -14,7 +16,7 @@ class EndosonographyImageService:
         self.db = db_session
 
     def get_endosonography_file(self, id: int):
-        stmt = select(EndosonographyImage).where(EndosonographyImage.endosonography_image_id == id)
+        stmt = select(EndosonographyImage).where(EndosonographyImage.endosonography_image_id == id).options(undefer(EndosonographyImage.file))
         try:
             result = self.db.execute(stmt).first()
             if result:
@@ -23,7 +25,12 @@ class EndosonographyImageService:
             self.show_error_msg()
 
     def get_endosonography_files_for_visit(self, visit_id: int) -> list[EndosonographyImage, None]:
-        stmt = select(EndosonographyImage).where(EndosonographyImage.visit_id == visit_id)
+        stmt = (
+            select(EndosonographyImage)
+            .where(EndosonographyImage.visit_id == visit_id)
+            .order_by(EndosonographyImage.endosonography_image_id)
+            .options(undefer(EndosonographyImage.file))
+        )
         try:
             result = self.db.execute(stmt).all()
             if result:
@@ -34,11 +41,23 @@ class EndosonographyImageService:
             self.show_error_msg()
 
     def get_endosonography_positions_for_visit(self, visit_id: int) -> list[EndosonographyImage, None]:
-        stmt = select(EndosonographyImage).where(EndosonographyImage.visit_id == visit_id)
+        stmt = select(EndosonographyImage.image_position).where(EndosonographyImage.visit_id == visit_id).order_by(EndosonographyImage.endosonography_image_id)
         try:
-            result = self.db.execute(stmt).all()
+            result = self.db.execute(stmt).scalars().all()
+            if result:
+                return list(result)
+            else:
+                return None
+        except OperationalError as e:
+            self.show_error_msg()
+
+    def get_endosonography_image_ids_for_visit(self, visit_id: int) -> list[int, None]:
+        """IDs of the files of a visit (without loading the files), in the order of get_endosonography_positions_for_visit."""
+        stmt = select(EndosonographyImage.endosonography_image_id).where(EndosonographyImage.visit_id == visit_id).order_by(EndosonographyImage.endosonography_image_id)
+        try:
+            result = self.db.execute(stmt).scalars().all()
             if result:
-                return [row[0].image_position for row in result]
+                return list(result)
             else:
                 return None
         except OperationalError as e:
@@ -84,8 +103,22 @@ class EndosonographyImageService:
             self.db.rollback()
             self.show_error_msg()
 
+    def create_endosonography_files(self, data: list[dict]):
+        """
+        Insert all rows with one executemany in a single transaction
+        """
+        if not data:
+            return 0
+        try:
+            self.db.execute(insert(EndosonographyImage), data)
+            self.db.commit()
+            return len(data)
+        except OperationalError as e:
+            self.db.rollback()
+            self.show_error_msg()
+
     def get_all_endosonography_files(self) -> list[EndosonographyImage, None]:
-        stmt = select(EndosonographyImage)
+        stmt = select(EndosonographyImage).options(undefer(EndosonographyImage.file))
         try:
             result = self.db.execute(stmt).all()
             return list(map(lambda row: row[0].toDict(), result))
@@ -93,27 +126,27 @@ class EndosonographyImageService:
             self.show_error_msg()
 
     def get_endosonography_image(self, id: int):
-        stmt = select(EndosonographyImage).where(EndosonographyImage.endosonography_image_id == id)
+        stmt = select(EndosonographyImage.file).where(EndosonographyImage.endosonography_image_id == id)
         try:
             result = self.db.execute(stmt).first()
             if result:
-                image = result[0].file
+                image = result[0]
                 pixmap = QtGui.QPixmap()
-                pixmap.loadFromData(image, 'jpeg')
+                pixmap.loadFromData(image)
                 return pixmap
         except OperationalError as e:
             self.show_error_msg()
 
     def get_endosonography_images_for_visit(self, visit_id: int):
         try:
-            stmt = select(EndosonographyImage).where(EndosonographyImage.visit_id == visit_id)
+            stmt = select(EndosonographyImage.file).where(EndosonographyImage.visit_id == visit_id).order_by(EndosonographyImage.endosonography_image_id)
             results = self.db.execute(stmt).all()
             pixmaps = []
             if results:
                 for endoscopy_file in results:
-                    image = endoscopy_file[0].file
+                    image = endoscopy_file[0]
                     pixmap = QtGui.QPixmap()
-                    pixmap.loadFromData(image, 'jpeg')
+                    pixmap.loadFromData(image)
                     pixmaps.append(pixmap)
             return pixmaps
         except OperationalError as e:
@@ -185,68 +218,107 @@ class EndosonographyVideoService:
         finally:
             conn.close()
 
-    def save_video_for_visit(self, visit_id: int, video_file_path: str):
+    def save_video_for_visit(self, visit_id: int, video_file_path: str, progress=None, cancelled=None):
+        """
+        Stream a video file into a new large object in chunks of config.video_chunk_size bytes, the file
+        is never read into memory as a whole.
+        :param progress: called with the number of bytes written after every chunk
+        :param cancelled: called before every chunk, the upload is rolled back if it returns True
+        :return: OID of the large object, None if the upload was cancelled
+        """
         conn = self.db_engine.raw_connection()
         try:
             with open(video_file_path, 'rb') as f:
-                video_data = f.read()
-
-            with conn.cursor() as cursor:
                 # Sicherstellen, dass die Transaktion gestartet wird
                 conn.autocommit = False
 
-                cursor.execute("SELECT lo_create(0)")
-                oid = cursor.fetchone()[0]
+                with conn.cursor() as cursor:
+                    cursor.execute("SELECT lo_create(0)")
+                    oid = cursor.fetchone()[0]
                 print(f"Created Large Object with OID: {oid}")
 
                 lo = conn.lobject(oid, 'wb')
-                lo.write(video_data)
+                written = 0
+                while chunk := f.read(config.video_chunk_size):
+                    if cancelled is not None and cancelled():
+                        lo.close()
+                        # The large object is removed with the rollback
+                        conn.rollback()
+                        print(f"Upload of {video_file_path} cancelled")
+                        return None
+                    lo.write(chunk)
+                    written += len(chunk)
+                    if progress is not None:
+                        progress(written)
                 lo.close()
 
                 # Sicherstellen, dass die Transaktion abgeschlossen wird
                 conn.commit()
 
-                # Speichern der OID in der Datenbanktabelle
-                new_video = EndosonographyVideo(visit_id=visit_id, video_oid=oid)
-                self.db.add(new_video)
-                self.db.commit()
-                print(f"Saved video for visit_id: {visit_id} with OID: {oid}")
+            # Speichern der OID in der Datenbanktabelle
+            new_video = EndosonographyVideo(visit_id=visit_id, video_oid=oid)
+            self.db.add(new_video)
+            self.db.commit()
+            print(f"Saved video for visit_id: {visit_id} with OID: {oid}")
+            return oid
         except Exception as e:
+            conn.rollback()
             self.db.rollback()
             print(f"Error saving video: {e}")
             raise e
         finally:
             conn.close()
 
-    def get_endosonography_videos_for_visit(self, visit_id: int):
+    def get_video_sizes(self, oids: list[int]) -> list[int]:
+        """Size in bytes of the large objects of the videos"""
         conn = self.db_engine.raw_connection()
         try:
-            stmt = select(EndosonographyVideo).where(EndosonographyVideo.visit_id == visit_id)
-            results = self.db.execute(stmt).scalars().all()
-            print(f"results: {results}")
-            videos = []
-            if results:
-                with conn.cursor() as cursor:
-                    for video_record in results:
-                        oid = video_record.video_oid
-                        print(f"Fetching video with OID: {oid}")
-                        try:
-                            lo = conn.lobject(oid, 'rb')
-                            video_data = lo.read()
-                            lo.close()
-                            videos.append(video_data)
-                        except psycopg2.Error as e:
-                            print(f"Error fetching Large Object with OID {oid}: {e}")
-                            continue
-            else:
-                ShowMessage.no_data_to_download("videos")
-            return videos
-        except Exception as e:
-            print(f"Error: {e}")
-            self.show_error_msg()
-            return []
+            sizes = []
+            for oid in oids:
+                lo = conn.lobject(oid, 'rb')
+                lo.seek(0, 2)
+                sizes.append(lo.tell())
+                lo.close()
+            conn.commit()
+            return sizes
+        finally:
+            conn.close()
+
+    def download_video(self, oid: int, destination_path: str, progress=None, cancelled=None) -> bool:
+        """
+        Stream a large object into a file in chunks of config.video_chunk_size bytes, the video is never
+        held in memory as a whole.
+        :param progress: called with the number of bytes read after every chunk
+        :param cancelled: called before every chunk, the incomplete file is removed if it returns True
+        :return: False if the download was cancelled
+        """
+        conn = self.db_engine.raw_connection()
+        completed = False
+        try:
+            lo = conn.lobject(oid, 'rb')
+            try:
+                with open(destination_path, 'wb') as f:
+                    read = 0
+                    while True:
+                        if cancelled is not None and cancelled():
+                            print(f"Download of Large Object with OID {oid} cancelled")
+                            return False
+                        chunk = lo.read(config.video_chunk_size)
+                        if not chunk:
+                            break
+                        f.write(chunk)
+                        read += len(chunk)
+                        if progress is not None:
+                            progress(read)
+                completed = True
+                return True
+            finally:
+                lo.close()
+                conn.commit()
         finally:
             conn.close()
+            if not completed and os.path.exists(destination_path):
+                os.remove(destination_path)
 
     def show_error_msg(self):
         msg = QMessageBox()
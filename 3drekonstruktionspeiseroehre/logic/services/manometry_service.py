@@ -1,8 +1,11 @@
+import pickle
+
 from PyQt6.QtWidgets import QMessageBox
 from sqlalchemy import select, delete, update, insert
 from sqlalchemy.exc import OperationalError
 from sqlalchemy.orm import Session
 from logic.database.data_declarative_models import Manometry, ManometryFile
+from logic.database.array_storage import decode_array
 
 
 class ManometryService:
@@ -100,6 +103,44 @@ class ManometryFileService:
         except OperationalError as e:
             self.show_error_msg()
 
+    def get_pressure_matrix_for_visit(self, visit_id: int):
+        """
+        Loads only the pressure matrix of a visit (not the CSV file).
+        Returns a read-only (sensors x measurements) array or None.
+        """
+        stmt = select(
+            ManometryFile.pressure_data,
+            ManometryFile.pressure_dtype,
+            ManometryFile.pressure_rows,
+            ManometryFile.pressure_columns,
+        ).where(ManometryFile.visit_id == visit_id)
+        try:
+            row = self.db.execute(stmt).first()
+            if row is None:
+                return None
+            if row.pressure_data is not None:
+                return decode_array(row.pressure_data, row.pressure_dtype, (row.pressure_rows, row.pressure_columns))
+            # Row not migrated yet: fall back to the pickled matrix
+            legacy = self.db.execute(
+                select(ManometryFile.pressure_matrix).where(ManometryFile.visit_id == visit_id)
+            ).scalar()
+            return pickle.loads(legacy) if legacy is not None else None
+        except OperationalError as e:
+            self.show_error_msg()
+
+    @staticmethod
+    def pressure_matrix_of(manometry_file: ManometryFile):
+        """Pressure matrix of a loaded ManometryFile, typed columns or (not migrated) pickled matrix."""
+        if manometry_file.pressure_data is not None:
+            return decode_array(
+                manometry_file.pressure_data,
+                manometry_file.pressure_dtype,
+                (manometry_file.pressure_rows, manometry_file.pressure_columns),
+            )
+        if manometry_file.pressure_matrix is not None:
+            return pickle.loads(manometry_file.pressure_matrix)
+        return None
+
     def delete_manometry_file_for_visit(self, visit_id: int):
         stmt = delete(ManometryFile).where(ManometryFile.visit_id == visit_id)
         try:
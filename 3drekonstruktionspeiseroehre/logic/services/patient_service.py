@@ -1,9 +1,12 @@
 from PyQt6.QtWidgets import QMessageBox
-from sqlalchemy import select, delete, update, insert
+from sqlalchemy import select, delete, update, insert, func
 from sqlalchemy.orm import Session
 from logic.database.data_declarative_models import Patient
 from sqlalchemy.exc import OperationalError
 
+# Columns of the patient table filter that match as prefix (see get_patients_page)
+PREFIX_FILTER_COLUMNS = ("patient_id", "center")
+
 
 class PatientService:
 
@@ -57,6 +60,48 @@ class PatientService:
         except OperationalError as e:
             self.show_error_msg()
 
+    def get_patients_page(self, filters: dict, order_by: str = "patient_id", descending: bool = False,
+                          offset: int = 0, limit: int = 100) -> list[dict]:
+        """
+        One page of the patients matching the filters, sorted by a column and the patient ID (for a stable
+        order between the pages).
+        :param filters: column -> value, patient_id and center match as prefix, the other columns exactly
+        """
+        sort_column = getattr(Patient, order_by)
+        stmt = (
+            self._filter(select(Patient), filters)
+            .order_by(sort_column.desc() if descending else sort_column.asc(), Patient.patient_id)
+            .offset(offset)
+            .limit(limit)
+        )
+        try:
+            result = self.db.execute(stmt).all()
+            return list(map(lambda row: row[0].toDict(), result))
+        except OperationalError as e:
+            self.show_error_msg()
+
+    def get_patient_ids_with_prefix(self, prefix: str, limit: int) -> list[str]:
+        # Case-insensitive like the completer, lower() on both sides uses ix_patients_patient_id_lower_pattern
+        stmt = (
+            select(Patient.patient_id)
+            .where(func.lower(Patient.patient_id).startswith(prefix.lower(), autoescape=True))
+            .order_by(Patient.patient_id)
+            .limit(limit)
+        )
+        try:
+            return list(self.db.execute(stmt).scalars().all())
+        except OperationalError as e:
+            self.show_error_msg()
+
+    @staticmethod
+    def _filter(stmt, filters: dict):
+        for column, value in filters.items():
+            if column in PREFIX_FILTER_COLUMNS:
+                stmt = stmt.where(getattr(Patient, column).startswith(value, autoescape=True))
+            else:
+                stmt = stmt.where(getattr(Patient, column) == value)
+        return stmt
+
     def show_error_msg(self):
         msg = QMessageBox()
         msg.setIcon(QMessageBox.Icon.Critical)
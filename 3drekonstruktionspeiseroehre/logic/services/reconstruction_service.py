@@ -1,8 +1,19 @@
 from PyQt6 import QtGui
 from PyQt6.QtWidgets import QMessageBox
-from sqlalchemy import select, delete, update, insert
-from sqlalchemy.orm import Session
-from logic.database.data_declarative_models import Reconstruction
+from sqlalchemy import select, delete, update, insert, func, String, cast, literal
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+from sqlalchemy.orm import Session, undefer
+from logic.database.data_declarative_models import (
+    BariumSwallow,
+    EndoflipFile,
+    EndoscopyFile,
+    Manometry,
+    ManometryFile,
+    Patient,
+    PreviousTherapy,
+    Reconstruction,
+    Visit,
+)
 from sqlalchemy.exc import OperationalError
 
 
@@ -70,13 +81,70 @@ class ReconstructionService:
             self.show_error_msg()
 
     def get_all_reconstructions(self) -> list[Reconstruction, None]:
-        stmt = select(Reconstruction)
+        stmt = select(Reconstruction).options(undefer(Reconstruction.reconstruction_file))
         try:
             result = self.db.execute(stmt).all()
             return list(map(lambda row: row[0].toDict(), result))
         except OperationalError as e:
             self.show_error_msg()
 
+    def count_reconstructions(self) -> int:
+        stmt = select(func.count(Reconstruction.reconstruction_id))
+        try:
+            return self.db.execute(stmt).scalar_one()
+        except OperationalError as e:
+            self.show_error_msg()
+            return 0
+
+    def iter_reconstruction_hashes(self, batch_size: int = 100):
+        """
+        Yields (reconstruction_id, visit_id, content_hash) tuples. The hash is computed by the database, so the
+        files are not transferred. It covers the reconstruction (the content_hash stored with the reconstruction
+        images or, for reconstructions not converted yet, the MD5 hash of the pickled reconstruction file) and
+        the other data the export reads: patient, visits of the patient, previous therapies, manometry and its
+        pressure matrix, barium swallow, endoscopy positions and EndoFLIP files.
+        An OperationalError is raised to the caller, a partial list must not be taken for all reconstructions.
+        """
+        visit = select(Visit).where(Visit.visit_id == Reconstruction.visit_id).subquery()
+        inputs = [
+            func.coalesce(Reconstruction.content_hash, func.md5(Reconstruction.reconstruction_file, type_=String)),
+            _rows_hash(Patient, Patient.patient_id == visit.c.patient_id, Patient.patient_id),
+            _rows_hash(Visit, Visit.patient_id == visit.c.patient_id, Visit.visit_id),
+            _rows_hash(PreviousTherapy, PreviousTherapy.patient_id == visit.c.patient_id, PreviousTherapy.previous_therapy_id),
+            _rows_hash(Manometry, Manometry.visit_id == Reconstruction.visit_id, Manometry.manometry_id),
+            _rows_hash(BariumSwallow, BariumSwallow.visit_id == Reconstruction.visit_id, BariumSwallow.tbe_id),
+            _rows_hash(
+                ManometryFile,
+                ManometryFile.visit_id == Reconstruction.visit_id,
+                ManometryFile.manometry_file_id,
+                [func.md5(func.coalesce(ManometryFile.pressure_data, ManometryFile.pressure_matrix))],
+            ),
+            _rows_hash(
+                EndoscopyFile,
+                EndoscopyFile.visit_id == Reconstruction.visit_id,
+                EndoscopyFile.egd_file_id,
+                [EndoscopyFile.image_position],
+            ),
+            _rows_hash(
+                EndoflipFile,
+                EndoflipFile.visit_id == Reconstruction.visit_id,
+                EndoflipFile.endoflip_file_id,
+                [EndoflipFile.timepoint, func.md5(EndoflipFile.file)],
+            ),
+        ]
+        stmt = (
+            select(
+                Reconstruction.reconstruction_id,
+                Reconstruction.visit_id,
+                func.md5(func.concat_ws("|", *[func.coalesce(value, "") for value in inputs]), type_=String).label(
+                    "content_hash"
+                ),
+            )
+            .join(visit, visit.c.visit_id == Reconstruction.visit_id)
+            .order_by(Reconstruction.reconstruction_id)
+        )
+        for row in self.db.execute(stmt.execution_options(yield_per=batch_size)):
+            yield row.reconstruction_id, row.visit_id, row.content_hash
 
     def show_error_msg(self):
         msg = QMessageBox()
@@ -85,3 +153,18 @@ class ReconstructionService:
         msg.setText("An error occurred.")
         msg.setInformativeText("Please check the connection to the database.")
         msg.exec()
+
+
+def _rows_hash(model, condition, order_column, columns=None):
+    """
+    MD5 hash of the rows of model matching condition, computed by the database (a correlated subquery).
+    :param columns: hashed columns, all columns of the model if None
+    """
+    if columns is None:
+        columns = [getattr(model, column.key) for column in model.__table__.columns]
+    row = func.concat_ws(",", *[func.coalesce(cast(column, String), "") for column in columns])
+    return (
+        select(func.md5(func.string_agg(row, aggregate_order_by(literal(";"), order_column)), type_=String))
+        .where(condition)
+        .scalar_subquery()
+    )
@@ -0,0 +1,460 @@
+import hashlib
+import json
+import pickle
+from io import BytesIO
+from typing import List, Optional
+
+import numpy as np
+from PyQt6.QtWidgets import QMessageBox
+from sqlalchemy import select, delete, update, insert
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+from logic.database.array_storage import decode_array, decode_array_dict, encode_array, encode_array_dict
+from logic.database.data_declarative_models import (
+    BariumSwallowFile,
+    EndoflipFile,
+    EndoscopyFile,
+    Reconstruction,
+    ReconstructionImage,
+)
+from logic.figure_creator.figure_creator_with_endoscopy import FigureCreatorWithEndoscopy
+from logic.figure_creator.stored_figure_creator import StoredFigureCreator
+from logic.services.manometry_service import ManometryFileService
+from logic.visit_data import VisitData
+from logic.visualization_data import VisualizationData
+
+# Attributes of VisualizationData stored as JSON in ReconstructionImage.parameters
+PARAMETER_ATTRIBUTES = (
+    "xray_filename",
+    "xray_minute",
+    "xray_image_height",
+    "xray_image_width",
+    "endoscopy_image_positions_cm",
+    "first_sensor_pos",
+    "first_sensor_index",
+    "second_sensor_pos",
+    "second_sensor_index",
+    "endoscopy_start_pos",
+    "sphincter_upper_pos",
+    "esophagus_exit_pos",
+    "endoflip_pos",
+    "esophageal_pressurization_index",
+    "use_model",
+    "offset_top",
+    "tubular_length_cm",
+    "sphincter_length_cm",
+    "esophagus_len",
+    "hrm_lower_ues_rel_y",
+    "hrm_upper_les_rel_y",
+    "hrm_lower_les_rel_y",
+    "hrm_rect_rel_x1",
+    "hrm_rect_rel_x2",
+)
+# Attributes of VisualizationData stored as arrays in ReconstructionImage.annotations
+ANNOTATION_ATTRIBUTES = ("xray_polygon", "xray_mask", "center_path", "sensor_path", "widths", "slopes", "endoscopy_polygons")
+ENDOFLIP_KEY_SEPARATOR = "|"
+
+
+class ReconstructionStorageService:
+    """
+    Stores reconstructions decomposed into a header row (reconstructions) and one row per barium
+    swallow image (reconstruction_images) with the parameters, annotations, geometry, surface colors
+    and metrics in separate columns. Images, pressure matrix, endoscopy and EndoFLIP data are not
+    copied, they are loaded from their tables. Reconstructions saved as one pickled VisitData
+    (reconstruction_file) are still read until the migration has converted them.
+    """
+
+    def __init__(self, db_session: Session):
+        self.db = db_session
+
+    def save_visit_data(self, visit_id: int, visit_data: VisitData):
+        """
+        Save the reconstruction of a visit, an existing reconstruction of the visit is replaced.
+        Returns the reconstruction_id.
+        """
+        try:
+            reconstruction_id = self.db.execute(
+                select(Reconstruction.reconstruction_id).where(Reconstruction.visit_id == visit_id)
+            ).scalar()
+            if reconstruction_id is None:
+                reconstruction_id = self.db.execute(
+                    insert(Reconstruction).values(visit_id=visit_id).returning(Reconstruction.reconstruction_id)
+                ).scalar_one()
+            self._write_images(reconstruction_id, visit_id, visit_data, clear_legacy_file=True)
+            self.db.commit()
+            return reconstruction_id
+        except OperationalError as e:
+            self.db.rollback()
+            self.show_error_msg()
+
+    def convert_legacy_reconstruction(self, reconstruction_id: int) -> bool:
+        """
+        Convert a pickled reconstruction to the decomposed storage (used by the migration). The pickle is
+        kept, it is removed by clear_verified_legacy_reconstruction once the converted rows are verified.
+        """
+        row = self.db.execute(
+            select(Reconstruction.visit_id, Reconstruction.reconstruction_file).where(
+                Reconstruction.reconstruction_id == reconstruction_id
+            )
+        ).first()
+        if row is None or row.reconstruction_file is None:
+            return False
+        visit_data = pickle.loads(row.reconstruction_file)
+        if not isinstance(visit_data, VisitData):
+            return False
+        self._write_images(reconstruction_id, row.visit_id, visit_data, clear_legacy_file=False)
+        self.db.commit()
+        return True
+
+    def verify_converted_reconstruction(self, reconstruction_id: int) -> bool:
+        """
+        Check that the image rows of a converted reconstruction can be loaded and contain the same
+        surface colors and metrics as its pickle.
+        """
+        legacy_visit_data = self._load_legacy_visit_data(reconstruction_id)
+        images = self.db.execute(
+            select(ReconstructionImage)
+            .where(ReconstructionImage.reconstruction_id == reconstruction_id)
+            .order_by(ReconstructionImage.image_index)
+        ).scalars().all()
+        if legacy_visit_data is None or len(images) != legacy_visit_data.number_of_visualizations():
+            return False
+        for image, expected in zip(images, legacy_visit_data.visualization_data_list):
+            loaded = self._restore_visualization_data(image)
+            if expected.figure_creator is None:
+                continue
+            if loaded.figure_creator is None:
+                return False
+            # The surface colors are stored as float32
+            if not np.allclose(
+                loaded.figure_creator.get_surfacecolor_list(),
+                np.asarray(expected.figure_creator.get_surfacecolor_list(), dtype=np.float32),
+                equal_nan=True,
+            ):
+                return False
+            if not _same_values(loaded.figure_creator.get_metrics(), expected.figure_creator.get_metrics()):
+                return False
+        return True
+
+    def clear_verified_legacy_reconstruction(self, reconstruction_id: int) -> bool:
+        """
+        Remove the pickle of a converted reconstruction if verify_converted_reconstruction succeeds.
+        Otherwise the image rows are removed, so the reconstruction is loaded from the pickle again.
+        """
+        try:
+            verified = self.verify_converted_reconstruction(reconstruction_id)
+        except (ValueError, KeyError, TypeError):
+            # Image rows that cannot be decoded
+            verified = False
+        if verified:
+            self.db.execute(
+                update(Reconstruction)
+                .where(Reconstruction.reconstruction_id == reconstruction_id)
+                .values(reconstruction_file=None)
+            )
+        else:
+            self.db.execute(delete(ReconstructionImage).where(ReconstructionImage.reconstruction_id == reconstruction_id))
+        self.db.commit()
+        return verified
+
+    def has_reconstruction(self, visit_id: int) -> bool:
+        stmt = select(Reconstruction.reconstruction_id).where(Reconstruction.visit_id == visit_id)
+        try:
+            return self.db.execute(stmt).first() is not None
+        except OperationalError as e:
+            self.show_error_msg()
+            return False
+
+    def load_visit_data(self, visit_id: int, include_files: bool = True) -> Optional[VisitData]:
+        """
+        Load the complete VisitData of a reconstruction.
+
+        Args:
+            visit_id: Visit of the reconstruction
+            include_files: Load the X-ray and endoscopy images and the EndoFLIP screenshot. Without them
+                the VisitData can be used for the metrics and exports, but not for new annotations.
+        """
+        try:
+            header = self.db.execute(
+                select(Reconstruction.reconstruction_id, Reconstruction.name).where(Reconstruction.visit_id == visit_id)
+            ).first()
+            if header is None:
+                return None
+            images = self.db.execute(
+                select(ReconstructionImage)
+                .where(ReconstructionImage.reconstruction_id == header.reconstruction_id)
+                .order_by(ReconstructionImage.image_index)
+            ).scalars().all()
+            if not images:
+                return self._load_legacy_visit_data(header.reconstruction_id)
+
+            pressure_matrix = ManometryFileService(self.db).get_pressure_matrix_for_visit(visit_id)
+            xray_files, endoscopy_files, endoflip_screenshot = {}, None, None
+            if include_files:
+                file_ids = [image.tbe_file_id for image in images if image.tbe_file_id is not None]
+                if file_ids:
+                    xray_files = dict(
+                        self.db.execute(
+                            select(BariumSwallowFile.tbe_file_id, BariumSwallowFile.file).where(
+                                BariumSwallowFile.tbe_file_id.in_(file_ids)
+                            )
+                        ).all()
+                    )
+                endoscopy_files = self.db.execute(
+                    select(EndoscopyFile.image_position, EndoscopyFile.file).where(EndoscopyFile.visit_id == visit_id)
+                ).all()
+                screenshot = self.db.execute(
+                    select(EndoflipFile.screenshot).where(EndoflipFile.visit_id == visit_id).limit(1)
+                ).scalar()
+                endoflip_screenshot = pickle.loads(screenshot) if screenshot is not None else None
+
+            visit_data = VisitData(header.name)
+            for image in images:
+                visualization_data = self._restore_visualization_data(image)
+                visualization_data.pressure_matrix = pressure_matrix
+                if image.tbe_file_id in xray_files:
+                    visualization_data.xray_file = BytesIO(xray_files[image.tbe_file_id])
+                if endoscopy_files:
+                    visualization_data.endoscopy_files = [BytesIO(file) for _, file in endoscopy_files]
+                    if visualization_data.endoscopy_image_positions_cm is None:
+                        visualization_data.endoscopy_image_positions_cm = [position for position, _ in endoscopy_files]
+                visualization_data.endoflip_screenshot = endoflip_screenshot
+                visit_data.add_visualization(visualization_data)
+            return visit_data
+        except OperationalError as e:
+            self.show_error_msg()
+
+    def load_geometry(self, visit_id: int) -> List[tuple]:
+        """(figure_x, figure_y, figure_z) per image as read-only arrays, without loading anything else."""
+        rows = self._image_columns(
+            visit_id,
+            ReconstructionImage.geometry,
+            ReconstructionImage.geometry_slices,
+            ReconstructionImage.geometry_angles,
+        )
+        if rows is None:
+            visit_data = self._load_legacy_visit_data_for_visit(visit_id)
+            return [(v.figure_x, v.figure_y, v.figure_z) for v in visit_data.visualization_data_list] if visit_data else []
+        return [tuple(decode_array(row.geometry, "float32", (3, row.geometry_slices, row.geometry_angles))) for row in rows]
+
+    def load_surface_colors(self, visit_id: int) -> List[np.ndarray]:
+        """Pressure per frame and slice (frames x slices) per image as read-only arrays."""
+        rows = self._image_columns(
+            visit_id,
+            ReconstructionImage.surface_colors,
+            ReconstructionImage.surface_frames,
+            ReconstructionImage.surface_slices,
+        )
+        if rows is None:
+            visit_data = self._load_legacy_visit_data_for_visit(visit_id)
+            return [v.figure_creator.get_surfacecolor_list() for v in visit_data.visualization_data_list] if visit_data else []
+        return [decode_array(row.surface_colors, "float32", (row.surface_frames, row.surface_slices)) for row in rows]
+
+    def load_metrics(self, visit_id: int) -> List[dict]:
+        """Metrics of the figure creator per image."""
+        rows = self._image_columns(visit_id, ReconstructionImage.metrics)
+        if rows is None:
+            visit_data = self._load_legacy_visit_data_for_visit(visit_id)
+            return [v.figure_creator.get_metrics() for v in visit_data.visualization_data_list] if visit_data else []
+        return [decode_array_dict(row.metrics) for row in rows]
+
+    def load_parameters(self, visit_id: int) -> List[dict]:
+        """Parameters (positions, minute of the image, HRM adjustment, ...) per image."""
+        rows = self._image_columns(visit_id, ReconstructionImage.parameters)
+        if rows is None:
+            visit_data = self._load_legacy_visit_data_for_visit(visit_id)
+            if not visit_data:
+                return []
+            return [
+                {name: _to_json(getattr(v, name, None)) for name in PARAMETER_ATTRIBUTES}
+                for v in visit_data.visualization_data_list
+            ]
+        return [row.parameters for row in rows]
+
+    def _image_columns(self, visit_id: int, *columns):
+        """Rows of the given columns of all images of a visit, None if the reconstruction is not converted yet."""
+        stmt = (
+            select(*columns)
+            .join(Reconstruction, Reconstruction.reconstruction_id == ReconstructionImage.reconstruction_id)
+            .where(Reconstruction.visit_id == visit_id)
+            .order_by(ReconstructionImage.image_index)
+        )
+        try:
+            rows = self.db.execute(stmt).all()
+            return rows or None
+        except OperationalError as e:
+            self.show_error_msg()
+            return []
+
+    def _load_legacy_visit_data_for_visit(self, visit_id: int) -> Optional[VisitData]:
+        reconstruction_id = self.db.execute(
+            select(Reconstruction.reconstruction_id).where(Reconstruction.visit_id == visit_id)
+        ).scalar()
+        return self._load_legacy_visit_data(reconstruction_id) if reconstruction_id is not None else None
+
+    def _load_legacy_visit_data(self, reconstruction_id: int) -> Optional[VisitData]:
+        reconstruction_file = self.db.execute(
+            select(Reconstruction.reconstruction_file).where(Reconstruction.reconstruction_id == reconstruction_id)
+        ).scalar()
+        if reconstruction_file is None:
+            return None
+        visit_data = pickle.loads(reconstruction_file)
+        return visit_data if isinstance(visit_data, VisitData) else None
+
+    def _write_images(self, reconstruction_id: int, visit_id: int, visit_data: VisitData, clear_legacy_file: bool):
+        """
+        Replace the image rows of a reconstruction and update its header (no commit).
+        clear_legacy_file removes the pickle of the reconstruction (only if visit_data replaces it).
+        """
+        barium_files = self.db.execute(
+            select(BariumSwallowFile.tbe_file_id, BariumSwallowFile.minute_of_picture)
+            .where(BariumSwallowFile.visit_id == visit_id)
+            .order_by(BariumSwallowFile.tbe_file_id)
+        ).all()
+
+        self.db.execute(delete(ReconstructionImage).where(ReconstructionImage.reconstruction_id == reconstruction_id))
+        content_hash = hashlib.md5()
+        used_file_ids = set()
+        for image_index, visualization_data in enumerate(visit_data.visualization_data_list):
+            values = self._decompose_visualization_data(visualization_data)
+            values["tbe_file_id"] = _match_barium_file(barium_files, visualization_data.xray_minute, image_index, used_file_ids)
+            for key in sorted(values):
+                value = values[key]
+                content_hash.update(value if isinstance(value, bytes) else json.dumps(value, sort_keys=True).encode("utf-8"))
+            self.db.execute(
+                insert(ReconstructionImage).values(reconstruction_id=reconstruction_id, image_index=image_index, **values)
+            )
+
+        header_values = dict(
+            name=visit_data.name,
+            image_count=visit_data.number_of_visualizations(),
+            content_hash=content_hash.hexdigest(),
+        )
+        if clear_legacy_file:
+            header_values["reconstruction_file"] = None
+        self.db.execute(
+            update(Reconstruction).where(Reconstruction.reconstruction_id == reconstruction_id).values(**header_values)
+        )
+
+    @staticmethod
+    def _decompose_visualization_data(visualization_data: VisualizationData) -> dict:
+        parameters = {name: _to_json(getattr(visualization_data, name, None)) for name in PARAMETER_ATTRIBUTES}
+        annotations = {name: getattr(visualization_data, name, None) for name in ANNOTATION_ATTRIBUTES}
+        values = {"parameters": parameters, "annotations": encode_array_dict(annotations)}
+
+        figure_x = getattr(visualization_data, "figure_x", None)
+        if figure_x is not None:
+            geometry, _, (_, slices, angles) = encode_array(
+                np.stack([figure_x, visualization_data.figure_y, visualization_data.figure_z])
+            )
+            values.update(geometry=geometry, geometry_slices=slices, geometry_angles=angles)
+
+        figure_creator = visualization_data.figure_creator
+        if figure_creator is not None:
+            surface_colors, _, (frames, slices) = encode_array(figure_creator.get_surfacecolor_list())
+            values.update(
+                surface_colors=surface_colors,
+                surface_frames=frames,
+                surface_slices=slices,
+                metrics=encode_array_dict(figure_creator.get_metrics()),
+            )
+            endoflip_surface_color = getattr(figure_creator, "endoflip_surface_color", None)
+            if endoflip_surface_color:
+                values["endoflip_colors"] = encode_array_dict(
+                    {
+                        f"{volume}{ENDOFLIP_KEY_SEPARATOR}{aggregation}": colors
+                        for volume, by_aggregation in endoflip_surface_color.items()
+                        for aggregation, colors in by_aggregation.items()
+                    }
+                )
+            parameters["figure_creator"] = {
+                "with_endoscopy": isinstance(figure_creator, FigureCreatorWithEndoscopy)
+                or getattr(figure_creator, "with_endoscopy", False),
+                "esophagus_length_cm": _to_json(figure_creator.get_esophagus_full_length_cm()),
+            }
+        return values
+
+    @staticmethod
+    def _restore_visualization_data(image: ReconstructionImage) -> VisualizationData:
+        visualization_data = VisualizationData()
+        parameters = dict(image.parameters)
+        figure_creator_parameters = parameters.pop("figure_creator", None)
+        for name, value in parameters.items():
+            if name.endswith("_pos") and isinstance(value, list):
+                value = tuple(value)
+            setattr(visualization_data, name, value)
+        for name, value in decode_array_dict(image.annotations).items():
+            setattr(visualization_data, name, value)
+
+        if image.geometry is not None:
+            # Writable copies, the GUI works on the arrays of a loaded reconstruction
+            geometry = decode_array(image.geometry, "float32", (3, image.geometry_slices, image.geometry_angles)).copy()
+            visualization_data.figure_x, visualization_data.figure_y, visualization_data.figure_z = geometry
+
+        if figure_creator_parameters is not None and image.surface_colors is not None:
+            endoflip_surface_color = None
+            if image.endoflip_colors is not None:
+                endoflip_surface_color = {}
+                for key, colors in decode_array_dict(image.endoflip_colors).items():
+                    volume, aggregation = key.split(ENDOFLIP_KEY_SEPARATOR, 1)
+                    endoflip_surface_color.setdefault(volume, {})[aggregation] = colors
+            visualization_data.figure_creator = StoredFigureCreator(
+                visualization_data,
+                decode_array(image.surface_colors, "float32", (image.surface_frames, image.surface_slices)).copy(),
+                decode_array_dict(image.metrics),
+                figure_creator_parameters["esophagus_length_cm"],
+                endoflip_surface_color,
+                figure_creator_parameters["with_endoscopy"],
+            )
+        return visualization_data
+
+    def show_error_msg(self):
+        msg = QMessageBox()
+        msg.setIcon(QMessageBox.Icon.Critical)
+        msg.setWindowTitle("Error")
+        msg.setText("An error occurred.")
+        msg.setInformativeText("Please check the connection to the database.")
+        msg.exec()
+
+
+def _to_json(value):
+    """Convert NumPy values, arrays and tuples to JSON types."""
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, (list, tuple)):
+        return [_to_json(item) for item in value]
+    if isinstance(value, dict):
+        return {str(key): _to_json(item) for key, item in value.items()}
+    return value
+
+
+def _same_values(loaded, expected) -> bool:
+    """Compare loaded values with the original ones, nested dictionaries are compared per key."""
+    if isinstance(expected, dict):
+        return (
+            isinstance(loaded, dict)
+            and set(loaded) == {str(key) for key in expected}
+            and all(_same_values(loaded[str(key)], item) for key, item in expected.items())
+        )
+    if expected is None or loaded is None:
+        return expected is None and loaded is None
+    try:
+        return bool(np.array_equal(np.asarray(loaded), np.asarray(expected), equal_nan=True))
+    except TypeError:
+        # equal_nan is not supported for non-numeric values
+        return bool(np.array_equal(np.asarray(loaded), np.asarray(expected)))
+
+
+def _match_barium_file(barium_files, xray_minute, image_index: int, used_file_ids: set):
+    """ID of the barium swallow file of an image: same minute, otherwise same position in the visit."""
+    for tbe_file_id, minute in barium_files:
+        if minute == xray_minute and tbe_file_id not in used_file_ids:
+            used_file_ids.add(tbe_file_id)
+            return tbe_file_id
+    if image_index < len(barium_files) and barium_files[image_index][0] not in used_file_ids:
+        used_file_ids.add(barium_files[image_index][0])
+        return barium_files[image_index][0]
+    return None
@@ -0,0 +1,110 @@
+import pickle
+from io import BytesIO
+
+from PyQt6.QtWidgets import QMessageBox
+from sqlalchemy import select
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session, joinedload, selectinload
+
+from logic.database.data_declarative_models import (
+    BariumSwallowFile,
+    EndoflipFile,
+    EndoscopyFile,
+    Reconstruction,
+    Visit,
+)
+from logic.services.manometry_service import ManometryFileService
+from logic.visualization_data import VisualizationData
+
+
+class VisitBundle:
+    """
+    Everything needed to start the reconstruction of a visit. Data shared by all images of the visit
+    (pressure matrix, EndoFLIP screenshot, endoscopy images) is deserialized once; the pressure matrix
+    is read-only, because the same array is used by every VisualizationData.
+    """
+
+    def __init__(self, visit: Visit):
+        self.visit = visit
+        self.patient = visit.patient
+        self.barium_swallow_files = list(visit.barium_swallow_files)
+        self.manometry_file = visit.manometry_file
+        self.has_reconstruction = visit.reconstruction is not None
+
+        self.pressure_matrix = None
+        if self.manometry_file is not None:
+            self.pressure_matrix = ManometryFileService.pressure_matrix_of(self.manometry_file)
+            if self.pressure_matrix is not None:
+                self.pressure_matrix.flags.writeable = False
+
+        self.endoscopy_image_positions_cm = [file.image_position for file in visit.endoscopy_files]
+        self.endoscopy_images = [file.file for file in visit.endoscopy_files]
+
+        # The app can only process one EndoFLIP screenshot, the first one is used
+        self.endoflip_screenshot = None
+        if visit.endoflip_files and visit.endoflip_files[0].screenshot is not None:
+            self.endoflip_screenshot = pickle.loads(visit.endoflip_files[0].screenshot)
+
+    @property
+    def name(self) -> str:
+        return (
+            f"[Visit_ID_{self.visit.visit_id}]_{self.patient.patient_id}_"
+            f"{self.visit.visit_type.replace(' ', '')}_{self.visit.year_of_visit}"
+        )
+
+    def create_visualization_data(self, use_model: bool = True) -> list[VisualizationData]:
+        """One VisualizationData per barium swallow image, all sharing the data of the visit."""
+        visualization_data_list = []
+        for barium_swallow_file in self.barium_swallow_files:
+            visualization_data = VisualizationData()
+            visualization_data.xray_minute = barium_swallow_file.minute_of_picture
+            visualization_data.xray_file = BytesIO(barium_swallow_file.file)
+            visualization_data.use_model = use_model
+            visualization_data.pressure_matrix = self.pressure_matrix
+            visualization_data.endoscopy_image_positions_cm = self.endoscopy_image_positions_cm
+            # Every VisualizationData gets its own file objects, the bytes are shared
+            visualization_data.endoscopy_files = [BytesIO(image) for image in self.endoscopy_images]
+            visualization_data.endoflip_screenshot = self.endoflip_screenshot
+            visualization_data_list.append(visualization_data)
+        return visualization_data_list
+
+
+class VisitBundleService:
+
+    def __init__(self, db_session: Session):
+        self.db = db_session
+
+    def get_visit_bundle(self, visit_id: int):
+        """
+        Load the visit with patient, manometry file and reconstruction header in one query and the
+        barium swallow, endoscopy and EndoFLIP files with one batched query per table.
+        """
+        stmt = (
+            select(Visit)
+            .where(Visit.visit_id == visit_id)
+            .options(
+                joinedload(Visit.patient),
+                joinedload(Visit.manometry_file).undefer_group("pressure"),
+                joinedload(Visit.reconstruction).load_only(Reconstruction.reconstruction_id),
+                selectinload(Visit.barium_swallow_files).undefer(BariumSwallowFile.file),
+                selectinload(Visit.endoscopy_files).undefer(EndoscopyFile.file),
+                selectinload(Visit.endoflip_files).undefer(EndoflipFile.screenshot),
+            )
+            # Objects already in the session get the relationships and deferred columns, too
+            .execution_options(populate_existing=True)
+        )
+        try:
+            visit = self.db.execute(stmt).unique().scalar_one_or_none()
+            if visit is None:
+                return None
+            return VisitBundle(visit)
+        except OperationalError as e:
+            self.show_error_msg()
+
+    def show_error_msg(self):
+        msg = QMessageBox()
+        msg.setIcon(QMessageBox.Icon.Critical)
+        msg.setWindowTitle("Error")
+        msg.setText("An error occurred.")
+        msg.setInformativeText("Please check the connection to the database.")
+        msg.exec()
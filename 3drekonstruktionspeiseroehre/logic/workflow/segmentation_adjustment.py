@@ -15,7 +15,7 @@ from logic.services.barium_swallow_service import BariumSwallowFileService
 from logic.services.manometry_service import ManometryFileService
 from logic.services.endoscopy_service import EndoscopyFileService
 from logic.services.endoflip_service import EndoflipFileService
-from logic.services.reconstruction_service import ReconstructionService
+from logic.services.reconstruction_storage_service import ReconstructionStorageService
 from logic.visit_data import VisitData
 from logic.patient_data import PatientData
 
@@ -28,22 +28,12 @@ def _build_visit_name(visit_model: VisitModel, patient_id: str) -> str:
 
 def load_visitdata_from_db(db_session: Session, visit_id: int) -> Optional[VisitData]:
     """
-    Load and unpickle the VisitData for a given visit from the reconstructions table.
+    Load the VisitData for a given visit from the reconstruction tables.
 
-    Returns None if no reconstruction exists or if unpickling fails.
+    Returns None if no reconstruction exists or if loading fails.
     """
     try:
-        service = ReconstructionService(db_session)
-        reconstruction = service.get_reconstruction_for_visit(visit_id)
-        if not reconstruction:
-            return None
-
-        import pickle
-
-        visit_data = pickle.loads(reconstruction.reconstruction_file)
-        if isinstance(visit_data, VisitData):
-            return visit_data
-        return None
+        return ReconstructionStorageService(db_session).load_visit_data(visit_id)
     except Exception:
         return None
 
@@ -161,10 +151,8 @@ def start_xray_adjustment(master_window: MasterWindow, db_session: Session, visi
 
             # Pressure matrix
             if getattr(viz, "pressure_matrix", None) is None and manometry_file is not None:
-                import pickle as _pkl
-
                 try:
-                    viz.pressure_matrix = _pkl.loads(manometry_file.pressure_matrix)
+                    viz.pressure_matrix = ManometryFileService.pressure_matrix_of(manometry_file)
                 except Exception:
                     pass
 
@@ -259,10 +247,8 @@ def start_hrm_adjustment(master_window: MasterWindow, db_session: Session, visit
 
             # Pressure matrix
             if getattr(viz, "pressure_matrix", None) is None and manometry_file is not None:
-                import pickle as _pkl
-
                 try:
-                    viz.pressure_matrix = _pkl.loads(manometry_file.pressure_matrix)
+                    viz.pressure_matrix = ManometryFileService.pressure_matrix_of(manometry_file)
                 except Exception:
                     pass
 
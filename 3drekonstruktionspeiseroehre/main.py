@@ -1,8 +1,11 @@
+import logging
 import sys
+import config
 from utils.path_utils import resource_path
 
 from gui.master_window import MasterWindow
 from logic.database.database import create_db_and_tables_local_declarative
+from logic.datainput.thumbnail_generation import start_thumbnail_generation
 from PyQt6.QtWidgets import QApplication
 from PyQt6.QtGui import QIcon
 from gui.data_window import DataWindow
@@ -11,6 +14,7 @@ import multiprocessing
 if __name__ == "__main__":
     multiprocessing.freeze_support()
     multiprocessing.set_start_method("spawn")
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
     app = QApplication(sys.argv)
 
     # Set the application icon
@@ -24,6 +28,9 @@ if __name__ == "__main__":
     data_window = DataWindow(master_window)
     master_window.switch_to(data_window)
     create_db_and_tables_local_declarative()
+    if config.thumbnail_backfill_on_start:
+        # thumbnails of images stored before (or whose generation was interrupted)
+        start_thumbnail_generation()
     try:
         # close the splash screen if running as pyinstaller-exe
         import pyi_splash  # type: ignore
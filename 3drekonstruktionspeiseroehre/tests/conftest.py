@@ -0,0 +1,20 @@
+import os
+import sys
+
+# The modules of the application are imported relative to the application directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+import pytest
+
+from logic.dataoutput.ring_mesh import synthetic_visualization_data
+
+N_SLICES = 60
+N_ANGLES = 20
+N_FRAMES = 30
+
+
+@pytest.fixture
+def visualization_data():
+    """VisualizationData of a synthetic reconstruction with the metrics calculated by FigureCreator"""
+    return synthetic_visualization_data(N_SLICES, N_ANGLES, N_FRAMES)
@@ -0,0 +1,103 @@
+import h5py
+import numpy as np
+import pytest
+
+from logic.dataoutput import vtkhdf_exporter
+
+from logic.dataoutput.export_profiles import (
+    QUANTIZED_SUFFIX,
+    decode_pressure,
+    get_export_profile,
+    get_pressure_array,
+    verify_pressure_arrays,
+    write_pressure_arrays,
+)
+
+
+def write_profile(path, profile_name, pressure):
+    with h5py.File(path, "w") as f:
+        f.create_group("VTKHDF")
+    write_pressure_arrays(
+        str(path), {"pressure_frame_000": pressure}, {"pressure_slice_matrix_flat": pressure}, get_export_profile(profile_name)
+    )
+
+
+def test_quantized_arrays_are_not_named_as_pressures(tmp_path):
+    pressure = np.linspace(-20, 180, 500, dtype=np.float32)
+    path = tmp_path / "compact.vtkhdf"
+    write_profile(path, "compact", pressure)
+
+    with h5py.File(path, "r") as f:
+        for group in ("PointData", "FieldData"):
+            names = list(f["VTKHDF"][group].keys())
+            assert all(name.endswith(QUANTIZED_SUFFIX) for name in names)
+            assert all(f["VTKHDF"][group][name].attrs["units"] == "quantized" for name in names)
+
+
+def test_float_arrays_keep_their_names(tmp_path):
+    pressure = np.linspace(-20, 180, 500, dtype=np.float32)
+    path = tmp_path / "default.vtkhdf"
+    write_profile(path, "lossless", pressure)
+
+    with h5py.File(path, "r") as f:
+        dataset = f["VTKHDF/PointData/pressure_frame_000"]
+        assert dataset.dtype == np.float32
+        assert dataset.attrs["units"] == "mmHg"
+        assert get_pressure_array(f["VTKHDF/PointData"], "pressure_frame_000") == dataset
+
+
+def test_quantized_arrays_are_decoded(tmp_path):
+    pressure = np.linspace(-20, 180, 500, dtype=np.float32)
+    path = tmp_path / "compact.vtkhdf"
+    write_profile(path, "compact", pressure)
+
+    with h5py.File(path, "r") as f:
+        dataset = get_pressure_array(f["VTKHDF/PointData"], "pressure_frame_000")
+        np.testing.assert_allclose(decode_pressure(dataset[()], dataset.attrs), pressure, atol=0.05)
+
+
+def test_written_arrays_are_verified(tmp_path):
+    pressure = np.linspace(-20, 180, 500, dtype=np.float32)
+    for profile_name in ("lossless", "compact", "fast_write"):
+        path = tmp_path / f"{profile_name}.vtkhdf"
+        write_profile(path, profile_name, pressure)
+        verify_pressure_arrays(
+            str(path), {"pressure_frame_000": pressure}, {"pressure_slice_matrix_flat": pressure}
+        )
+
+
+def test_broken_arrays_are_detected(tmp_path):
+    pressure = np.linspace(-20, 180, 500, dtype=np.float32)
+    path = tmp_path / "compact.vtkhdf"
+    write_profile(path, "compact", pressure)
+    with h5py.File(path, "a") as f:
+        f["VTKHDF/PointData/pressure_frame_000" + QUANTIZED_SUFFIX].attrs["scale_factor"] = 0.2
+
+    with pytest.raises(ValueError):
+        verify_pressure_arrays(str(path), {"pressure_frame_000": pressure}, {})
+    with pytest.raises(ValueError):
+        verify_pressure_arrays(str(path), {"pressure_frame_001": pressure}, {})
+
+
+def export(visualization_data, file_path, profile_name):
+    exporter = vtkhdf_exporter.VTKHDFExporter(pressure_export_mode="per_vertex", export_profile=profile_name)
+    return exporter._export_single_reconstruction(visualization_data, str(file_path), {}, "visit", 0)
+
+
+@pytest.mark.parametrize("profile_name", ["lossless", "compact", "fast_write"])
+def test_exported_file_is_verified(visualization_data, tmp_path, profile_name):
+    file_path = tmp_path / "reconstruction.vtkhdf"
+
+    assert export(visualization_data, file_path, profile_name)
+    with h5py.File(file_path, "r") as f:
+        assert get_pressure_array(f["VTKHDF/PointData"], "pressure_frame_000") is not None
+
+
+def test_broken_pressure_write_fails_the_export(visualization_data, tmp_path, monkeypatch):
+    def write_shifted_pressure_arrays(file_path, point_arrays, field_arrays, profile):
+        shifted = {name: np.asarray(values) + 1 for name, values in point_arrays.items()}
+        write_pressure_arrays(file_path, shifted, field_arrays, profile)
+
+    monkeypatch.setattr(vtkhdf_exporter, "write_pressure_arrays", write_shifted_pressure_arrays)
+
+    assert not export(visualization_data, tmp_path / "reconstruction.vtkhdf", "compact")
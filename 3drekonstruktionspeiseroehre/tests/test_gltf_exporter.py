@@ -0,0 +1,28 @@
+import numpy as np
+
+from conftest import N_FRAMES, N_SLICES
+from logic.dataoutput.gltf_exporter import GltfExportWorker, read_glb, read_html_figure
+
+
+def test_worker_exports_readable_files(visualization_data, tmp_path):
+    file_paths = [str(tmp_path / f"reconstruction_{i}.glb") for i in range(2)]
+    worker = GltfExportWorker([(visualization_data, file_path) for file_path in file_paths])
+    progress, finished = [], []
+    worker.signals.progress_value.connect(progress.append)
+    worker.signals.finished.connect(finished.append)
+
+    worker.run()
+
+    assert finished == [file_paths]
+    assert progress == [50, 100]
+    assert read_glb(file_paths[0])["pressure_frames"].shape == (N_FRAMES, N_SLICES)
+
+
+def test_html_figure_is_read(visualization_data, tmp_path):
+    file_path = str(tmp_path / "figure.html")
+    visualization_data.figure_creator.get_figure().write_html(file_path)
+
+    trace = read_html_figure(file_path)["traces"][0]
+
+    np.testing.assert_allclose(trace["x"], visualization_data.figure_x)
+    np.testing.assert_allclose(trace["z"], visualization_data.figure_z)
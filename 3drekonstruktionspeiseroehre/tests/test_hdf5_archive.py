@@ -0,0 +1,24 @@
+import shutil
+
+import numpy as np
+
+from logic.dataoutput.hdf5_archive import ReconstructionArchive, ReconstructionArchiveWriter
+from logic.dataoutput.vtkhdf_exporter import VTKHDFExporter
+
+
+def test_readded_reconstruction_replaces_its_index_row(visualization_data, tmp_path):
+    first = tmp_path / "visit_1.vtkhdf"
+    assert VTKHDFExporter()._export_single_reconstruction(visualization_data, str(first), {}, "visit", 0)
+    second = tmp_path / "visit_2.vtkhdf"
+    shutil.copy(first, second)
+
+    with ReconstructionArchiveWriter(str(tmp_path / "archive.h5")) as archive:
+        for path, visit_id in ((first, 1), (second, 2), (first, 3)):
+            assert archive.add(str(path), {"visit_id": visit_id})
+
+    with ReconstructionArchive(str(tmp_path / "archive.h5")) as archive:
+        index = archive.index
+        assert [group.decode() for group in index["group"]] == ["visit_2", "visit_1"]
+        assert index["visit_id"].tolist() == [2, 3]
+        np.testing.assert_array_equal(index["vertex_offset"], [0, index["n_vertices"][0]])
+        np.testing.assert_array_equal(index["cell_offset"], [0, index["n_cells"][0]])
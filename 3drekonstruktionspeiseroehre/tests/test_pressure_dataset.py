@@ -0,0 +1,42 @@
+import logging
+
+import h5py
+import pytest
+
+from conftest import N_FRAMES
+from logic.dataoutput.pressure_dataset import PressureDatasetReader
+from logic.dataoutput.vtkhdf_exporter import VTKHDFExporter
+
+
+def export(visualization_data, file_path):
+    exporter = VTKHDFExporter(pressure_export_mode="per_vertex_dataset")
+    return exporter._export_single_reconstruction(visualization_data, str(file_path), {}, "visit", 0)
+
+
+def test_pressure_dataset_is_written(visualization_data, tmp_path):
+    file_path = tmp_path / "reconstruction.vtkhdf"
+
+    assert export(visualization_data, file_path)
+    with PressureDatasetReader(str(file_path)) as reader:
+        assert reader.n_frames == N_FRAMES
+
+
+def test_missing_surface_colors_are_logged(visualization_data, tmp_path, caplog):
+    # Without figure creator the exporter tries to rebuild it, which fails without the X-ray data
+    visualization_data.figure_creator = None
+    file_path = tmp_path / "reconstruction.vtkhdf"
+
+    with caplog.at_level(logging.WARNING):
+        assert not export(visualization_data, file_path)
+    assert "pressure dataset" in caplog.text
+
+
+def test_reader_closes_file_without_dataset(tmp_path):
+    file_path = tmp_path / "empty.vtkhdf"
+    h5py.File(file_path, "w").close()
+
+    # The traceback keeps the reader alive, the file must be closed before the error is raised
+    with pytest.raises(KeyError) as error_info:
+        PressureDatasetReader(str(file_path))
+    assert h5py.h5f.get_obj_count(h5py.h5f.OBJ_ALL, h5py.h5f.OBJ_FILE) == 0
+    assert error_info.traceback
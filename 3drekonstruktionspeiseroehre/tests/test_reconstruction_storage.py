@@ -0,0 +1,63 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from logic.database.array_storage import decode_array_dict, encode_array_dict
+from logic.services.reconstruction_storage_service import ReconstructionStorageService, _same_values
+
+
+def assert_same_values(loaded, expected):
+    if isinstance(expected, dict):
+        assert loaded.keys() == expected.keys()
+        for key in expected:
+            assert_same_values(loaded[key], expected[key])
+    else:
+        np.testing.assert_array_equal(loaded, expected)
+
+
+def test_metrics_round_trip(visualization_data):
+    metrics = visualization_data.figure_creator.get_metrics()
+    assert isinstance(metrics["metric_tubular"], dict)
+
+    assert_same_values(decode_array_dict(encode_array_dict(metrics)), metrics)
+
+
+def test_save_and_load_reconstruction_image(visualization_data):
+    values = ReconstructionStorageService._decompose_visualization_data(visualization_data)
+    columns = dict.fromkeys(
+        (
+            "geometry",
+            "geometry_slices",
+            "geometry_angles",
+            "surface_colors",
+            "surface_frames",
+            "surface_slices",
+            "metrics",
+            "endoflip_colors",
+        )
+    )
+    columns.update(values)
+    loaded = ReconstructionStorageService._restore_visualization_data(SimpleNamespace(**columns))
+
+    assert_same_values(loaded.figure_creator.get_metrics(), visualization_data.figure_creator.get_metrics())
+    # comparison of the migration before the pickle of a converted reconstruction is removed
+    assert _same_values(loaded.figure_creator.get_metrics(), visualization_data.figure_creator.get_metrics())
+    np.testing.assert_array_equal(loaded.center_path, visualization_data.center_path)
+    np.testing.assert_allclose(loaded.figure_x, visualization_data.figure_x, rtol=1e-6)
+    np.testing.assert_allclose(
+        loaded.figure_creator.get_surfacecolor_list(), visualization_data.figure_creator.get_surfacecolor_list(), rtol=1e-6
+    )
+
+
+def test_objects_are_not_pickled():
+    with pytest.raises(TypeError):
+        encode_array_dict({"value": object()})
+
+
+def test_changed_metrics_are_detected(visualization_data):
+    metrics = visualization_data.figure_creator.get_metrics()
+    loaded = decode_array_dict(encode_array_dict(metrics))
+    loaded["metric_tubular"]["max"] = loaded["metric_tubular"]["max"] + 1
+
+    assert not _same_values(loaded, metrics)
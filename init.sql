@@ -9,6 +9,19 @@ CREATE TABLE patients (
     height_cm INT
 );
 
+-- Filters and sorting of the patient table, the prefix filters (LIKE 'abc%') need the pattern operator class
+CREATE INDEX ix_patients_patient_id_pattern ON patients (patient_id varchar_pattern_ops);
+-- Case-insensitive prefix search of the patient IDs, lower() returns text
+CREATE INDEX ix_patients_patient_id_lower_pattern ON patients (lower(patient_id) text_pattern_ops);
+CREATE INDEX ix_patients_center_pattern ON patients (center varchar_pattern_ops);
+CREATE INDEX ix_patients_gender ON patients (gender);
+CREATE INDEX ix_patients_ethnicity ON patients (ethnicity);
+CREATE INDEX ix_patients_birth_year ON patients (birth_year);
+CREATE INDEX ix_patients_year_first_diagnosis ON patients (year_first_diagnosis);
+CREATE INDEX ix_patients_year_first_symptoms ON patients (year_first_symptoms);
+CREATE INDEX ix_patients_center ON patients (center);
+CREATE INDEX ix_patients_height_cm ON patients (height_cm);
+
 CREATE TABLE previous_therapies (
     previous_therapy_id SERIAL PRIMARY KEY,
     patient_id VARCHAR(30) REFERENCES patients(patient_id) ON DELETE CASCADE NOT NULL,
@@ -16,6 +29,7 @@ CREATE TABLE previous_therapies (
     year INT,
     center VARCHAR(20)
 );
+CREATE INDEX ix_previous_therapies_patient_id ON previous_therapies (patient_id);
 
 CREATE TABLE visits (
     visit_id SERIAL PRIMARY KEY,
@@ -27,6 +41,7 @@ CREATE TABLE visits (
     months_after_last_therapy INT,
     months_after_diagnosis INT
 );
+CREATE INDEX ix_visits_patient_id ON visits (patient_id);
 
 CREATE TABLE eckardt_scores (
     eckardt_id SERIAL PRIMARY KEY,
@@ -37,6 +52,7 @@ CREATE TABLE eckardt_scores (
     weightloss INT,
     total_score INT NOT NULL
 );
+CREATE INDEX ix_eckardt_scores_visit_id ON eckardt_scores (visit_id);
 
 CREATE TABLE gerd_scores (
     gerd_id SERIAL PRIMARY KEY,
@@ -46,6 +62,7 @@ CREATE TABLE gerd_scores (
     ppi_use BOOLEAN,
     acid_exposure_time FLOAT
 );
+CREATE INDEX ix_gerd_scores_visit_id ON gerd_scores (visit_id);
 
 CREATE TABLE medications (
     medication_id SERIAL PRIMARY KEY,
@@ -54,6 +71,7 @@ CREATE TABLE medications (
     medication_name VARCHAR,
     medication_dose FLOAT
 );
+CREATE INDEX ix_medications_visit_id ON medications (visit_id);
 
 CREATE TABLE botox_injections (
     botox_id SERIAL PRIMARY KEY,
@@ -61,6 +79,7 @@ CREATE TABLE botox_injections (
     botox_units INT,
     botox_height INT
 );
+CREATE INDEX ix_botox_injections_visit_id ON botox_injections (visit_id);
 
 CREATE TABLE pneumatic_dilatations (
     pneumatic_dilatation_id SERIAL PRIMARY KEY,
@@ -68,6 +87,7 @@ CREATE TABLE pneumatic_dilatations (
     balloon_volume VARCHAR(5),
     quantity INT
 );
+CREATE INDEX ix_pneumatic_dilatations_visit_id ON pneumatic_dilatations (visit_id);
 
 CREATE TABLE lhms (
     lhm_id SERIAL PRIMARY KEY,
@@ -77,6 +97,7 @@ CREATE TABLE lhms (
     fundoplicatio BOOLEAN,
     type_fundoplicatio VARCHAR(8)
 );
+CREATE INDEX ix_lhms_visit_id ON lhms (visit_id);
 
 CREATE TABLE poems (
     poem_id SERIAL PRIMARY KEY,
@@ -89,6 +110,7 @@ CREATE TABLE poems (
     length_tubular_myotomy FLOAT,
     length_gastric_myotomy FLOAT
 );
+CREATE INDEX ix_poems_visit_id ON poems (visit_id);
 
 CREATE TABLE complications (
     complication_id SERIAL PRIMARY KEY,
@@ -102,6 +124,7 @@ CREATE TABLE complications (
     other_complication VARCHAR(10),
     other_complication_specified VARCHAR(40)
 );
+CREATE INDEX ix_complications_visit_id ON complications (visit_id);
 
 CREATE TABLE manometries (
     manometry_id SERIAL PRIMARY KEY,
@@ -118,13 +141,20 @@ CREATE TABLE manometries (
     les_lower_boundary INT,
     les_length INT
 );
+CREATE INDEX ix_manometries_visit_id ON manometries (visit_id);
 
 CREATE TABLE manometry_files (
     manometry_file_id SERIAL PRIMARY KEY,
     visit_id INT REFERENCES visits(visit_id) ON DELETE CASCADE NOT NULL,
-    file BYTEA NOT NULL,
-    pressure_matrix BYTEA NOT NULL
+    file BYTEA,
+    pressure_matrix BYTEA,
+    pressure_data BYTEA,
+    pressure_dtype VARCHAR(16),
+    pressure_rows INT,
+    pressure_columns INT,
+    csv_file BYTEA
 );
+CREATE INDEX ix_manometry_files_visit_id ON manometry_files (visit_id);
 
 CREATE TABLE barium_swallows (
     tbe_id SERIAL PRIMARY KEY,
@@ -138,6 +168,7 @@ CREATE TABLE barium_swallows (
     width_contrast_medium_2min INT,
     width_contrast_medium_5min INT
 );
+CREATE INDEX ix_barium_swallows_visit_id ON barium_swallows (visit_id);
 
 CREATE TABLE barium_swallow_files (
     tbe_file_id SERIAL PRIMARY KEY,
@@ -145,12 +176,14 @@ CREATE TABLE barium_swallow_files (
     minute_of_picture INT,
     file BYTEA NOT NULL
 );
+CREATE INDEX ix_barium_swallow_files_visit_id ON barium_swallow_files (visit_id);
 
 CREATE TABLE endoscopies (
     egd_id SERIAL PRIMARY KEY,
     visit_id INT REFERENCES visits(visit_id) ON DELETE CASCADE NOT NULL,
     position_les INT
 );
+CREATE INDEX ix_endoscopies_visit_id ON endoscopies (visit_id);
 
 CREATE TABLE endoscopy_files (
     egd_file_id SERIAL PRIMARY KEY,
@@ -158,6 +191,7 @@ CREATE TABLE endoscopy_files (
     image_position INT NOT NULL,
     file BYTEA NOT NULL
 );
+CREATE INDEX ix_endoscopy_files_visit_id ON endoscopy_files (visit_id);
 
 CREATE TABLE endoflips (
     endoflip_id SERIAL PRIMARY KEY,
@@ -171,6 +205,7 @@ CREATE TABLE endoflips (
     dmin_after FLOAT,
     ibp_after FLOAT
 );
+CREATE INDEX ix_endoflips_visit_id ON endoflips (visit_id);
 
 CREATE TABLE endoflip_files (
     endoflip_file_id SERIAL PRIMARY KEY,
@@ -179,6 +214,7 @@ CREATE TABLE endoflip_files (
     file BYTEA,
     screenshot BYTEA
 );
+CREATE INDEX ix_endoflip_files_visit_id ON endoflip_files (visit_id);
 
 CREATE TABLE endoflip_images (
     endoflip_image_id SERIAL PRIMARY KEY,
@@ -186,6 +222,7 @@ CREATE TABLE endoflip_images (
     timepoint VARCHAR(10),
     file BYTEA
 );
+CREATE INDEX ix_endoflip_images_visit_id ON endoflip_images (visit_id);
 
 CREATE TABLE endosonography_images (
     endosonography_image_id SERIAL PRIMARY KEY,
@@ -193,18 +230,54 @@ CREATE TABLE endosonography_images (
     image_position INT NOT NULL,
     file BYTEA NOT NULL
 );
+CREATE INDEX ix_endosonography_images_visit_id ON endosonography_images (visit_id);
 
 CREATE TABLE endosonography_videos (
     endosonography_video_id SERIAL PRIMARY KEY,
     visit_id INT REFERENCES visits(visit_id) ON DELETE CASCADE NOT NULL,
     video_oid OID NOT NULL
 );
+CREATE INDEX ix_endosonography_videos_visit_id ON endosonography_videos (visit_id);
 
 CREATE TABLE reconstructions (
     reconstruction_id SERIAL PRIMARY KEY,
     visit_id INT REFERENCES visits(visit_id) ON DELETE CASCADE NOT NULL,
-    reconstruction_file BYTEA NOT NULL
+    reconstruction_file BYTEA,
+    name VARCHAR,
+    image_count INT,
+    content_hash VARCHAR(32)
+);
+CREATE INDEX ix_reconstructions_visit_id ON reconstructions (visit_id);
+
+CREATE TABLE reconstruction_images (
+    reconstruction_image_id SERIAL PRIMARY KEY,
+    reconstruction_id INT REFERENCES reconstructions(reconstruction_id) ON DELETE CASCADE NOT NULL,
+    image_index INT NOT NULL,
+    tbe_file_id INT REFERENCES barium_swallow_files(tbe_file_id) ON DELETE SET NULL,
+    parameters JSON NOT NULL,
+    annotations BYTEA,
+    geometry BYTEA,
+    geometry_slices INT,
+    geometry_angles INT,
+    surface_colors BYTEA,
+    surface_frames INT,
+    surface_slices INT,
+    endoflip_colors BYTEA,
+    metrics BYTEA
+);
+CREATE INDEX ix_reconstruction_images_reconstruction_id ON reconstruction_images (reconstruction_id);
+CREATE INDEX ix_reconstruction_images_tbe_file_id ON reconstruction_images (tbe_file_id);
+
+CREATE TABLE image_thumbnails (
+    thumbnail_id SERIAL PRIMARY KEY,
+    visit_id INT REFERENCES visits(visit_id) ON DELETE CASCADE NOT NULL,
+    image_type VARCHAR(20) NOT NULL,
+    image_id INT NOT NULL,
+    height INT NOT NULL,
+    file BYTEA NOT NULL,
+    UNIQUE (image_type, image_id, height)
 );
+CREATE INDEX ix_image_thumbnails_visit_id ON image_thumbnails (visit_id);
 
 -- Trigger-Function for deleting Large Objects
 CREATE OR REPLACE FUNCTION delete_large_object() RETURNS TRIGGER AS $$